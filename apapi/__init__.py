@@ -1,9 +1,12 @@
 """
 .. include:: ../README.md
 """
+from __future__ import annotations
+
 import logging
+from importlib import import_module
+from typing import TYPE_CHECKING
 
-from . import utils
 from .__version__ import (
     __author__,
     __author_email__,
@@ -14,13 +17,67 @@ from .__version__ import (
     __url__,
     __version__,
 )
-from .alm import ALMConnection
-from .audit import AuditConnection
-from .authentication import BasicAuth, OAuth2NonRotatable, OAuth2Rotatable
-from .basic_connection import BasicConnection
-from .bulk import BulkConnection
-from .connection import Connection
-from .transactional import TransactionalConnection
+
+if TYPE_CHECKING:
+    from . import utils
+    from .alm import ALMConnection
+    from .analytics import LineItemStats
+    from .audit import AuditConnection
+    from .audit_harvester import AuditHarvester
+    from .audit_store import AuditStore
+    from .authentication import BasicAuth, OAuth2NonRotatable, OAuth2Rotatable
+    from .basic_connection import BasicConnection
+    from .bulk import BulkConnection
+    from .connection import Connection
+    from .inventory import InventoryCrawler
+    from .metrics import MetricsCollector
+    from .rate_limiting import RateLimiter
+    from .refresh_scheduler import RefreshScheduler
+    from .token_store import FileTokenStore
+    from .tracing import Tracer
+    from .transactional import TransactionalConnection
+    from .transform import CSVTransform
+
+# Submodules (and requests) are imported only when one of their names is accessed,
+# so that "import apapi" stays cheap - i.e. for short-lived scripts & CLI
+_LAZY_NAMES: dict[str, str] = {
+    "ALMConnection": "alm",
+    "AuditConnection": "audit",
+    "AuditHarvester": "audit_harvester",
+    "AuditStore": "audit_store",
+    "BasicAuth": "authentication",
+    "OAuth2NonRotatable": "authentication",
+    "OAuth2Rotatable": "authentication",
+    "BasicConnection": "basic_connection",
+    "BulkConnection": "bulk",
+    "Connection": "connection",
+    "CSVTransform": "transform",
+    "FileTokenStore": "token_store",
+    "InventoryCrawler": "inventory",
+    "LineItemStats": "analytics",
+    "MetricsCollector": "metrics",
+    "RateLimiter": "rate_limiting",
+    "RefreshScheduler": "refresh_scheduler",
+    "Tracer": "tracing",
+    "TransactionalConnection": "transactional",
+}
+
+__all__ = ["utils", *_LAZY_NAMES]
+
+
+def __getattr__(name: str):
+    if name == "utils":
+        return import_module(".utils", __name__)
+    if name not in _LAZY_NAMES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{_LAZY_NAMES[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
+
 
 # Set default logging handler to avoid "No handler found" warnings.
 logging.getLogger(__name__).addHandler(logging.NullHandler())
@@ -1,10 +1,95 @@
+"""
+apapi.__main__
+
+This module provides command line interface, similar to official Anaplan Connect.
+Files are streamed in chunks (transferred in parallel), so they are never fully
+loaded in memory - and as there is no JVM to start, each invocation is cheap.
+It can be made even cheaper by running a daemon, which keeps authenticated session
+(with warm connection pool) and IDs resolved from names - then invocations with
+its socket are thin clients, which only pass arguments (and stdin & stdout) to it.
+"""
+from __future__ import annotations
+
 import argparse
+import copy
+import csv
+import io
+import json
+import logging
+import os
+import re
+import shlex
+import signal
+import socket
+import socketserver
+import stat
 import sys
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from getpass import getpass
+from itertools import chain, islice
+from time import sleep, time
+from typing import TYPE_CHECKING, BinaryIO, Callable, Iterable, Iterator, Optional
+from urllib.parse import quote
 
 from apapi import __description__, __title__, __version__
+from apapi.metrics import MetricsCollector
+from apapi.results import Task
+from apapi.transform import CSVTransform
+from apapi.utils import (
+    API_URL,
+    AUTH_URL,
+    DEFAULT_POOL_SIZE,
+    FILE_CHUNK_SIZE,
+    LIST_ITEMS_LIMIT,
+    ExportType,
+    MIMEType,
+    get_generic_session,
+    polling_intervals,
+)
+
+if TYPE_CHECKING:
+    from requests import Response
+
+    from apapi import BasicAuth, Connection
+
+_ID_PATTERN = re.compile(r"[0-9A-Fa-f]{32}|\d{9,12}")
+"""IDs of workspaces & models (32 hex digits) and of models' objects (numeric)."""
+
+_OUTPUT_PATHS = ("t", "get:csv", "get:csv_sc", "get:csv_mc", "get:json")
+_VIEW_MODES = {
+    "get:csv_sc": ExportType.TABULAR_SINGLE,
+    "get:csv_mc": ExportType.TABULAR_MULTI,
+}
+_ITEM_ACTIONS = ("putItems", "updateItems", "upsertItems", "deleteItems")
+_PATH_ARGS = (
+    "p",
+    "o",
+    "im",
+    "job",
+    "report",
+    *_OUTPUT_PATHS,
+    *(
+        f"{action}:{data_format}"
+        for action in _ITEM_ACTIONS
+        for data_format in "csv json".split()
+    ),
+)
+"""Arguments with local paths (relative to current directory of the invocation)."""
+_DAEMON_ARGS = ("u", "s", "auth", "ct", "q", "d")
+"""Arguments configuring the daemon (and its connection) - not its clients."""
+NAME_CACHE_TTL: float = 300
+"""Time (in seconds) for which daemon reuses IDs resolved from names."""
+
+_stdio: ContextVar[tuple[BinaryIO, BinaryIO]] = ContextVar("_stdio")
+"""Binary stdin & stdout of the invocation - of daemon's client, if it's served."""
+_names: ContextVar[Optional[dict]] = ContextVar("_names", default=None)
+"""Cache of IDs resolved from names (set only by the daemon)."""
 
 
-def main():
+def _parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         prog=__title__,
         description=__description__,
@@ -26,7 +111,6 @@ def main():
     parser.add_argument(
         "-u",
         "-user",
-        required=True,
         help="Auth: Provide basic auth info (password can be also given later)",
         metavar="{username:password}",
     )
@@ -69,6 +153,34 @@ def main():
         help="Config: Use retry timeout as specified",
         metavar="{seconds}",
     )
+    parser.add_argument(
+        "-mw",
+        "-maxworkers",
+        type=int,
+        default=4,
+        help="Config: Use given number of parallel chunk transfers",
+        metavar="{count}",
+    )
+    parser.add_argument(
+        "-job",
+        help="Config: Run steps of given job file (JSON or YAML) with one session",
+        metavar="{path}",
+    )
+    parser.add_argument(
+        "-report",
+        help="Config: Write timing report of the job to specified path as JSON",
+        metavar="{path}",
+    )
+    parser.add_argument(
+        "-socket",
+        help="Config: Pass the invocation to the daemon listening on given socket",
+        metavar="{path}",
+    )
+    parser.add_argument(
+        "-daemon",
+        action="store_true",
+        help="Config: Run as daemon listening on the socket (until terminated)",
+    )
     # Chaining IDs
     parser.add_argument(
         "-w", "-workspace", help="Info: Use specified workspace", metavar="{ID/name}"
@@ -121,7 +233,7 @@ def main():
     parser.add_argument(
         "-im",
         "-itemmappingproperty",
-        help="Info: Path to mapping between local and Anaplan columns",
+        help="Info: Path to JSON mapping between local and Anaplan columns",
         metavar="{path}",
     )
     # Actions
@@ -288,11 +400,698 @@ def main():
     execute_group.add_argument(
         "-emd", action="store_true", help="Execute type: get export's details"
     )
+    return parser
+
+
+def main(args: list[str] = None) -> int:
+    parser = _parser()
+    if args is None:
+        args = sys.argv[1:] or ["-h"]
+    args_dict = vars(parser.parse_args(args))
+    if args_dict["socket"] and not args_dict["daemon"]:
+        ignored = [f"-{key}" for key in _DAEMON_ARGS if args_dict[key]]
+        if ignored:
+            parser.error(f"daemon's configuration is used instead of: {ignored}")
+        return _submit(args_dict["socket"], args)
+    if not args_dict["u"]:
+        parser.error("the following arguments are required: -u/-user")
+
+    logging.basicConfig(
+        format="%(levelname)s: %(message)s",
+        level=(
+            logging.DEBUG
+            if args_dict["d"]
+            else logging.WARNING
+            if args_dict["q"]
+            else logging.INFO
+        ),
+    )
+    if args_dict["xl"]:
+        logging.warning("Locale (-xl) is not supported yet, so it is ignored")
+    try:
+        with _authenticate(args_dict) as auth:
+            from apapi import Connection
+
+            connection = Connection(auth, args_dict["s"] or API_URL)
+            if args_dict["ct"] is not None:
+                connection.timeout = args_dict["ct"]
+            if args_dict["daemon"]:
+                return _serve(connection, parser, args_dict)
+            if args_dict["job"]:
+                return _run_job(connection, parser, args_dict)
+            return _run(connection, args_dict)
+    except Exception as error:
+        if args_dict["d"]:
+            logging.exception(error)
+        else:
+            logging.error(error)
+        return 1
+
+
+def _authenticate(args: dict) -> BasicAuth:
+    """Authenticate using session configured by connection & proxy arguments."""
+    from apapi import BasicAuth  # imported here, so thin clients don't load requests
+
+    credentials = args["u"]
+    if ":" not in credentials:
+        credentials += ":" + getpass(f"Password for {credentials}: ")
+    session = get_generic_session(
+        retry_count=3 if args["mrc"] is None else args["mrc"],
+        pool_maxsize=max(DEFAULT_POOL_SIZE, args["mw"]),
+        backoff_factor=args["rt"] or 0,
+    )
+    if args["v"]:
+        proxy = args["v"] if "://" in args["v"] else f"http://{args['v']}"
+        if args["vu"]:
+            # only basic proxy auth is supported, so domain & workstation are dropped
+            user, _, password = args["vu"].rsplit("/", 1)[-1].partition(":")
+            scheme, _, host = proxy.partition("://")
+            proxy = f"{scheme}://{quote(user, '')}:{quote(password, '')}@{host}"
+        session.proxies = {"http": proxy, "https": proxy}
+    return BasicAuth(credentials, args["auth"] or AUTH_URL, session)
+
+
+def _run(connection: Connection, args: dict) -> int:
+    """Execute the action given by arguments - returns exit code."""
+    if args["W"]:
+        return _print_items(connection.get_workspaces(False), "workspaces")
+    workspace_id = args["w"] and _resolve(
+        args["w"], connection.get_workspaces, "workspaces", "Workspace"
+    )
+    list_models = lambda workspace_id: (
+        connection.get_workspace_models(workspace_id, False)
+        if workspace_id
+        else connection.get_models(False)
+    )
+    if args["M"]:
+        return _print_items(list_models(workspace_id), "models")
+    if not args["m"]:
+        raise ValueError("Model (-m) is needed for this action")
+    model_id = _resolve(args["m"], list_models, "models", "Model", workspace_id)
+    listings = {
+        "I": (connection.get_imports, "imports"),
+        "E": (connection.get_exports, "exports"),
+        "A": (connection.get_actions, "actions"),
+        "P": (connection.get_processes, "processes"),
+        "F": (connection.get_files, "files"),
+        "L": (connection.get_lists, "lists"),
+        "MO": (connection.get_modules, "modules"),
+        "V": (lambda m: _get_views(connection, m, args["mo"]), "views"),
+    }
+    for flag, (get, key) in listings.items():
+        if args[flag]:
+            return _print_items(get(model_id), key)
+
+    chunk_size = (
+        int(args["chunksize"] * (1 << 20)) if args["chunksize"] else FILE_CHUNK_SIZE
+    )
+    if args["f"] and (args["p"] or args["puts"] or args["putc"]):
+        file_id = _resolve(args["f"], connection.get_files, "files", "File", model_id)
+        _put_file(connection, model_id, file_id, args, chunk_size)
+    with _output(args) as output:
+        if args["i"] or args["e"] or args["a"] or args["pr"]:
+            return _run_action(connection, model_id, args, output)
+        if args["l"]:
+            list_id = _resolve(
+                args["l"], connection.get_lists, "lists", "List", model_id
+            )
+            for action in _ITEM_ACTIONS:
+                for data_format in ("csv", "json"):
+                    if args[f"{action}:{data_format}"]:
+                        return _change_items(
+                            connection,
+                            model_id,
+                            list_id,
+                            action,
+                            _read_items(args[f"{action}:{data_format}"], data_format),
+                        )
+            if output is not None:
+                _write(output, _read_list(connection, model_id, list_id, args), args)
+            return 0
+        if args["vi"]:
+            view_id = _resolve(
+                args["vi"],
+                lambda m: _get_views(connection, m, args["mo"]),
+                "views",
+                "View",
+                model_id,
+            )
+            if output is not None:
+                _write(output, _read_view(connection, model_id, view_id, args), args)
+            return 0
+        if args["f"] and output is not None:
+            file_id = _resolve(
+                args["f"], connection.get_files, "files", "File", model_id
+            )
+            _write(
+                output, connection.download_file(model_id, file_id, args["mw"]), args
+            )
+    return 0
+
+
+def _run_job(
+    connection: Connection,
+    parser: argparse.ArgumentParser,
+    args: dict,
+    cwd: str = None,
+) -> int:
+    """Run steps of the job file, sharing the connection - returns exit code.
+
+    Job file (JSON, or YAML if PyYAML is installed) has "steps" - each with a name,
+    args (the same as of CLI, as a list or a string) and optionally "after" (names
+    of steps it depends on). Steps without "after" run after the previous step,
+    so by default steps form a sequence, but any DAG can be described.
+    Independent steps run in parallel, up to "parallelism" (by default 4) at once.
+    Steps whose dependencies failed are skipped. Connection arguments (-u, -s, ...)
+    are taken from the command line, together with defaults of other arguments
+    (i.e. -m), which steps can override. Relative paths are relative to cwd
+    (by default current directory).
+    """
+    with open(args["job"], encoding="utf-8") as file:
+        if args["job"].endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML is needed for YAML job files") from None
+            job = yaml.safe_load(file)
+        else:
+            job = json.load(file)
+    steps = {}
+    previous = []
+    for number, step in enumerate(job["steps"]):
+        name = str(step.get("name", number))
+        if name in steps:
+            raise ValueError("Duplicated step name", name)
+        step_args = step["args"]
+        if isinstance(step_args, str):
+            step_args = shlex.split(step_args)
+        after = step.get("after", previous)
+        if isinstance(after, str):
+            after = [after]
+        for dependency in after:
+            if dependency not in steps:
+                raise ValueError("Step depends on unknown (or later) step", name)
+        defaults = {**args, "job": None, "report": None}
+        parsed = parser.parse_args(
+            list(map(str, step_args)), argparse.Namespace(**defaults)
+        )
+        steps[name] = {"args": _rebase_paths(vars(parsed), cwd), "after": list(after)}
+        previous = [name]
+
+    # job's own copy of the connection (sharing its session) has its own collector,
+    # so neither concurrent invocations (i.e. in daemon) nor caller's one are affected
+    connection = copy.copy(connection)
+    connection.metrics = MetricsCollector()
+    results: dict[str, dict] = {}
+    start = time()
+    with ThreadPoolExecutor(job.get("parallelism", 4)) as executor:
+        running = {}
+        while len(results) < len(steps):
+            for name, step in steps.items():
+                if name in results or name in running.values():
+                    continue
+                states = [results.get(d, {}).get("status") for d in step["after"]]
+                if any(state in ("FAILED", "SKIPPED") for state in states):
+                    results[name] = {"status": "SKIPPED"}
+                    logging.warning(f"Step {name} skipped")
+                elif all(state == "SUCCESSFUL" for state in states):
+                    running[
+                        executor.submit(copy_context().run, _run_step, connection, step)
+                    ] = name
+            if running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+    report = {
+        "successful": all(r["status"] == "SUCCESSFUL" for r in results.values()),
+        "started": start,
+        "duration": time() - start,
+        "steps": {name: results[name] for name in steps},
+        "requests": connection.metrics.snapshot(),
+    }
+    if args["report"]:
+        with open(args["report"], "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    return 0 if report["successful"] else 1
+
+
+def _run_step(connection: Connection, step: dict) -> dict:
+    """Run single step of a job - returns its result (for the report)."""
+    start = time()
+    error = None
+    try:
+        exit_code = _run(connection, step["args"])
+    except Exception as exception:
+        logging.error(exception)
+        exit_code, error = 1, str(exception)
+    return {
+        "status": "SUCCESSFUL" if exit_code == 0 else "FAILED",
+        "started": start,
+        "duration": time() - start,
+        "error": error,
+    }
+
+
+def _resolve(
+    id_or_name: str,
+    get_items: Callable[..., Response],
+    key: str,
+    kind: str,
+    *get_args: str,
+) -> str:
+    """Get ID of an object given by ID or name (IDs are used without any request)."""
+    if _ID_PATTERN.fullmatch(id_or_name):
+        return id_or_name
+    cache = _names.get()
+    cache_key = (kind, *get_args, id_or_name)
+    if cache is not None and cache.get(cache_key, (0, None))[0] > time():
+        return cache[cache_key][1]
+    for item in get_items(*get_args).json().get(key, []):
+        if item.get("name") == id_or_name:
+            if cache is not None:
+                cache[cache_key] = (time() + NAME_CACHE_TTL, item["id"])
+            return item["id"]
+    raise Exception(f"{kind} not found", id_or_name)
+
+
+def _stdin() -> BinaryIO:
+    stdio = _stdio.get(None)
+    return sys.stdin.buffer if stdio is None else stdio[0]
+
+
+def _stdout() -> BinaryIO:
+    stdio = _stdio.get(None)
+    return sys.stdout.buffer if stdio is None else stdio[1]
+
+
+def _print(text: str) -> None:
+    stdio = _stdio.get(None)
+    if stdio is None:
+        print(text)
+    else:
+        stdio[1].write(f"{text}\n".encode())
+
+
+def _print_items(response: Response, key: str) -> int:
+    for item in response.json().get(key, []):
+        _print(f"{item['id']}\t{item['name']}")
+    return 0
+
+
+def _get_views(connection: Connection, model_id: str, module: str = None) -> Response:
+    if module is None:
+        return connection.get_views(model_id, False)
+    module_id = _resolve(module, connection.get_modules, "modules", "Module", model_id)
+    return connection.get_module_views(model_id, module_id, False)
+
+
+@contextmanager
+def _output(args: dict) -> Iterator[Optional[BinaryIO]]:
+    """Open output given by arguments - path or stdout (None if there is no output)."""
+    path = next((args[key] for key in _OUTPUT_PATHS if args[key]), None)
+    if path is not None:
+        with open(path, "wb") as file:
+            yield file
+    elif args["gets"] or args["getc"]:
+        yield _stdout()
+    else:
+        yield None
+
+
+def _write(output: BinaryIO, chunks: Iterable[bytes], args: dict) -> None:
+    """Write chunks to output - converted to tab-separated, if -getc is set."""
+    if args["getc"]:
+        chunks = CSVTransform(output_delimiter="\t").apply(chunks)
+    for chunk in chunks:
+        output.write(chunk)
+
+
+def _put_file(
+    connection: Connection, model_id: str, file_id: str, args: dict, chunk_size: int
+) -> None:
+    """Upload file from path or stdin, streaming it in chunks.
+
+    With item mapping (-im), CSV columns are transformed on the fly while uploading.
+    """
+    transform = CSVTransform.from_file(args["im"], chunk_size) if args["im"] else None
+    if args["putc"]:
+        # data from terminal is tab-separated, while it's uploaded comma-separated
+        transform = transform or CSVTransform(chunk_size=chunk_size)
+        transform.delimiter = "\t"
+    if args["p"]:
+        connection.write_file(
+            model_id, file_id, args["p"], chunk_size, args["mw"], transform
+        )
+    else:
+        stdin = _stdin()
+        chunks = iter(lambda: stdin.read(chunk_size), b"")
+        if transform is not None:
+            chunks = transform.apply(chunks)
+        first, second = next(chunks, b""), next(chunks, None)
+        if second is None:
+            connection.put_file(model_id, file_id, first)
+        else:
+            chunks = chain((first, second), chunks)
+            connection.upload_file(model_id, file_id, chunks, max_workers=args["mw"])
+    logging.info(f"File {file_id} uploaded")
+
+
+def _run_action(
+    connection: Connection, model_id: str, args: dict, output: Optional[BinaryIO]
+) -> int:
+    """Run import, export, action or process (or show its definition without -x)."""
+    mapping = None
+    if args["xm"]:
+        dimension, _, item = args["xm"].partition(":")
+        mapping = {dimension: item}
+    if args["i"]:
+        action_id = _resolve(
+            args["i"], connection.get_imports, "imports", "Import", model_id
+        )
+        get_definition, get_task = connection.get_import, connection.get_import_task
+        run = lambda: connection.run_import(model_id, action_id, mapping)
+    elif args["e"]:
+        action_id = _resolve(
+            args["e"], connection.get_exports, "exports", "Export", model_id
+        )
+        get_definition, get_task = connection.get_export, connection.get_export_task
+        run = lambda: connection.run_export(model_id, action_id)
+    elif args["a"]:
+        action_id = _resolve(
+            args["a"], connection.get_actions, "actions", "Action", model_id
+        )
+        get_definition, get_task = None, connection.get_action_task
+        run = lambda: connection.run_action(model_id, action_id)
+    else:
+        action_id = _resolve(
+            args["pr"], connection.get_processes, "processes", "Process", model_id
+        )
+        get_definition, get_task = connection.get_process, connection.get_process_task
+        run = lambda: connection.run_process(model_id, action_id, mapping)
+    if not args["x"]:
+        if get_definition is None:
+            raise ValueError("Action can only be executed (-x)")
+        _print(json.dumps(get_definition(model_id, action_id).json(), indent=2))
+        return 0
+
+    task = Task.from_response(run())
+    for interval in polling_intervals():
+        if task.done:
+            break
+        sleep(interval)
+        task = Task.from_response(get_task(model_id, action_id, task.task_id))
+    logging.info(f"Task {task.task_id} {task.state.lower()}: {task.result!r}")
+    if args["o"] and args["i"] and task.result and task.result.failure_dump_available:
+        with open(args["o"], "wb") as file:
+            file.write(
+                connection.download_import_dump(model_id, action_id, task.task_id)
+            )
+    if args["o"] and args["pr"]:
+        for result in task.nested_results:
+            if result.failure_dump_available:
+                with open(f"{args['o']}_{result.object_id}.csv", "wb") as file:
+                    file.write(
+                        connection.download_process_dump(
+                            model_id, action_id, task.task_id, result.object_id
+                        )
+                    )
+    if args["e"] and output is not None and task.successful:
+        # exported file has the same ID as the export
+        _write(output, connection.download_file(model_id, action_id, args["mw"]), args)
+    return 0 if task.successful else 1
+
+
+def _read_items(path: str, data_format: str) -> Iterator[dict]:
+    """Lazily read list items from CSV or JSON file (or stdin, given as "-").
+
+    CSV columns id, name, code & parent are items' fields, all other are properties.
+    """
+    stream = (
+        io.TextIOWrapper(_stdin(), encoding="utf-8-sig")
+        if path == "-"
+        else open(path, encoding="utf-8-sig", newline="")
+    )
+    with stream:
+        if data_format == "json":
+            yield from json.load(stream)
+            return
+        for row in csv.DictReader(stream):
+            item = {
+                key: row.pop(key)
+                for key in ("id", "name", "code", "parent")
+                if row.get(key)
+            }
+            if row:
+                item["properties"] = row
+            yield item
+
+
+def _change_items(
+    connection: Connection,
+    model_id: str,
+    list_id: str,
+    action: str,
+    items: Iterator[dict],
+) -> int:
+    """Add, update, upsert or delete items in batches - prints summary of results."""
+    existing = set()
+    if action == "upsertItems":
+        for item in (
+            connection.get_list_items(model_id, list_id, False)
+            .json()
+            .get("listItems", [])
+        ):
+            existing.update((item.get("id"), item.get("code")))
+        existing.discard(None)
+    summary = {}
+    while batch := list(islice(items, LIST_ITEMS_LIMIT)):
+        if action == "upsertItems":
+            updates, additions = [], []
+            for item in batch:
+                known = {item.get("id"), item.get("code")} & existing
+                (updates if known else additions).append(item)
+            calls = [
+                (connection.update_list_items, updates),
+                (connection.add_list_items, additions),
+            ]
+        else:
+            change = {
+                "putItems": connection.add_list_items,
+                "updateItems": connection.update_list_items,
+                "deleteItems": connection.delete_list_items,
+            }[action]
+            calls = [(change, batch)]
+        for change, data in calls:
+            if not data:
+                continue
+            result = change(model_id, list_id, data).json()
+            # counts are either at the top level, or nested in "result"
+            for key, value in chain(result.items(), result.get("result", {}).items()):
+                if isinstance(value, int):
+                    summary[key] = summary.get(key, 0) + value
+                elif isinstance(value, list):
+                    summary.setdefault(key, []).extend(value)
+    _print(json.dumps(summary, indent=2))
+    return 1 if summary.get("failures") else 0
+
+
+def _read_list(
+    connection: Connection, model_id: str, list_id: str, args: dict
+) -> Iterable[bytes]:
+    """Get list items - as JSON or CSV (with all details, if -x:all is set)."""
+    if args["get:json"]:
+        return [connection.get_list_items(model_id, list_id, args["x:all"]).content]
+    if args["x:all"]:
+        return [
+            connection.get_list_items(
+                model_id, list_id, True, MIMEType.TEXT_CSV
+            ).content
+        ]
+    return connection.iter_list(model_id, list_id)
+
+
+def _read_view(
+    connection: Connection, model_id: str, view_id: str, args: dict
+) -> Iterable[bytes]:
+    """Get cells of a view - given pages in one request, or all in a chosen layout."""
+    if args["get:json"] or args["pages"]:
+        response = connection.get_cell_data(
+            model_id,
+            view_id,
+            MIMEType.APP_JSON if args["get:json"] else MIMEType.TEXT_CSV,
+            args["pages"].split(",") if args["pages"] else None,
+        )
+        return [response.content]
+    mode = next(
+        (mode for key, mode in _VIEW_MODES.items() if args[key]), ExportType.GRID
+    )
+    return connection.iter_view(model_id, view_id, mode)
+
+
+def _rebase_paths(args: dict, cwd: Optional[str]) -> dict:
+    """Make relative paths of arguments relative to cwd (if it's given)."""
+    if cwd is not None:
+        for key in _PATH_ARGS:
+            if args[key] and args[key] != "-":
+                args[key] = os.path.join(cwd, args[key])
+    return args
+
+
+def _submit(path: str, args: list[str]) -> int:
+    """Pass arguments, current directory, stdin & stdout to the daemon.
+
+    Stdin & stdout are passed as file descriptors, so the daemon streams data
+    directly from & to them - if they were replaced by streams without descriptors
+    (i.e. by test runners), null device & standard output descriptor are passed.
+    Returns exit code of the invocation.
+    """
+    with socket.socket(socket.AF_UNIX) as client, open(os.devnull, "rb") as null:
+        client.connect(path)
+        sys.stdout.flush()
+        descriptors = array(
+            "i", [_fileno(sys.stdin, null.fileno()), _fileno(sys.stdout, 1)]
+        )
+        client.sendmsg(
+            [json.dumps({"args": args, "cwd": os.getcwd()}).encode() + b"\n"],
+            [(socket.SOL_SOCKET, socket.SCM_RIGHTS, descriptors)],
+        )
+        with client.makefile("rb") as stream:
+            reply = json.loads(stream.readline() or b'{"exit_code": 1}')
+    if reply.get("error"):
+        print(f"ERROR: {reply['error']}", file=sys.stderr)
+    return reply["exit_code"]
+
+
+def _fileno(stream, default: int) -> int:
+    """Get file descriptor of the stream, or default if it has none."""
+    try:
+        return stream.fileno()
+    except (AttributeError, OSError, ValueError):
+        return default
+
+
+class _DaemonHandler(socketserver.StreamRequestHandler):
+    """Serves single invocation of the client (see _submit)."""
+
+    def handle(self) -> None:
+        message, ancillary, _, _ = self.request.recvmsg(
+            1 << 16, socket.CMSG_SPACE(2 * array("i").itemsize)
+        )
+        descriptors = array("i")
+        for level, kind, data in ancillary:
+            if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+                descriptors.frombytes(data[: len(data) - len(data) % 4])
+        if len(descriptors) != 2:
+            for descriptor in descriptors:
+                os.close(descriptor)
+            return
+        with open(descriptors[0], "rb") as stdin, open(descriptors[1], "wb") as stdout:
+            # arguments might not fit in the first message
+            while not message.endswith(b"\n"):
+                if not (rest := self.request.recv(1 << 16)):
+                    return
+                message += rest
+            exit_code, error = self.server.execute(json.loads(message), stdin, stdout)
+        self.wfile.write(
+            json.dumps({"exit_code": exit_code, "error": error}).encode() + b"\n"
+        )
+
+
+class _Daemon(
+    socketserver.ThreadingMixIn,
+    # Unix sockets (and passing descriptors) are not available on Windows
+    getattr(socketserver, "UnixStreamServer", object),
+):
+    """Server running invocations of clients (each in its thread) with one connection."""
+
+    daemon_threads = True
+
+    def __init__(
+        self, path: str, connection: Connection, parser: argparse.ArgumentParser
+    ):
+        self.connection: Connection = connection
+        self.parser: argparse.ArgumentParser = parser
+        self.names: dict = {}
+        """IDs resolved from names - shared by all invocations."""
+        super().__init__(path, _DaemonHandler, bind_and_activate=False)
+        try:
+            self.server_bind()
+            # socket is usable only by its owner, as it gives access to the session
+            os.chmod(path, 0o600)
+            self.server_activate()
+        except BaseException:
+            self.server_close()
+            raise
+
+    def execute(
+        self, message: dict, stdin: BinaryIO, stdout: BinaryIO
+    ) -> tuple[int, Optional[str]]:
+        """Run invocation - returns its exit code & error (if there was any)."""
+        _stdio.set((stdin, stdout))
+        _names.set(self.names)
+        try:
+            args = vars(self.parser.parse_args(message["args"]))
+            args = _rebase_paths(args, message["cwd"])
+            if args["job"]:
+                return (
+                    _run_job(self.connection, self.parser, args, message["cwd"]),
+                    None,
+                )
+            return _run(self.connection, args), None
+        except SystemExit as stop:  # invalid arguments (but client checks them)
+            return stop.code, "Invalid arguments"
+        except Exception as error:
+            logging.error(error)
+            return 1, str(error)
+        finally:
+            stdout.flush()
+
+
+def _serve(connection: Connection, parser: argparse.ArgumentParser, args: dict) -> int:
+    """Serve invocations of clients on the socket until terminated."""
+    if not _remove_stale_socket(args["socket"]):
+        return 1
+    signal.signal(signal.SIGTERM, _interrupt)
+    with _Daemon(args["socket"], connection, parser) as daemon:
+        logging.info(f"Daemon listening on {args['socket']}")
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            logging.info("Daemon stopped")
+        finally:
+            os.unlink(args["socket"])
+    return 0
+
+
+def _remove_stale_socket(path: str) -> bool:
+    """Remove socket left by the daemon that was killed - returns if path is free.
+
+    Path is removed only if it's a socket which refuses connections, so neither
+    running daemon nor other files are removed.
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return True
+    if not stat.S_ISSOCK(mode):
+        logging.error(f"Path {path} exists and it's not a socket")
+        return False
+    with socket.socket(socket.AF_UNIX) as probe:
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+            return True
+        except OSError as error:
+            logging.error(f"Socket {path} can't be checked: {error}")
+            return False
+    logging.error(f"Other daemon is already listening on {path}")
+    return False
 
-    args_dict = vars(parser.parse_args(args=None if sys.argv[1:] else ["-h"]))
 
-    raise NotImplementedError("Apapi module execution is not supported yet.")
+def _interrupt(*_) -> None:
+    raise KeyboardInterrupt
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -6,12 +6,42 @@ Application Lifecycle Management API capabilities
 """
 from __future__ import annotations
 
+import codecs
+import csv
 import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from dataclasses import dataclass
+from time import monotonic, sleep
+from typing import Callable, Iterable, Iterator, Optional
 
 from requests import Response
 
 from .basic_connection import BasicConnection
-from .utils import MIMEType, ModelOnlineStatus
+from .results import Task
+from .utils import MIMEType, ModelOnlineStatus, iter_lines, polling_intervals
+
+
+@dataclass
+class SyncOutcome:
+    """Outcome of synchronization of one target model by ALMConnection.sync_many()."""
+
+    model_id: str
+    state: str = "PENDING"
+    """Final state of sync task - or NOT_SYNCABLE / FAILED, if it couldn't be run."""
+    successful: bool = False
+    task_id: Optional[str] = None
+    target_revision_id: Optional[str] = None
+    error: Optional[str] = None
+    validation_time: float = 0.0
+    """Seconds spent on checking if revision can be synced."""
+    wait_time: float = 0.0
+    """Seconds between validation and start of sync (waiting for a free slot)."""
+    sync_time: float = 0.0
+    """Seconds from start of sync to its completion (as seen by the poller)."""
 
 
 class ALMConnection(BasicConnection):
@@ -93,13 +123,17 @@ class ALMConnection(BasicConnection):
         )
 
     def get_revisions_comparison_data(
-        self, source_revision_id: str, target_model_id: str, target_revision_id: str
+        self,
+        source_revision_id: str,
+        target_model_id: str,
+        target_revision_id: str,
+        compress: bool = None,
     ) -> Response:
         """Get a revision tags' detailed comparison data."""
         return self.request(
             "GET",
             f"{self._api_main_url}/models/{target_model_id}/alm/comparisonReports/{target_revision_id}/{source_revision_id}",
-            headers={"Accept": MIMEType.APP_8STREAM.value},
+            headers=self._download_headers(MIMEType.APP_8STREAM, compress),
         )
 
     # Revisions comparison summary
@@ -139,6 +173,160 @@ class ALMConnection(BasicConnection):
             f"{self._api_main_url}/models/{target_model_id}/alm/summaryReports/{target_revision_id}/{source_revision_id}",
         )
 
+    # Revisions comparison runner
+    def _run_comparison_task(
+        self,
+        start: Callable[[str, str, str, str], Response],
+        get_status: Callable[[str, str], Response],
+        source_model_id: str,
+        source_revision_id: str,
+        target_model_id: str,
+        target_revision_id: str,
+    ) -> None:
+        """Start comparison (or summary) task and wait until it succeeds."""
+        response = start(
+            source_model_id, source_revision_id, target_model_id, target_revision_id
+        )
+        task = Task.from_response(response)
+        for interval in polling_intervals():
+            if task.done:
+                break
+            sleep(interval)
+            task = Task.from_response(get_status(target_model_id, task.task_id))
+        if not task.successful:
+            raise Exception("Comparison failed", target_model_id, task.task_id)
+
+    def _stream_comparison_data(
+        self, source_revision_id: str, target_model_id: str, target_revision_id: str
+    ) -> Response:
+        """Same as get_revisions_comparison_data(), but body is streamed."""
+        return self.request(
+            "GET",
+            f"{self._api_main_url}/models/{target_model_id}/alm/comparisonReports/{target_revision_id}/{source_revision_id}",
+            headers=self._download_headers(MIMEType.APP_8STREAM),
+            stream=True,
+        )
+
+    def download_revisions_comparison(
+        self,
+        source_model_id: str,
+        source_revision_id: str,
+        target_model_id: str,
+        target_revision_id: str,
+        path: str,
+    ) -> str:
+        """Run revision tags' detailed comparison and stream its report to a file.
+
+        Comparison task is started, polled (with growing intervals) until it's done,
+        and then its report is written chunk by chunk - so it's never fully in memory.
+        """
+        with self._span("download_revisions_comparison", model_id=target_model_id):
+            self._run_comparison_task(
+                self.start_revisions_comparison,
+                self.get_revisions_comparison_status,
+                source_model_id,
+                source_revision_id,
+                target_model_id,
+                target_revision_id,
+            )
+            with self._stream_comparison_data(
+                source_revision_id, target_model_id, target_revision_id
+            ) as response, open(path, "wb") as file:
+                for chunk in response.iter_content(1 << 16):
+                    file.write(chunk)
+        return path
+
+    def iter_revisions_comparison(
+        self,
+        source_model_id: str,
+        source_revision_id: str,
+        target_model_id: str,
+        target_revision_id: str,
+    ) -> Iterator[dict]:
+        """Run revision tags' detailed comparison and yield changes from its report.
+
+        Report (CSV) is parsed incrementally while it's streamed - each change is
+        yielded as a dictionary, with columns of the report as keys.
+        """
+        return self._span_iter(
+            "iter_revisions_comparison",
+            self._iter_comparison_records(
+                source_model_id, source_revision_id, target_model_id, target_revision_id
+            ),
+            model_id=target_model_id,
+        )
+
+    def _iter_comparison_records(
+        self,
+        source_model_id: str,
+        source_revision_id: str,
+        target_model_id: str,
+        target_revision_id: str,
+    ) -> Iterator[dict]:
+        self._run_comparison_task(
+            self.start_revisions_comparison,
+            self.get_revisions_comparison_status,
+            source_model_id,
+            source_revision_id,
+            target_model_id,
+            target_revision_id,
+        )
+        with self._stream_comparison_data(
+            source_revision_id, target_model_id, target_revision_id
+        ) as response:
+            chunks = codecs.iterdecode(response.iter_content(1 << 16), "utf-8-sig")
+            yield from csv.DictReader(iter_lines(chunks))
+
+    def get_revisions_summary(
+        self,
+        source_model_id: str,
+        source_revision_id: str,
+        target_model_id: str,
+        target_revision_id: str,
+    ) -> dict:
+        """Run revision tags' summary comparison and get its report."""
+        with self._span("get_revisions_summary", model_id=target_model_id):
+            self._run_comparison_task(
+                self.start_revisions_summary,
+                self.get_revisions_summary_status,
+                source_model_id,
+                source_revision_id,
+                target_model_id,
+                target_revision_id,
+            )
+            return self.get_revisions_summary_data(
+                source_revision_id, target_model_id, target_revision_id
+            ).json()
+
+    def download_revisions_comparisons(
+        self,
+        comparisons: Iterable[tuple[str, str, str, str]],
+        directory: str,
+        max_workers: int = 4,
+    ) -> list[str]:
+        """Run many detailed comparisons at once, streaming their reports to files.
+
+        Comparisons are tuples of source model, source revision, target model
+        and target revision IDs - each report is saved in the directory as
+        {target model}_{target revision}_{source revision}.csv. Paths are returned
+        in the order of comparisons - if any comparison fails, its exception is raised
+        (after others are done).
+        """
+        with ThreadPoolExecutor(max_workers) as executor:
+            futures = [
+                executor.submit(
+                    copy_context().run,
+                    self.download_revisions_comparison,
+                    *comparison,
+                    os.path.join(
+                        directory,
+                        f"{comparison[2]}_{comparison[3]}_{comparison[1]}.csv",
+                    ),
+                )
+                for comparison in comparisons
+            ]
+        return [future.result() for future in futures]
+
     # Sync models
     def get_syncs(self, model_id: str) -> Response:
         """Get synchronization tasks for the last 48 hours for a specified model."""
@@ -171,3 +359,132 @@ class ALMConnection(BasicConnection):
                 }
             ),
         )
+
+    def sync_many(
+        self,
+        source_model_id: str,
+        source_revision_id: str,
+        target_model_ids: Iterable[str],
+        max_parallel: int = 5,
+        max_workers: int = 8,
+        max_poll_failures: int = 3,
+    ) -> dict[str, SyncOutcome]:
+        """Synchronize revision tag from source model to many target models at once.
+
+        Firstly, for all targets at once, it's checked if the revision can be synced
+        (and what's their latest revision). Then syncs are run, with at most max
+        parallel of them at the same time - all of them are polled by one poller
+        with growing intervals. Requests are sent by up to max workers threads.
+        Outcomes (with timings) are returned by target model ID - failures of
+        some targets don't stop others. Failed polls are treated as transient, so
+        a sync is failed only after max poll failures in a row.
+        """
+        outcomes = {
+            model_id: SyncOutcome(model_id)
+            for model_id in dict.fromkeys(target_model_ids)
+        }
+        with ThreadPoolExecutor(max_workers) as executor, self._span(
+            "sync_many", model_id=source_model_id, targets=len(outcomes)
+        ):
+
+            def run(function, *args):
+                # each thread runs in a copy of context, to keep spans within this one
+                return executor.submit(copy_context().run, function, *args)
+
+            ready = deque()
+            validations = [
+                run(self._validate_sync, source_model_id, source_revision_id, outcome)
+                for outcome in outcomes.values()
+            ]
+            for outcome, validation in zip(outcomes.values(), validations):
+                if validation.result():
+                    ready.append((outcome, monotonic()))
+
+            running = {}
+            poll_failures = {}
+            intervals = polling_intervals()
+            while ready or running:
+                launched = []
+                while ready and len(running) + len(launched) < max_parallel:
+                    outcome, validated = ready.popleft()
+                    outcome.wait_time = monotonic() - validated
+                    launched.append(outcome)
+                launches = [
+                    run(self._start_sync, source_model_id, source_revision_id, outcome)
+                    for outcome in launched
+                ]
+                for outcome, launch in zip(launched, launches):
+                    if launch.result():
+                        running[outcome.model_id] = (outcome, monotonic())
+                if not running:
+                    continue
+                sleep(next(intervals))
+                statuses = [
+                    (outcome, run(self.get_sync, outcome.model_id, outcome.task_id))
+                    for outcome, _ in running.values()
+                ]
+                for outcome, status in statuses:
+                    try:
+                        task = Task.from_response(status.result())
+                        poll_failures.pop(outcome.model_id, None)
+                        if not task.done:
+                            continue
+                        outcome.state, outcome.successful = task.state, task.successful
+                    except Exception as error:
+                        failures = poll_failures.get(outcome.model_id, 0) + 1
+                        if failures < max_poll_failures:
+                            logging.warning(
+                                f"Sync poll failed for {outcome.model_id}: {error}"
+                            )
+                            poll_failures[outcome.model_id] = failures
+                            continue
+                        outcome.state, outcome.error = "FAILED", str(error)
+                    outcome.sync_time = monotonic() - running[outcome.model_id][1]
+                    del running[outcome.model_id]
+                    # new syncs can be started now, so poll them quickly again
+                    intervals = polling_intervals()
+        return outcomes
+
+    def _validate_sync(
+        self, source_model_id: str, source_revision_id: str, outcome: SyncOutcome
+    ) -> bool:
+        """Check if revision can be synced to target, and get its latest revision."""
+        start = monotonic()
+        try:
+            syncable = self.get_syncable_revisions(source_model_id, outcome.model_id)
+            if all(
+                source_revision_id != revision["id"]
+                for revision in syncable.json().get("revisions", [])
+            ):
+                outcome.state = "NOT_SYNCABLE"
+                return False
+            latest = self.get_latest_revision(outcome.model_id).json().get("revisions")
+            if not latest:
+                raise Exception("No revision tag in target model", outcome.model_id)
+            outcome.target_revision_id = latest[0]["id"]
+            return True
+        except Exception as error:
+            logging.error(f"Sync validation failed for {outcome.model_id}: {error}")
+            outcome.state, outcome.error = "FAILED", str(error)
+            return False
+        finally:
+            outcome.validation_time = monotonic() - start
+
+    def _start_sync(
+        self, source_model_id: str, source_revision_id: str, outcome: SyncOutcome
+    ) -> bool:
+        """Start sync task of the target model."""
+        try:
+            response = self.sync(
+                source_model_id,
+                source_revision_id,
+                outcome.model_id,
+                outcome.target_revision_id,
+            )
+            outcome.task_id = Task.from_response(response).task_id
+            outcome.state = "IN_PROGRESS"
+            return True
+        except Exception as error:
+            logging.error(f"Sync failed to start for {outcome.model_id}: {error}")
+            outcome.state, outcome.error = "FAILED", str(error)
+            return False
@@ -0,0 +1,243 @@
+"""
+apapi.analytics
+
+This module provides analytics of models' sizes - line items of one or many models
+are loaded into columns (numpy arrays), so that cell counts & estimated memory
+can be aggregated by format, model, module & list with vectorised operations.
+It needs numpy, which can be installed with "analytics" extra (apapi[analytics]).
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Iterable
+
+try:
+    import numpy as np
+except ImportError as error:
+    raise ImportError(
+        "numpy is needed for analytics - install apapi[analytics]"
+    ) from error
+
+from .transactional import TransactionalConnection
+
+FORMAT_CELL_SIZES: dict[str, int] = {"NONE": 0, "BOOLEAN": 1, "TEXT": 8, "NUMBER": 8}
+"""Estimated size (in bytes) of a cell of given format."""
+DEFAULT_CELL_SIZE: int = 4
+"""Estimated size (in bytes) of a cell of other formats (i.e. DATE or LIST)."""
+
+
+class LineItemStats:
+    """Line items of one or many models, as columns of numpy arrays.
+
+    Text columns (models, modules, formats & lists) are encoded as codes (indices)
+    of their labels, so that aggregations are done by numpy.bincount().
+    Memory of line items is estimated as their cell count times size of a cell
+    of their format (see FORMAT_CELL_SIZES).
+    """
+
+    def __init__(
+        self,
+        lineitems: Iterable[tuple[str, dict]],
+        cell_sizes: dict[str, int] = None,
+    ):
+        """Load line items, given as pairs of model ID & line item (from API)."""
+        models, ids, names, modules, formats, cells = [], [], [], [], [], []
+        module_names = {}
+        list_items, list_ids, list_names = [], [], {}
+        for index, (model_id, lineitem) in enumerate(lineitems):
+            models.append(model_id)
+            ids.append(lineitem["id"])
+            names.append(lineitem.get("name", ""))
+            module = f"{model_id}/{lineitem.get('moduleId', '')}"
+            modules.append(module)
+            module_names[module] = lineitem.get("moduleName", "")
+            formats.append(lineitem.get("format", "NONE"))
+            cells.append(lineitem.get("cellCount", 0))
+            for dimension in lineitem.get("appliesTo", []):
+                list_id = f"{model_id}/{dimension['id']}"
+                list_items.append(index)
+                list_ids.append(list_id)
+                list_names[list_id] = dimension.get("name", "")
+
+        self.ids: np.ndarray = np.array(ids, dtype=object)
+        """IDs of line items."""
+        self.names: np.ndarray = np.array(names, dtype=object)
+        """Names of line items."""
+        self.model_labels, self.model_codes = _encode(models)
+        self.module_labels, self.module_codes = _encode(modules)
+        """Modules are labelled by model ID & module ID joined by "/"."""
+        self.module_names: dict[str, str] = module_names
+        self.format_labels, self.format_codes = _encode(formats)
+        self.cell_counts: np.ndarray = np.array(cells, dtype=np.int64)
+        """Number of cells of each line item."""
+        sizes = cell_sizes or FORMAT_CELL_SIZES
+        format_sizes = np.array(
+            [sizes.get(label, DEFAULT_CELL_SIZE) for label in self.format_labels],
+            dtype=np.int64,
+        )
+        self.sizes: np.ndarray = self.cell_counts * format_sizes[self.format_codes]
+        """Estimated memory (in bytes) of each line item."""
+        # dimensions as pairs (line item index, list code), one pair per dimension
+        self.list_items: np.ndarray = np.array(list_items, dtype=np.int64)
+        self.list_labels, self.list_codes = _encode(list_ids)
+        """Lists are labelled by model ID & list ID joined by "/"."""
+        self.list_names: dict[str, str] = list_names
+
+    @classmethod
+    def from_lineitems(
+        cls, model_id: str, lineitems: Iterable[dict], cell_sizes: dict = None
+    ) -> LineItemStats:
+        """Load line items of one model, i.e. "items" of get_lineitems()."""
+        return cls(((model_id, lineitem) for lineitem in lineitems), cell_sizes)
+
+    @classmethod
+    def from_models(
+        cls,
+        connection: TransactionalConnection,
+        model_ids: Iterable[str],
+        max_workers: int = 8,
+        cell_sizes: dict = None,
+    ) -> LineItemStats:
+        """Load line items (with details) of many models, fetched in parallel."""
+        model_ids = list(model_ids)
+        with ThreadPoolExecutor(max_workers) as executor:
+            responses = [
+                executor.submit(
+                    copy_context().run, connection.get_lineitems, model_id, True
+                )
+                for model_id in model_ids
+            ]
+            return cls(
+                (
+                    (model_id, lineitem)
+                    for model_id, response in zip(model_ids, responses)
+                    for lineitem in response.result().json().get("items", [])
+                ),
+                cell_sizes,
+            )
+
+    @classmethod
+    def from_snapshot(cls, snapshot: dict, cell_sizes: dict = None) -> LineItemStats:
+        """Load line items of all models from apapi.inventory.InventoryCrawler snapshot."""
+        return cls(
+            (
+                (model_id, lineitem)
+                for model_id, entry in snapshot["models"].items()
+                for lineitem in entry.get("lineitems", [])
+            ),
+            cell_sizes,
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def by_format(self) -> dict[str, dict]:
+        """Get cell count & size of each format (with their percentage of totals)."""
+        cells, sizes = self._sums(self.format_codes, len(self.format_labels))
+        total_cells, total_size = max(int(cells.sum()), 1), max(int(sizes.sum()), 1)
+        return {
+            str(label): {
+                "cellCount": int(cells[code]),
+                "size": int(sizes[code]),
+                "cellCount%": 100 * int(cells[code]) // total_cells,
+                "size%": 100 * int(sizes[code]) // total_size,
+            }
+            for code, label in enumerate(self.format_labels)
+        }
+
+    def by_model(self) -> list[dict]:
+        """Get cell count & size of each model - from the biggest."""
+        cells, sizes = self._sums(self.model_codes, len(self.model_labels))
+        return [
+            {
+                "modelId": label,
+                "cellCount": int(cells[code]),
+                "size": int(sizes[code]),
+            }
+            for code, label in self._biggest(self.model_labels, sizes)
+        ]
+
+    def by_module(self) -> list[dict]:
+        """Get cell count & size of each module - from the biggest."""
+        cells, sizes = self._sums(self.module_codes, len(self.module_labels))
+        return [
+            {
+                "modelId": label.split("/")[0],
+                "moduleId": label.split("/")[1],
+                "moduleName": self.module_names[label],
+                "cellCount": int(cells[code]),
+                "size": int(sizes[code]),
+            }
+            for code, label in self._biggest(self.module_labels, sizes)
+        ]
+
+    def by_list(self) -> list[dict]:
+        """Get cell count & size of line items dimensioned by each list - biggest first.
+
+        Line item is counted for each of lists it applies to, so sums of all lists
+        are bigger than totals.
+        """
+        cells = np.bincount(
+            self.list_codes,
+            self.cell_counts[self.list_items],
+            len(self.list_labels),
+        )
+        sizes = np.bincount(
+            self.list_codes, self.sizes[self.list_items], len(self.list_labels)
+        )
+        return [
+            {
+                "modelId": label.split("/")[0],
+                "listId": label.split("/")[1],
+                "listName": self.list_names[label],
+                "cellCount": int(cells[code]),
+                "size": int(sizes[code]),
+            }
+            for code, label in self._biggest(self.list_labels, sizes)
+        ]
+
+    def top(self, n: int = 10) -> list[dict]:
+        """Get n line items with the biggest estimated size - from the biggest."""
+        n = min(n, len(self))
+        if n <= 0:
+            return []
+        # partial sort - only the top n are sorted
+        indices = np.argpartition(-self.sizes, n - 1)[:n]
+        indices = indices[np.argsort(-self.sizes[indices], kind="stable")]
+        return [
+            {
+                "modelId": str(self.model_labels[self.model_codes[i]]),
+                "id": self.ids[i],
+                "name": self.names[i],
+                "moduleName": self.module_names[
+                    self.module_labels[self.module_codes[i]]
+                ],
+                "format": str(self.format_labels[self.format_codes[i]]),
+                "cellCount": int(self.cell_counts[i]),
+                "size": int(self.sizes[i]),
+            }
+            for i in indices
+        ]
+
+    def _sums(self, codes: np.ndarray, length: int) -> tuple[np.ndarray, np.ndarray]:
+        """Sum cell counts & sizes of line items grouped by codes."""
+        return (
+            np.bincount(codes, self.cell_counts, length).astype(np.int64),
+            np.bincount(codes, self.sizes, length).astype(np.int64),
+        )
+
+    @staticmethod
+    def _biggest(labels: np.ndarray, sizes: np.ndarray) -> Iterable[tuple[int, str]]:
+        return (
+            (int(code), str(labels[code])) for code in np.argsort(-sizes, kind="stable")
+        )
+
+
+def _encode(values: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Get sorted unique labels of values, and codes (indices of labels) of values."""
+    if not values:
+        return np.zeros(0, dtype=str), np.zeros(0, dtype=np.int64)
+    # fixed-width strings are sorted much faster than objects
+    labels, codes = np.unique(np.array(values, dtype=str), return_inverse=True)
+    return labels, codes.astype(np.int64).ravel()
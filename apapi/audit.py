@@ -5,7 +5,9 @@ Child of Basic Connection class, responsible for Audit API capabilities
 """
 from __future__ import annotations
 
+import codecs
 import json
+from typing import Iterable, Iterator
 
 from requests import Response
 
@@ -13,6 +15,86 @@ from .authentication import AbstractAuth
 from .basic_connection import BasicConnection
 from .utils import API_URL, AUDIT_URL, PAGING_LIMIT, AuditEventType, MIMEType
 
+STREAM_CHUNK_SIZE = 1 << 16
+"""Size of chunks in which streamed responses are read."""
+
+
+def iter_json_array(chunks: Iterable[bytes], key: str) -> Iterator:
+    """Incrementally parse items of array under the key of JSON object (top level).
+
+    Only one item (and a chunk of data) is kept in memory at a time -
+    other values of the object are parsed and dropped.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer, position, finished = "", 0, False
+
+    def fill() -> bool:
+        """Append next chunk to the buffer (dropping its parsed part)."""
+        nonlocal buffer, position, finished
+        if finished:
+            return False
+        chunk = next(chunks, None)
+        finished = chunk is None
+        buffer = buffer[position:] + text_decoder.decode(chunk or b"", finished)
+        position = 0
+        return True
+
+    def skip(expected: str = None) -> str:
+        """Skip whitespaces and get next character (checking if it's expected)."""
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer):
+                break
+            if not fill():
+                raise ValueError("Unexpected end of JSON data")
+        character = buffer[position]
+        if expected and character not in expected:
+            raise ValueError(f"Expected {expected!r} but got {character!r} in JSON")
+        return character
+
+    def value():
+        """Parse next value - only if it's surely complete (or data has ended)."""
+        nonlocal position
+        skip()
+        while True:
+            try:
+                result, end = decoder.raw_decode(buffer, position)
+                # i.e. number at the end of buffer might be continued in next chunk
+                if end < len(buffer) or finished:
+                    position = end
+                    return result
+            except json.JSONDecodeError:
+                if finished:
+                    raise
+            fill()
+
+    skip("{")
+    position += 1
+    if skip() == "}":
+        return
+    while True:
+        name = value()
+        skip(":")
+        position += 1
+        if name == key and skip() == "[":
+            position += 1
+            if skip() != "]":
+                while True:
+                    yield value()
+                    if skip(",]") == "]":
+                        break
+                    position += 1
+            position += 1
+        else:
+            value()
+        if skip(",}") == "}":
+            return
+        position += 1
+
 
 class AuditConnection(BasicConnection):
     """Anaplan connection with Audit API functions."""
@@ -83,3 +165,76 @@ class AuditConnection(BasicConnection):
             data=json.dumps(data),
             headers={"Accept": accept.value} if accept else None,
         )
+
+    def iter_events(
+        self,
+        event_type: AuditEventType = AuditEventType.ALL,
+        accept: MIMEType = MIMEType.APP_JSON,
+        date_from: int = None,
+        date_to: int = None,
+        interval: int = None,
+    ) -> Iterator[dict]:
+        """Retrieve Audit Events for tenant one by one, parsed from streamed response.
+
+        Alternative of AuditConnection.get_events() with constant memory usage -
+        accept should be either JSON or plain text (event per line).
+        """
+        params = {"type": event_type.value, "limit": PAGING_LIMIT}
+        if date_from:
+            params["dateFrom"] = date_from
+        if date_to:
+            params["dateTo"] = date_to
+        if interval:
+            params["intervalInHours"] = interval
+        return self._span_iter(
+            "iter_events",
+            self._iter_streamed_events(
+                "GET", f"{self._audit_url}/events", params, None, accept
+            ),
+        )
+
+    def iter_search_events(
+        self,
+        event_type: AuditEventType = AuditEventType.ALL,
+        accept: MIMEType = MIMEType.APP_JSON,
+        date_from: int = None,
+        date_to: int = None,
+        interval: int = None,
+    ) -> Iterator[dict]:
+        """Retrieve Audit Events for tenant one by one, parsed from streamed response.
+
+        Alternative of AuditConnection.search_events() with constant memory usage -
+        accept should be either JSON or plain text (event per line).
+        """
+        data = {}
+        if date_from:
+            data["from"] = date_from
+        if date_to:
+            data["to"] = date_to
+        if interval:
+            data["interval"] = interval
+        return self._span_iter(
+            "iter_search_events",
+            self._iter_streamed_events(
+                "POST",
+                f"{self._audit_url}/events/search",
+                {"type": event_type.value, "limit": PAGING_LIMIT},
+                json.dumps(data),
+                accept,
+            ),
+        )
+
+    def _iter_streamed_events(
+        self, method: str, url: str, params: dict, data, accept: MIMEType
+    ) -> Iterator[dict]:
+        response = self.request(
+            method, url, params, data, {"Accept": accept.value}, stream=True
+        )
+        with response:
+            if accept == MIMEType.TEXT_PLAIN:
+                for line in response.iter_lines(STREAM_CHUNK_SIZE):
+                    if line.strip():
+                        yield json.loads(line)
+            else:
+                chunks = response.iter_content(STREAM_CHUNK_SIZE)
+                yield from iter_json_array(chunks, "response")
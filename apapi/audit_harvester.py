@@ -0,0 +1,143 @@
+"""
+apapi.audit_harvester
+
+This module provides incremental harvesting of audit events - time range is split
+into windows fetched in parallel, and events are appended to a compressed JSON-lines
+file, with watermark saved after each window, so the next run fetches only new ones.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from time import time
+from typing import Optional
+
+from .audit import AuditConnection
+from .audit_store import AuditStore
+from .utils import AuditEventType, MIMEType
+
+
+class AuditHarvester:
+    """Harvests audit events of the tenant into a gzipped JSON-lines sink file.
+
+    Watermark (end of the last harvested window minus safety lag, with IDs of events
+    harvested since then) is kept in the state file - next harvest starts from it,
+    and skips already harvested events. It moves also after windows without events,
+    so they are not fetched again. Events newer than settle time (in ms) are left
+    for the next run, as they might not all be available yet. If the process is
+    stopped between writing a window and saving the state, events of that window
+    are harvested again.
+    """
+
+    def __init__(
+        self,
+        connection: AuditConnection,
+        sink_path: str,
+        state_path: str = None,
+        window: int = 3600000,
+        max_workers: int = 4,
+        event_type: AuditEventType = AuditEventType.ALL,
+        settle_time: int = 60000,
+        store: AuditStore = None,
+        safety_lag: int = 1000,
+    ):
+        self.connection: AuditConnection = connection
+        self.sink_path: str = sink_path
+        """Path of gzipped JSON-lines file, to which events are appended."""
+        self.state_path: str = state_path or f"{sink_path}.state.json"
+        """Path of JSON file with the watermark."""
+        self.window: int = window
+        """Size of time windows (in ms) - each is fetched by separate request."""
+        self.max_workers: int = max_workers
+        self.event_type: AuditEventType = event_type
+        self.settle_time: int = settle_time
+        self.store: Optional[AuditStore] = store
+        """If set, harvested events are inserted to this store as well."""
+        self.safety_lag: int = safety_lag
+        """Time (in ms, shorter than window) before window end, from which events
+        are fetched again by the next window or harvest - in case some were late."""
+
+    def load_state(self) -> dict:
+        """Get watermark - {"watermark": date in ms, "ids": [IDs of events since]}."""
+        try:
+            with open(self.state_path, encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {"watermark": None, "ids": []}
+
+    def harvest(self, date_from: int = None, date_to: int = None) -> int:
+        """Append events newer than the watermark (or date from, if there is none).
+
+        Dates are epoch in ms - date to defaults to now minus settle time.
+        Returns number of appended events.
+        """
+        state = self.load_state()
+        start = state["watermark"] if state["watermark"] is not None else date_from
+        if start is None:
+            raise ValueError("Date from is needed for the first harvest")
+        end = date_to or int(time() * 1000) - self.settle_time
+        seen = set(state["ids"])
+        windows = [
+            (window_start, min(window_start + self.window, end + 1) - 1)
+            for window_start in range(start, end + 1, self.window)
+        ]
+        written = 0
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            pending = deque()
+            for window_start, window_end in windows:
+                pending.append(
+                    executor.submit(
+                        copy_context().run, self._fetch, window_start, window_end
+                    )
+                )
+                # keep only a few windows in memory, as they are written in order
+                if len(pending) >= 2 * self.max_workers:
+                    written += self._write(*pending.popleft().result(), state, seen)
+            while pending:
+                written += self._write(*pending.popleft().result(), state, seen)
+        return written
+
+    def _fetch(self, date_from: int, date_to: int) -> tuple[list[dict], int]:
+        events = self.connection.iter_search_events(
+            self.event_type, MIMEType.APP_JSON, date_from, date_to
+        )
+        return sorted(events, key=lambda event: event["eventDate"]), date_to
+
+    def _write(self, events: list[dict], date_to: int, state: dict, seen: set) -> int:
+        """Append new events to sink and move the watermark (saving the state)."""
+        new_events = [event for event in events if event["id"] not in seen]
+        if new_events:
+            with gzip.open(self.sink_path, "at", encoding="utf-8") as sink:
+                sink.writelines(json.dumps(event) + "\n" for event in new_events)
+            if self.store is not None:
+                self.store.add(new_events)
+        # moved even without events, but not back (i.e. for windows shorter than lag)
+        watermark = date_to + 1 - self.safety_lag
+        if state["watermark"] is None or watermark > state["watermark"]:
+            state["watermark"], state["ids"] = watermark, []
+            seen.clear()
+        ids = [
+            event["id"]
+            for event in events
+            if event["eventDate"] >= state["watermark"] and event["id"] not in seen
+        ]
+        state["ids"] += ids
+        seen.update(ids)
+        self._save_state(state)
+        return len(new_events)
+
+    def _save_state(self, state: dict) -> None:
+        temp_path = f"{self.state_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(state, file)
+        os.replace(temp_path, self.state_path)
+
+
+def read_events(path: str) -> list[dict]:
+    """Read all events from a sink file of AuditHarvester."""
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        return [json.loads(line) for line in file]
@@ -0,0 +1,178 @@
+"""
+apapi.audit_store
+
+This module provides a local store of audit events (in SQLite database), indexed
+for fast querying by date, user, object (i.e. model) and event type - so audit data
+can be kept and queried long after Anaplan drops it (after 30 days).
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import sqlite3
+from itertools import islice
+from threading import Lock
+from typing import Iterable, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id TEXT PRIMARY KEY,
+    event_date INTEGER NOT NULL,
+    event_type_id TEXT,
+    user_id TEXT,
+    object_id TEXT,
+    object_type_id TEXT,
+    success INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_date ON events (event_date);
+CREATE INDEX IF NOT EXISTS events_user ON events (user_id, event_date);
+CREATE INDEX IF NOT EXISTS events_object ON events (object_id, event_date);
+CREATE INDEX IF NOT EXISTS events_type ON events (event_type_id, event_date);
+"""
+
+
+class AuditStore:
+    """SQLite store of audit events - events are identified (and deduplicated) by ID.
+
+    Events can be added from any iterable (i.e. AuditConnection.iter_events()),
+    or from a sink file of apapi.audit_harvester.AuditHarvester. Store can be used
+    by many threads (operations are serialized).
+    """
+
+    def __init__(self, path: str = ":memory:", batch_size: int = 10000):
+        self.path: str = path
+        """Path of the SQLite database file."""
+        self.batch_size: int = batch_size
+        """Number of events inserted in one transaction."""
+        self._lock: Lock = Lock()
+        self._db: sqlite3.Connection = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def add(self, events: Iterable[dict]) -> int:
+        """Insert events (skipping already stored ones) - returns number of new ones."""
+        events = iter(events)
+        added = 0
+        while batch := list(islice(events, self.batch_size)):
+            rows = [
+                (
+                    event["id"],
+                    event["eventDate"],
+                    event.get("eventTypeId"),
+                    event.get("userId"),
+                    event.get("objectId"),
+                    event.get("objectTypeId"),
+                    event.get("success"),
+                    json.dumps(event),
+                )
+                for event in batch
+            ]
+            with self._lock, self._db:
+                before = self._db.total_changes
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+                )
+                added += self._db.total_changes - before
+        return added
+
+    def add_file(self, path: str) -> int:
+        """Insert events from gzipped JSON-lines file (i.e. sink of AuditHarvester)."""
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            return self.add(json.loads(line) for line in file if line.strip())
+
+    def query(
+        self,
+        date_from: int = None,
+        date_to: int = None,
+        user_id: str = None,
+        object_id: str = None,
+        event_type: str = None,
+        limit: int = None,
+        newest_first: bool = False,
+    ) -> list[dict]:
+        """Get events matching all given filters, ordered by date.
+
+        Dates are epoch in ms (both inclusive), event type can end with "*"
+        to match a prefix (i.e. "model.*").
+        """
+        where, parameters = self._filters(
+            date_from, date_to, user_id, object_id, event_type
+        )
+        sql = f"SELECT data FROM events{where} ORDER BY event_date"
+        if newest_first:
+            sql += " DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+        with self._lock:
+            rows = self._db.execute(sql, parameters).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def count(
+        self,
+        date_from: int = None,
+        date_to: int = None,
+        user_id: str = None,
+        object_id: str = None,
+        event_type: str = None,
+    ) -> int:
+        """Get number of events matching all given filters (as in AuditStore.query)."""
+        where, parameters = self._filters(
+            date_from, date_to, user_id, object_id, event_type
+        )
+        with self._lock:
+            return self._db.execute(
+                f"SELECT COUNT(*) FROM events{where}", parameters
+            ).fetchone()[0]
+
+    def latest_date(self) -> Optional[int]:
+        """Get date (epoch in ms) of the newest stored event - None if store is empty."""
+        with self._lock:
+            return self._db.execute("SELECT MAX(event_date) FROM events").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._db.close()
+
+    @staticmethod
+    def _filters(
+        date_from: int,
+        date_to: int,
+        user_id: str,
+        object_id: str,
+        event_type: str,
+    ) -> tuple[str, list]:
+        conditions, parameters = [], []
+        if date_from is not None:
+            conditions.append("event_date >= ?")
+            parameters.append(date_from)
+        if date_to is not None:
+            conditions.append("event_date <= ?")
+            parameters.append(date_to)
+        if user_id is not None:
+            conditions.append("user_id = ?")
+            parameters.append(user_id)
+        if object_id is not None:
+            conditions.append("object_id = ?")
+            parameters.append(object_id)
+        if event_type is not None:
+            if event_type.endswith("*"):
+                # range instead of LIKE, so the index can be used
+                conditions.append("event_type_id >= ? AND event_type_id < ?")
+                prefix = event_type[:-1]
+                parameters += [prefix, prefix + "\uffff"]
+            else:
+                conditions.append("event_type_id = ?")
+                parameters.append(event_type)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where, parameters
@@ -10,14 +10,17 @@ import logging
 from abc import ABC, abstractmethod
 from base64 import b64encode
 from enum import Enum
-from threading import Lock, Timer
+from threading import Lock
 from time import time
 from typing import Callable, Optional
 
-from requests import Session
+from requests import Response, Session
 from requests.auth import AuthBase
 
-from apapi.utils import AUTH_URL, OAUTH2_URL, get_generic_session
+from apapi.rate_limiting import RateLimiter
+from apapi.refresh_scheduler import RefreshScheduler, ScheduledRefresh
+from apapi.token_store import FileTokenStore
+from apapi.utils import AUTH_URL, DEFAULT_POOL_SIZE, OAUTH2_URL, get_generic_session
 
 
 class AnaplanAuth(AuthBase):
@@ -45,21 +48,63 @@ class AuthType(Enum):
 
 
 class AbstractAuth(ABC):
-    """Abstract authentication class."""
+    """Abstract authentication class.
+
+    Authenticated session (and so the connections using it) can be safely shared
+    between threads - pool max size should be then at least the number of threads,
+    or pool block should be set (so threads wait for a free connection).
+    Pool parameters are ignored if session is provided.
+    Rate limiter (by default adapting to throttling seen) is shared the same way.
+    With token store, token is shared with other processes (see FileTokenStore).
+    Token is refreshed ahead of expiration by refresh scheduler (by default the one
+    shared by all authentication objects - see RefreshScheduler).
+    """
 
     def __init__(
-        self, auth_url: str = AUTH_URL, session: Session = get_generic_session()
+        self,
+        auth_url: str = AUTH_URL,
+        session: Session = None,
+        pool_connections: int = DEFAULT_POOL_SIZE,
+        pool_maxsize: int = DEFAULT_POOL_SIZE,
+        pool_block: bool = False,
+        rate_limiter: RateLimiter = None,
+        token_store: FileTokenStore = None,
+        refresh_scheduler: RefreshScheduler = None,
     ):
         self._auth_url = auth_url
         self._lock: Lock = Lock()
-        self._timer: Optional[Timer] = None
-
-        self.session: Session = session
+        self._refresh_scheduler: RefreshScheduler = (
+            refresh_scheduler or RefreshScheduler.default()
+        )
+        self._scheduled_refresh: Optional[ScheduledRefresh] = None
+        self._token: Optional[str] = None
+        self._expires_at: float = 0.0
+
+        self.session: Session = session or get_generic_session(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+        )
         """Session holding headers (including authentication token) and adapters
         used for communication with all Anaplan API endpoints."""
+        self.rate_limiter: RateLimiter = rate_limiter or RateLimiter()
+        """Rate limiter with separate budget for each host (auth, API, audit...),
+        used by all requests sent using the session."""
+        self.token_store: Optional[FileTokenStore] = token_store
+        """If set, token is taken from (and saved to) this store shared by processes."""
 
         logging.info(f"Trying to authenticate using {self.auth_type.value} auth...")
-        self.authenticate()
+        if self.token_store is None:
+            self.authenticate()
+        else:
+            with self.token_store.lock():
+                stored = self.token_store.load(self._store_key)
+                if stored is None:
+                    self.authenticate()
+                    self._save_token()
+                else:
+                    logging.info("Using token from the token store")
+                    self._set_token(*stored)
         logging.info(f"Authentication successful!")
 
     def __enter__(self):
@@ -79,37 +124,91 @@ class AbstractAuth(ABC):
         """Abstract method - implementation should put Anaplan Auth Token in session."""
         pass
 
+    def _request(self, method: str, url: str, **kwargs) -> Response:
+        """Send request using the session, within rate limit of the URL's host."""
+        return self.rate_limiter.call(
+            url, lambda: self.session.request(method, url, **kwargs)
+        )
+
+    @property
+    def _store_key(self) -> str:
+        """Key of the token in token store - it should identify the credentials."""
+        return FileTokenStore.key(self.auth_type.value, self._auth_url)
+
     def _handle_token(self, token_info: dict) -> None:
-        self.session.auth = AnaplanAuth("AnaplanAuthToken " + token_info["tokenValue"])
         # Anaplan yields "expiresAt" in ms, that's why we need to divide it by 1000
-        self._timer = Timer(token_info["expiresAt"] / 1000 - time(), self.refresh_token)
-        self._timer.start()
+        self._set_token(token_info["tokenValue"], token_info["expiresAt"] / 1000)
+
+    def _set_token(self, token: str, expires_at: float) -> None:
+        """Put token in session and schedule its refresh ahead of expiration time."""
+        self._token, self._expires_at = token, expires_at
+        self.session.auth = AnaplanAuth("AnaplanAuthToken " + token)
+        self._refresh_scheduler.cancel(self._scheduled_refresh)
+        self._scheduled_refresh = self._refresh_scheduler.schedule(
+            self.refresh_token, expires_at
+        )
 
-    def refresh_token(self) -> None:
-        """Refresh Anaplan Authentication Service Token."""
-        # skip if other thread is already taking care of refreshing the token
-        if not self._lock.locked():
+    def _save_token(self) -> None:
+        self.token_store.save(self._store_key, self._token, self._expires_at)
+
+    @property
+    def token(self) -> Optional[str]:
+        """Current Anaplan Authentication Service Token."""
+        return self._token
+
+    def refresh_token(self, rejected: str = None) -> None:
+        """Refresh Anaplan Authentication Service Token.
+
+        Token rejected by the server (with 401) should be given - it's refreshed only
+        if it wasn't already, by other thread or (as in token store) by other process.
+        """
+        if rejected is None:
+            # skip if other thread is already taking care of refreshing the token
+            if not self._lock.acquire(blocking=False):
+                return
+        else:
+            # wait for refresh by other thread, which might have replaced the token
+            self._lock.acquire()
+            if self._token != rejected:
+                self._lock.release()
+                return
+        try:
             logging.info(f"Trying to refresh auth token...")
-            with self._lock:
-                try:
-                    response = self.session.post(f"{self._auth_url}/token/refresh")
-                except Exception:
-                    self.authenticate()
-                self._timer.cancel()
-                self._handle_token(response.json()["tokenInfo"])
-                logging.info(f"Auth token refresh successful!")
+            if self.token_store is None:
+                self._refresh()
+            else:
+                with self.token_store.lock():
+                    stored = self.token_store.load(self._store_key)
+                    # other process might have refreshed (and so replaced) our token
+                    if stored is not None and stored[0] != self._token:
+                        logging.info("Using refreshed token from the token store")
+                        self._set_token(*stored)
+                    else:
+                        self._refresh()
+                        self._save_token()
+            logging.info(f"Auth token refresh successful!")
+        finally:
+            self._lock.release()
+
+    def _refresh(self) -> None:
+        try:
+            response = self._request("POST", f"{self._auth_url}/token/refresh")
+            self._handle_token(response.json()["tokenInfo"])
+        except Exception:
+            logging.warning(f"Auth token refresh failed, authenticating again...")
+            self.authenticate()
 
     def validate_token(self) -> bool:
         """Check if authentication token is valid."""
-        return self.session.get(f"{self._auth_url}/token/validate").ok
+        return self._request("GET", f"{self._auth_url}/token/validate").ok
 
     def close(self) -> None:
-        """Logout from Anaplan Authentication Service."""
+        """Logout from Anaplan Authentication Service (unless token is shared)."""
         try:
-            if self._timer:
-                self._timer.cancel()
-            self.session.post(f"{self._auth_url}/token/logout")
-            logging.info(f"Logout successful!")
+            self._refresh_scheduler.cancel(self._scheduled_refresh)
+            if self.token_store is None:
+                self._request("POST", f"{self._auth_url}/token/logout")
+                logging.info(f"Logout successful!")
         finally:
             self.session.close()
 
@@ -121,23 +220,42 @@ class BasicAuth(AbstractAuth):
         self,
         credentials: str,
         auth_url: str = AUTH_URL,
-        session: Session = get_generic_session(),
+        session: Session = None,
+        pool_connections: int = DEFAULT_POOL_SIZE,
+        pool_maxsize: int = DEFAULT_POOL_SIZE,
+        pool_block: bool = False,
+        rate_limiter: RateLimiter = None,
+        token_store: FileTokenStore = None,
+        refresh_scheduler: RefreshScheduler = None,
     ):
         self._credentials: str = credentials
-        super().__init__(auth_url, session)
+        super().__init__(
+            auth_url,
+            session,
+            pool_connections,
+            pool_maxsize,
+            pool_block,
+            rate_limiter,
+            token_store,
+            refresh_scheduler,
+        )
 
     @property
     def auth_type(self) -> AuthType:
         """Indicator that this class uses Basic Authentication."""
         return AuthType.BASIC
 
+    @property
+    def _store_key(self) -> str:
+        return FileTokenStore.key(
+            self.auth_type.value, self._auth_url, self._credentials
+        )
+
     def authenticate(self) -> None:
         """Acquire Anaplan Authentication Service Token using Basic Authentication."""
         auth_string = b64encode(self._credentials.encode()).decode()
         self.session.auth = AnaplanAuth(f"{self.auth_type.value} {auth_string}")
-        response = self.session.post(
-            f"{self._auth_url}/token/authenticate",
-        )
+        response = self._request("POST", f"{self._auth_url}/token/authenticate")
         self._handle_token(response.json()["tokenInfo"])
 
 
@@ -153,18 +271,39 @@ class OAuth2NonRotatable(AbstractAuth):
         refresh_token: str,
         oauth2_url: str = OAUTH2_URL,
         auth_url: str = AUTH_URL,
-        session: Session = get_generic_session(),
+        session: Session = None,
+        pool_connections: int = DEFAULT_POOL_SIZE,
+        pool_maxsize: int = DEFAULT_POOL_SIZE,
+        pool_block: bool = False,
+        rate_limiter: RateLimiter = None,
+        token_store: FileTokenStore = None,
+        refresh_scheduler: RefreshScheduler = None,
     ):
         self._client_id: str = client_id
         self._refresh_token: str = refresh_token
         self._oauth2_url = oauth2_url
-        super().__init__(auth_url, session)
+        super().__init__(
+            auth_url,
+            session,
+            pool_connections,
+            pool_maxsize,
+            pool_block,
+            rate_limiter,
+            token_store,
+            refresh_scheduler,
+        )
 
     @property
     def auth_type(self) -> AuthType:
         """Indicator that this class uses OAuth2 Non-Rotatable Authentication."""
         return AuthType.OAUTH2_NONROTATABLE
 
+    @property
+    def _store_key(self) -> str:
+        return FileTokenStore.key(
+            self.auth_type.value, self._oauth2_url, self._client_id, self._refresh_token
+        )
+
     def authenticate(self) -> None:
         """Acquire Anaplan Authentication Service Token using OAuth2 Service."""
         data = {
@@ -172,15 +311,13 @@ class OAuth2NonRotatable(AbstractAuth):
             "client_id": self._client_id,
             "refresh_token": self._refresh_token,
         }
-        response = self.session.post(
-            f"{self._oauth2_url}/oauth/token", data=json.dumps(data)
+        response = self._request(
+            "POST", f"{self._oauth2_url}/oauth/token", data=json.dumps(data)
         ).json()
         if "access_token" not in response:
             logging.error(f"Tried to authenticate, access token missing: {response}")
             raise ConnectionError("Unable to authenticate")
-        self.session.auth = AnaplanAuth("AnaplanAuthToken " + response["access_token"])
-        self._timer = Timer(response["expires_in"], self.refresh_token)
-        self._timer.start()
+        self._set_token(response["access_token"], time() + response["expires_in"])
 
 
 class OAuth2Rotatable(AbstractAuth):
@@ -196,33 +333,68 @@ class OAuth2Rotatable(AbstractAuth):
         refresh_token_setter: Callable[[str], None],
         oauth2_url: str = OAUTH2_URL,
         auth_url: str = AUTH_URL,
-        session: Session = get_generic_session(),
+        session: Session = None,
+        pool_connections: int = DEFAULT_POOL_SIZE,
+        pool_maxsize: int = DEFAULT_POOL_SIZE,
+        pool_block: bool = False,
+        rate_limiter: RateLimiter = None,
+        token_store: FileTokenStore = None,
+        refresh_scheduler: RefreshScheduler = None,
     ):
         self._client_id: str = client_id
         self._refresh_token_getter = refresh_token_getter
         self._refresh_token_setter = refresh_token_setter
+        self._refresh_token: Optional[str] = None
         self._oauth2_url = oauth2_url
-        super().__init__(auth_url, session)
+        super().__init__(
+            auth_url,
+            session,
+            pool_connections,
+            pool_maxsize,
+            pool_block,
+            rate_limiter,
+            token_store,
+            refresh_scheduler,
+        )
 
     @property
     def auth_type(self) -> AuthType:
         """Indicator that this class uses OAuth2 Rotatable Authentication."""
         return AuthType.OAUTH2_ROTATABLE
 
+    @property
+    def _store_key(self) -> str:
+        # refresh token changes with each rotation, so it can't be a part of the key
+        return FileTokenStore.key(
+            self.auth_type.value, self._oauth2_url, self._client_id
+        )
+
+    def _save_token(self) -> None:
+        # rotated refresh token is shared too, as previous one is no longer valid
+        self.token_store.save(
+            self._store_key, self._token, self._expires_at, self._refresh_token
+        )
+
     def authenticate(self) -> None:
-        """Acquire Anaplan Authentication Service Token using OAuth2 Service."""
+        """Acquire Anaplan Authentication Service Token using OAuth2 Service.
+
+        With token store, refresh token is taken from (and after rotation saved to)
+        the store, as other processes might have already rotated the given one.
+        """
+        stored = None
+        if self.token_store is not None:
+            stored = self.token_store.load_refresh_token(self._store_key)
         data = {
             "grant_type": "refresh_token",
             "client_id": self._client_id,
-            "refresh_token": self._refresh_token_getter(),
+            "refresh_token": stored or self._refresh_token_getter(),
         }
-        response = self.session.post(
-            f"{self._oauth2_url}/oauth/token", data=json.dumps(data)
+        response = self._request(
+            "POST", f"{self._oauth2_url}/oauth/token", data=json.dumps(data)
         ).json()
-        self._refresh_token_setter(response["refresh_token"])
+        self._refresh_token = response["refresh_token"]
+        self._refresh_token_setter(self._refresh_token)
         if "access_token" not in response:
             logging.error(f"Tried to authenticate, access token missing: {response}")
             raise ConnectionError("Unable to authenticate")
-        self.session.auth = AnaplanAuth("AnaplanAuthToken " + response["access_token"])
-        self._timer = Timer(response["expires_in"], self.refresh_token)
-        self._timer.start()
+        self._set_token(response["access_token"], time() + response["expires_in"])
@@ -7,15 +7,33 @@ which should be used to connect to Anaplan APIs.
 from __future__ import annotations
 
 import logging
+from contextlib import nullcontext
+from time import monotonic
+from typing import Callable, ContextManager, Iterator, Optional
 
 from requests import Response, Session
 
 from .authentication import AbstractAuth
-from .utils import API_URL
+from .metrics import MetricsCollector, endpoint_template
+from .tracing import Span, Tracer, url_ids
+from .utils import API_URL, ENCODING_GZIP, MIMEType
+
+UNAUTHORIZED = 401
+
+_REPLAYABLE = (str, bytes, bytearray, memoryview, dict)
+"""Types of request bodies which can be sent again (unlike generators or files)."""
 
 
 class BasicConnection:
-    """Basic Anaplan connection. Provides basic requesting and initialization."""
+    """Basic Anaplan connection. Provides basic requesting and initialization.
+
+    Connection can be used by many threads at once - all of them share the session
+    (and its connection pool) of the authentication object, so its pool max size
+    should be adjusted to the number of threads (see apapi.authentication.AbstractAuth).
+    Requests are sent within limits of authentication's rate limiter, which is shared
+    the same way - throttled (429) requests are retried by it, respecting Retry-After.
+    Requests rejected as unauthorized (401) are retried once, after token refresh.
+    """
 
     def __init__(
         self,
@@ -34,18 +52,202 @@ class BasicConnection:
         """Timeout (in seconds) of all requests exchanged with Anaplan API."""
         self.authentication: AbstractAuth = authentication
         """Authentication object which should contain authenticated session """
+        self.metrics: Optional[MetricsCollector] = None
+        """If set, metrics of all requests are recorded in this collector."""
+        self.tracer: Optional[Tracer] = None
+        """If set, operations and their requests are traced as spans by this tracer."""
 
     def request(
-        self, method: str, url: str, params: dict = None, data=None, headers=None
+        self,
+        method: str,
+        url: str,
+        params: dict = None,
+        data=None,
+        headers=None,
+        stream: bool = False,
     ) -> Response:
-        """Default wrapper of session's request method."""
+        """Default wrapper of session's request method.
+
+        With stream set, body of successful response is not downloaded up front -
+        it should be consumed (i.e. using Response.iter_content()) and closed, as its
+        metrics (with bytes read until then) are recorded when it's closed.
+        """
         logging.info(f"{method}\t{url}")
-        response = self._session.request(
-            method, url, params, data, headers, timeout=self.timeout
-        )
-        if not response.ok:
-            logging.error(
-                f"{method} failed with {response.status_code}\t{url}\t{response.content}"
-            )
-            raise Exception("Request failed", url, response.text)
+        with self._request_span(method, url) as span:
+            attempts = 0
+            sent = 0.0
+            # time spent in sending attempts - the rest is waiting for rate limiter
+            busy = 0.0
+
+            def send() -> Response:
+                nonlocal attempts, sent, busy
+                attempts += 1
+                sent = monotonic()
+                try:
+                    return self._session.request(
+                        method,
+                        url,
+                        params,
+                        data,
+                        headers,
+                        timeout=self.timeout,
+                        stream=stream,
+                    )
+                finally:
+                    busy += monotonic() - sent
+
+            start = monotonic()
+            replayable = data is None or isinstance(data, _REPLAYABLE)
+            try:
+                token = self.authentication.token
+                response = self.authentication.rate_limiter.call(url, send, replayable)
+                if response.status_code == UNAUTHORIZED and replayable:
+                    # token expired or was replaced (i.e. by other process) - retry
+                    response.close()
+                    self.authentication.refresh_token(token)
+                    response = self.authentication.rate_limiter.call(
+                        url, send, replayable
+                    )
+            except Exception:
+                if self.metrics is not None:
+                    wait_time = monotonic() - start - busy
+                    self.metrics.record(method, url, 0, busy, wait_time=wait_time)
+                raise
+            self._observe(response, start, sent, busy, attempts - 1, span, stream)
+            if not response.ok:
+                logging.error(
+                    f"{method} failed with {response.status_code}\t{url}\t{response.content}"
+                )
+                response.close()  # body is read already, but streamed one is open
+                raise Exception("Request failed", url, response.text)
         return response
+
+    def _download_headers(self, accept: MIMEType, compress: bool = None) -> dict:
+        """Get headers for download of data - compressed in transfer, if requested.
+
+        Compressed responses are decompressed by requests (also when streamed, chunk
+        by chunk), so callers always get the original data.
+        """
+        headers = {"Accept": accept.value}
+        if compress or (compress is None and self.compress):
+            headers["Accept-Encoding"] = ENCODING_GZIP
+        return headers
+
+    def _span(self, name: str, **attributes) -> ContextManager[Optional[Span]]:
+        """Trace an operation using connection's tracer (if set)."""
+        if self.tracer is None:
+            return nullcontext()
+        return self.tracer.span(name, **attributes)
+
+    def _request_span(self, method: str, url: str) -> ContextManager[Optional[Span]]:
+        """Trace a request - its name & IDs are parsed from URL only if it's traced."""
+        if self.tracer is None:
+            return nullcontext()
+        return self.tracer.span(f"{method} {endpoint_template(url)}", **url_ids(url))
+
+    @staticmethod
+    def _record_on_close(response: Response, record: Callable[[int], None]) -> None:
+        """Make streamed response record bytes read until it's closed (once).
+
+        Chunked bodies have no declared size, and urllib3 doesn't count their bytes
+        read from the wire - so then bytes consumed (after decompression) are used.
+        """
+        iter_content, close = response.iter_content, response.close
+        consumed = 0
+
+        def counting_iter_content(*args, **kwargs) -> Iterator:
+            nonlocal consumed
+            for chunk in iter_content(*args, **kwargs):
+                consumed += len(chunk)
+                yield chunk
+
+        def close_and_record() -> None:
+            response.close = close
+            tell = getattr(response.raw, "tell", None)
+            record((tell() if tell is not None else 0) or consumed)
+            close()
+
+        response.iter_content, response.close = counting_iter_content, close_and_record
+
+    def _span_iter(self, name: str, items: Iterator, **attributes) -> Iterator:
+        """Lazily iterate over items (obtained by requests) within one span."""
+        if self.tracer is None:
+            yield from items
+            return
+        span = self.tracer.start_span(name, **attributes)
+        try:
+            while True:
+                with self.tracer.activate(span):
+                    try:
+                        item = next(items)
+                    except StopIteration:
+                        break
+                yield item
+        except GeneratorExit:
+            span.end()
+            raise
+        except BaseException as error:
+            span.end(error)
+            raise
+        span.end()
+
+    def _observe(
+        self,
+        response: Response,
+        start: float,
+        sent: float,
+        busy: float,
+        retries: int,
+        span: Optional[Span],
+        stream: bool = False,
+    ) -> None:
+        """Record metrics & trace details of a request (with urllib3 retries).
+
+        Busy is time spent by sending attempts, so latency excludes rate limiting.
+        """
+        if self.metrics is None and span is None:
+            return
+        end = monotonic()
+        throttle_time = max(end - start - busy, 0.0)
+        urllib3_retries = getattr(response.raw, "retries", None)
+        if urllib3_retries is not None:
+            retries += len(urllib3_retries.history)
+        request = response.request
+        bytes_out = int(request.headers.get("Content-Length", 0))
+
+        def record(bytes_in: int) -> None:
+            self.metrics.record(
+                request.method,
+                request.url,
+                response.status_code,
+                busy,
+                bytes_out,
+                bytes_in,
+                retries,
+                throttle_time,
+            )
+
+        if stream:  # body is not downloaded yet - only its declared size is known
+            bytes_in = int(response.headers.get("Content-Length", 0))
+            if self.metrics is not None:
+                self._record_on_close(response, record)
+        else:
+            # bytes read from the wire - before decompression (if it was compressed),
+            # unless they were chunked (not counted by urllib3)
+            tell = getattr(response.raw, "tell", None)
+            bytes_in = (tell() if tell is not None else 0) or len(response.content)
+            if self.metrics is not None:
+                record(bytes_in)
+        if span is not None:
+            # elapsed is time until response headers came, so it's mostly server time
+            wait_time = response.elapsed.total_seconds()
+            span.set(
+                status_code=response.status_code,
+                retries=retries,
+                requests=1,
+                bytes_out=bytes_out,
+                bytes_in=bytes_in,
+                throttle_time=throttle_time,
+                wait_time=wait_time,
+                transfer_time=max(end - sent - wait_time, 0.0),
+            )
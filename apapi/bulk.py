@@ -6,11 +6,25 @@ Child of Basic Connection class, responsible for Bulk API capabilities
 from __future__ import annotations
 
 import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from itertools import chain
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Optional, Union
 
 from requests import Response
 
 from .basic_connection import BasicConnection
-from .utils import DEFAULT_DATA, MIMEType
+from .results import Chunks
+from .utils import DEFAULT_DATA, FILE_CHUNK_SIZE, MIMEType
+
+if TYPE_CHECKING:
+    from .transform import CSVTransform
+
+BytesLike = Union[bytes, bytearray, memoryview]
+"""Any object supporting buffer protocol (i.e. also mmap or NumPy array)."""
 
 
 class BulkConnection(BasicConnection):
@@ -68,19 +82,34 @@ class BulkConnection(BasicConnection):
         )
 
     # Files manipulation
-    def put_file(self, model_id: str, file_id: str, data: bytes) -> Response:
+    def put_file(self, model_id: str, file_id: str, data: BytesLike) -> Response:
         """Upload file in one go.
 
+        Data can be any bytes-like object (i.e. bytearray, memoryview, mmap or NumPy
+        array) - it is sent as it is, without copying it to bytes. So it shouldn't be
+        modified until the method returns, but then it's no longer referenced (not
+        even by the request of returned response) - i.e. bytearray can be resized,
+        or mmap closed.
         **WARNING**: For bigger files (or if this method fails)
         BulkConnection.upload_file() should be used instead.
         """
-        return self.request(
-            "PUT",
+        return self._put_data(
             f"{self._api_main_url}/models/{model_id}/files/{file_id}",
-            data=data,
-            headers={"Content-Type": MIMEType.APP_8STREAM.value},
+            data,
+            MIMEType.APP_8STREAM,
         )
 
+    def _put_data(self, url: str, data: BytesLike, content_type: MIMEType) -> Response:
+        """Send bytes-like data without copying it, releasing its view once it's sent."""
+        headers = {"Content-Type": content_type.value}
+        if isinstance(data, bytes):
+            return self.request("PUT", url, data=data, headers=headers)
+        with memoryview(data) as base, base.cast("B") as view:
+            response = self.request("PUT", url, data=view, headers=headers)
+            # request would keep the view (and so exported data) alive
+            response.request.body = None
+        return response
+
     def _set_file_chunk_count(
         self, model_id: str, file_id: str, count: int
     ) -> Response:
@@ -99,16 +128,15 @@ class BulkConnection(BasicConnection):
         self,
         model_id: str,
         file_id: str,
-        data: bytes,
+        data: BytesLike,
         chunk: int,
         content_type: MIMEType = MIMEType.APP_8STREAM,
     ) -> Response:
-        """Upload contents of a file chunk."""
-        return self.request(
-            "PUT",
+        """Upload contents of a file chunk (referenced only until it's uploaded)."""
+        return self._put_data(
             f"{self._api_main_url}/models/{model_id}/files/{file_id}/chunks/{chunk}",
-            data=data,
-            headers={"Content-Type": content_type.value},
+            data,
+            content_type,
         )
 
     def _set_file_upload_complete(self, model_id: str, file_id: str) -> Response:
@@ -123,56 +151,240 @@ class BulkConnection(BasicConnection):
         self,
         model_id: str,
         file_id: str,
-        data: [bytes],
+        data: Iterable[BytesLike],
         content_type: MIMEType = MIMEType.APP_8STREAM,
+        max_workers: int = 1,
     ) -> Response:
         """Upload file (to be used by an import action) chunk by chunk.
 
+        With max workers above 1, chunks are uploaded in parallel - data is consumed
+        lazily, so at most twice as many chunks as workers are held in memory.
+        Chunks can be any bytes-like objects (as in BulkConnection.put_file()) -
+        i.e. slices of memoryview, which don't copy the sliced data. Each chunk is
+        referenced only until it's uploaded.
         Tip: For smaller files, much faster method (only one request is sent)
         BulkConnection.put_file() can be used instead.
         """
-        self._set_file_chunk_count(model_id, file_id, -1)
-        for chunk_count, chunk in enumerate(data):
-            self._upload_file_chunk(model_id, file_id, chunk, chunk_count, content_type)
-        return self._set_file_upload_complete(model_id, file_id)
-
-    def get_file(self, model_id: str, file_id: str) -> Response:
+        with self._span("upload_file", model_id=model_id, file_id=file_id):
+            self._set_file_chunk_count(model_id, file_id, -1)
+            for _ in self._map_ordered(
+                lambda numbered: self._upload_file_chunk(
+                    model_id, file_id, numbered[1], numbered[0], content_type
+                ),
+                enumerate(data),
+                max_workers,
+            ):
+                pass
+            return self._set_file_upload_complete(model_id, file_id)
+
+    def get_file(self, model_id: str, file_id: str, compress: bool = None) -> Response:
         """Download file (uploaded or generated by an export action) in one go.
 
+        With compress, file is compressed in transfer (and decompressed on arrival).
         **WARNING**: For bigger files (or if this method fails)
         BulkConnection.download_file() should be used instead.
         """
         return self.request(
             "GET",
             f"{self._api_main_url}/models/{model_id}/files/{file_id}",
-            headers={"Accept": MIMEType.APP_8STREAM.value},
+            headers=self._download_headers(MIMEType.APP_8STREAM, compress),
+        )
+
+    def _get_chunks(self, model_id: str, file_id: str) -> Chunks:
+        """Get chunks available for an export."""
+        return self._get_chunks_metadata(
+            f"{self._api_main_url}/models/{model_id}/files/{file_id}/chunks"
         )
 
-    def _get_chunks(self, model_id: str, file_id: str) -> Response:
-        """Get number of chunks available for an export."""
-        url = f"{self._api_main_url}/models/{model_id}/files/{file_id}/chunks"
+    def _get_chunks_metadata(self, url: str) -> Chunks:
+        """Get chunks available under URL (of a file or a dump)."""
         response = self.request("GET", url)
-        if not response.json()["meta"]["paging"]["currentPageSize"]:
+        chunks = Chunks.from_response(response)
+        if not chunks.count:
             raise Exception("Missing part in request response", url, response.text)
-        return response
+        return chunks
 
-    def _get_chunk(self, model_id: str, file_id: str, chunk: int) -> Response:
-        """Get number of chunks available for an export."""
+    def _get_chunk(
+        self, model_id: str, file_id: str, chunk: int, compress: bool = None
+    ) -> Response:
+        """Get contents of a file chunk."""
         url = f"{self._api_main_url}/models/{model_id}/files/{file_id}/chunks/{chunk}"
-        return self.request("GET", url, headers={"Accept": MIMEType.APP_8STREAM.value})
+        return self.request(
+            "GET", url, headers=self._download_headers(MIMEType.APP_8STREAM, compress)
+        )
 
-    def download_file(self, model_id: str, file_id: str) -> [bytes]:
+    def download_file(
+        self, model_id: str, file_id: str, max_workers: int = 1, compress: bool = None
+    ) -> [bytes]:
         """Download file (uploaded or generated by an export action) chunk by chunk.
 
+        With max workers above 1, chunks are downloaded in parallel (but still yielded
+        in order) - at most twice as many chunks as workers are held in memory.
+        With compress, chunks are compressed in transfer (as in get_file()).
         Tip: For smaller files, much faster method (only one request is sent)
         BulkConnection.get_file() can be used instead.
         """
-        response = self._get_chunks(model_id, file_id)
-        return (
-            self._get_chunk(model_id, file_id, int(chunk_id["id"])).content
-            for chunk_id in response.json()["chunks"]
+        chunks = self._get_chunks(model_id, file_id)
+        return self._span_iter(
+            "download_file",
+            self._map_ordered(
+                lambda chunk_id: self._get_chunk(
+                    model_id, file_id, int(chunk_id), compress
+                ).content,
+                chunks.ids,
+                max_workers,
+            ),
+            model_id=model_id,
+            file_id=file_id,
         )
 
+    def read_file(self, model_id: str, file_id: str, compress: bool = None) -> bytes:
+        """Download file, choosing the cheapest way based on its number of chunks.
+
+        Single-chunk files are downloaded in one go (falling back to download by chunk
+        if that fails), while bigger ones are always downloaded chunk by chunk.
+        """
+        with self._span("read_file", model_id=model_id, file_id=file_id):
+            chunks = self._get_chunks(model_id, file_id)
+            if chunks.count == 1:
+                try:
+                    return self.get_file(model_id, file_id, compress).content
+                except Exception as error:
+                    logging.warning(f"Download in one go failed, using chunks: {error}")
+            return b"".join(
+                self._get_chunk(model_id, file_id, int(chunk_id), compress).content
+                for chunk_id in chunks.ids
+            )
+
+    def download_into(
+        self,
+        model_id: str,
+        file_id: str,
+        buffer: BytesLike,
+        max_workers: int = 1,
+        compress: bool = None,
+    ) -> int:
+        """Download file chunk by chunk into a preallocated writable buffer.
+
+        Buffer (i.e. bytearray, writable mmap or NumPy array) is filled from its start
+        - each chunk is copied once, right after the previous one, so no other copy
+        of the whole file is made. Chunks are downloaded as in download_file().
+        Returns number of written bytes (size of the file).
+        """
+        with memoryview(buffer) as base, base.cast("B") as view:
+            offset = 0
+            for chunk in self.download_file(model_id, file_id, max_workers, compress):
+                end = offset + len(chunk)
+                if end > len(view):
+                    raise Exception("Buffer is too small", file_id, len(view))
+                view[offset:end] = chunk
+                offset = end
+        return offset
+
+    def write_file(
+        self,
+        model_id: str,
+        file_id: str,
+        data: Union[BytesLike, str, os.PathLike],
+        chunk_size: int = FILE_CHUNK_SIZE,
+        max_workers: int = 1,
+        transform: CSVTransform = None,
+    ) -> Response:
+        """Upload file (given as bytes-like object or path to a local file) cheaply.
+
+        Data not bigger than chunk size is uploaded in one go (falling back to upload
+        in chunks if that fails), and bigger data in chunks of chunk size (uploaded
+        by max workers in parallel, as in BulkConnection.upload_file()).
+        Chunks of bytes-like data (i.e. mmap of a file) are views of it, not copies
+        - they are released when the method returns (also if it fails).
+        Local files are read chunk by chunk, so they are never fully loaded in memory.
+        If transform (apapi.transform.CSVTransform) is given, data is transformed
+        on the fly - then it is uploaded in one go only if the result is one chunk.
+        """
+        if isinstance(data, (str, bytes, os.PathLike)):
+            return self._write_file(
+                model_id, file_id, data, chunk_size, max_workers, transform
+            )
+        with memoryview(data) as base, base.cast("B") as view:
+            return self._write_file(
+                model_id, file_id, view, chunk_size, max_workers, transform
+            )
+
+    def _write_file(
+        self,
+        model_id: str,
+        file_id: str,
+        data: Union[bytes, memoryview, str, os.PathLike],
+        chunk_size: int,
+        max_workers: int,
+        transform: Optional[CSVTransform],
+    ) -> Response:
+        """Same as write_file(), with bytes-like data given as bytes or flat view."""
+        is_path = isinstance(data, (str, os.PathLike))
+        size = os.path.getsize(data) if is_path else len(data)
+        with self._span("write_file", model_id=model_id, file_id=file_id, size=size):
+            if size <= chunk_size and transform is None:
+                content = self._read_local_file(data) if is_path else data
+                try:
+                    return self.put_file(model_id, file_id, content)
+                except Exception as error:
+                    logging.warning(f"Upload in one go failed, using chunks: {error}")
+            chunks = (
+                self._iter_local_file(data, chunk_size)
+                if is_path
+                else (data[i : i + chunk_size] for i in range(0, size, chunk_size))
+            )
+            if transform is None:
+                return self.upload_file(
+                    model_id, file_id, chunks, max_workers=max_workers
+                )
+            return self._put_chunks(
+                model_id, file_id, transform.apply(chunks), max_workers
+            )
+
+    def _put_chunks(
+        self,
+        model_id: str,
+        file_id: str,
+        chunks: Iterable[BytesLike],
+        max_workers: int,
+    ) -> Response:
+        """Upload chunks of unknown count - in one go, if there is only one."""
+        chunks = iter(chunks)
+        first, second = next(chunks, b""), next(chunks, None)
+        if second is None:
+            return self.put_file(model_id, file_id, first)
+        return self.upload_file(
+            model_id, file_id, chain((first, second), chunks), max_workers=max_workers
+        )
+
+    @staticmethod
+    def _read_local_file(path: Union[str, os.PathLike]) -> bytes:
+        with open(path, "rb") as file:
+            return file.read()
+
+    @staticmethod
+    def _iter_local_file(path: Union[str, os.PathLike], chunk_size: int) -> Iterator:
+        with open(path, "rb") as file:
+            while chunk := file.read(chunk_size):
+                yield chunk
+
+    @staticmethod
+    def _map_ordered(function: Callable, items: Iterable, max_workers: int) -> Iterator:
+        """Lazily map items using threads, yielding results in order of items."""
+        if max_workers <= 1:
+            yield from map(function, items)
+            return
+        with ThreadPoolExecutor(max_workers) as executor:
+            pending = deque()
+            for item in items:
+                pending.append(executor.submit(copy_context().run, function, item))
+                # consume items only as fast as results are taken
+                if len(pending) >= 2 * max_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
     def delete_file(self, model_id: str, file_id: str) -> Response:
         """Delete previously uploaded file from the model's memory."""
         return self.request(
@@ -296,7 +508,9 @@ class BulkConnection(BasicConnection):
         return self.generic_get_action_task(model_id, process_id, task_id, "processes")
 
     # Get dump
-    def get_import_dump(self, model_id: str, import_id: str, task_id: str) -> Response:
+    def get_import_dump(
+        self, model_id: str, import_id: str, task_id: str, compress: bool = None
+    ) -> Response:
         """Downloads import task failure dump file in one go.
 
         **WARNING**: For bigger files (or if this method fails)
@@ -305,11 +519,11 @@ class BulkConnection(BasicConnection):
         return self.request(
             "GET",
             f"{self._api_main_url}/models/{model_id}/imports/{import_id}/tasks/{task_id}/dump",
-            headers={"Accept": MIMEType.APP_8STREAM.value},
+            headers=self._download_headers(MIMEType.APP_8STREAM, compress),
         )
 
     def download_import_dump(
-        self, model_id: str, import_id: str, task_id: str
+        self, model_id: str, import_id: str, task_id: str, compress: bool = None
     ) -> bytes:
         """Downloads import task failure dump file chunk by chunk.
 
@@ -317,20 +531,16 @@ class BulkConnection(BasicConnection):
         BulkConnection.get_import_dump() can be used instead.
         """
         url = f"{self._api_main_url}/models/{model_id}/imports/{import_id}/tasks/{task_id}/dump/chunks"
-        response = self.request("GET", url)
-        if not response.json()["meta"]["paging"]["currentPageSize"]:
-            raise Exception("Missing part in request response", url, response.text)
-        return b"".join(
-            self.request(
-                "GET",
-                f"{url}/{chunk_id['id']}",
-                headers={"Accept": MIMEType.APP_8STREAM.value},
-            ).content
-            for chunk_id in response.json()["chunks"]
-        )
+        with self._span("download_import_dump", model_id=model_id, task_id=task_id):
+            return self._download_dump_chunks(url, compress)
 
     def get_process_dump(
-        self, model_id: str, process_id: str, task_id: str, object_id: str
+        self,
+        model_id: str,
+        process_id: str,
+        task_id: str,
+        object_id: str,
+        compress: bool = None,
     ) -> Response:
         """Downloads process task failure dump file in one go.
 
@@ -340,11 +550,16 @@ class BulkConnection(BasicConnection):
         return self.request(
             "GET",
             f"{self._api_main_url}/models/{model_id}/processes/{process_id}/tasks/{task_id}/dumps/{object_id}",
-            headers={"Accept": MIMEType.APP_8STREAM.value},
+            headers=self._download_headers(MIMEType.APP_8STREAM, compress),
         )
 
     def download_process_dump(
-        self, model_id: str, process_id: str, task_id: str, object_id: str
+        self,
+        model_id: str,
+        process_id: str,
+        task_id: str,
+        object_id: str,
+        compress: bool = None,
     ) -> bytes:
         """Downloads process task failure dump file chunk by chunk.
 
@@ -352,14 +567,13 @@ class BulkConnection(BasicConnection):
         BulkConnection.get_process_dump() can be used instead.
         """
         url = f"{self._api_main_url}/models/{model_id}/processes/{process_id}/tasks/{task_id}/dumps/{object_id}/chunks"
-        response = self.request("GET", url)
-        if not response.json()["meta"]["paging"]["currentPageSize"]:
-            raise Exception("Missing part in request response", url, response.text)
+        with self._span("download_process_dump", model_id=model_id, task_id=task_id):
+            return self._download_dump_chunks(url, compress)
+
+    def _download_dump_chunks(self, url: str, compress: bool = None) -> bytes:
+        """Download all chunks of a failure dump, given URL of its chunks."""
+        headers = self._download_headers(MIMEType.APP_8STREAM, compress)
         return b"".join(
-            self.request(
-                "GET",
-                f"{url}/{chunk_id['id']}",
-                headers={"Accept": MIMEType.APP_8STREAM.value},
-            ).content
-            for chunk_id in response.json()["chunks"]
+            self.request("GET", f"{url}/{chunk_id}", headers=headers).content
+            for chunk_id in self._get_chunks_metadata(url).ids
         )
@@ -0,0 +1,1166 @@
+"""
+apapi.fake_server
+
+This module provides a local stand-in of Anaplan APIs (authentication, Bulk,
+Transactional, ALM and Audit), which can be used for offline testing & benchmarking:
+
+```python
+>>> with FakeAnaplan(latency=0.01, throttle_rate=0.05) as fake:
+>>>     auth = BasicAuth("user@example.com:password", auth_url=fake.url)
+>>>     conn = Connection(auth, api_url=fake.url, _audit_url=fake.url)
+>>>     conn.get_list_items(FakeAnaplan.MODEL_ID, FakeAnaplan.LIST_ID)
+```
+Whole state is kept in memory, and can be adjusted using add_* methods.
+Latency, throttling (429 with Retry-After) and failures (500) can be injected.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import re
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count, product
+from random import Random
+from secrets import token_hex
+from threading import Lock, Thread
+from time import sleep, time
+from typing import Callable, Final, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from .utils import CELLS_LIMIT
+
+
+@dataclass
+class FakeList:
+    """List (dimension) of a fake model."""
+
+    name: str
+    items: list[dict]
+
+
+@dataclass
+class FakeView:
+    """View of a fake model - each dimension is an ID of a list."""
+
+    name: str
+    module_id: str
+    rows: list[str]
+    columns: list[str]
+    pages: list[str] = field(default_factory=list)
+
+
+@dataclass
+class FakeTask:
+    """Task of an action (or other long-running operation) of a fake model."""
+
+    task_id: str
+    created: float
+    duration: float
+    on_complete: Optional[Callable[[], dict]] = None
+    result: Optional[dict] = None
+
+    def as_dict(self) -> dict:
+        """Get task in the form returned by the API - completing it if it's time."""
+        if time() - self.created < self.duration:
+            return {"taskId": self.task_id, "taskState": "IN_PROGRESS"}
+        if self.result is None:
+            self.result = {"successful": True, "failureDumpAvailable": False}
+            if self.on_complete is not None:
+                self.result.update(self.on_complete())
+        return {
+            "taskId": self.task_id,
+            "taskState": "COMPLETE",
+            "creationTime": int(self.created * 1000),
+            "result": self.result,
+        }
+
+
+@dataclass
+class FakeReadRequest:
+    """Large read request - its pages become available one by one."""
+
+    request_id: str
+    created: float
+    pages: list[bytes]
+    interval: float
+
+    def available(self) -> int:
+        """Get number of pages that are already available."""
+        if not self.interval:
+            return len(self.pages)
+        return min(len(self.pages), int((time() - self.created) / self.interval) + 1)
+
+
+@dataclass
+class FakeModel:
+    """Model with its content - all of it is kept in memory."""
+
+    model_id: str
+    name: str
+    workspace_id: str
+    last_modified: int = field(default_factory=lambda: int(time() * 1000))
+    lists: dict[str, FakeList] = field(default_factory=dict)
+    modules: dict[str, str] = field(default_factory=dict)
+    lineitems: list[dict] = field(default_factory=list)
+    views: dict[str, FakeView] = field(default_factory=dict)
+    files: dict[str, list[bytes]] = field(default_factory=dict)
+    actions: dict[str, dict[str, dict]] = field(
+        default_factory=lambda: {
+            "imports": {},
+            "exports": {},
+            "actions": {},
+            "processes": {},
+        }
+    )
+    tasks: dict[str, dict[str, FakeTask]] = field(default_factory=dict)
+    read_requests: dict[str, FakeReadRequest] = field(default_factory=dict)
+    revisions: list[dict] = field(default_factory=list)
+    """Revision tags added to (or synced into) the model, from the oldest."""
+
+
+class FakeAnaplan:
+    """Local fake of Anaplan APIs, running in a background thread.
+
+    Latency is added to each request (in seconds). Throttle & failure rates are
+    probabilities of getting 429 (with Retry-After) or 500 response for API request.
+    Tasks take task duration seconds to complete, and large read pages become
+    available every page interval seconds. Credentials are not checked, but tokens are.
+    If chunked is set, bodies are sent with chunked transfer encoding (no length).
+    """
+
+    WORKSPACE_ID: Final[str] = "8a81b09d5e8c6f27015ece3402487d33"
+    MODEL_ID: Final[str] = "75A40874E6B64FA3AE0747E7B3D7EC6F"
+    USER_ID: Final[str] = "8a81b01068a3d7f60168a4e5c2bb0f6a"
+    LIST_ID: Final[str] = "101000000001"
+    TIME_ID: Final[str] = "20000000003"
+    VERSIONS_ID: Final[str] = "20000000020"
+    MODULE_ID: Final[str] = "102000000001"
+    VIEW_ID: Final[str] = MODULE_ID
+    FILE_ID: Final[str] = "113000000001"
+    IMPORT_ID: Final[str] = "112000000001"
+    EXPORT_ID: Final[str] = "116000000001"
+    ACTION_ID: Final[str] = "117000000001"
+    PROCESS_ID: Final[str] = "118000000001"
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        throttle_rate: float = 0.0,
+        failure_rate: float = 0.0,
+        retry_after: float = 1,
+        task_duration: float = 0.0,
+        page_interval: float = 0.0,
+        page_rows: int = 1000,
+        list_items: int = 1000,
+        token_lifetime: float = 1800,
+        report_rows: int = 1000,
+        seed: int = None,
+        chunked: bool = False,
+    ):
+        self.latency: float = latency
+        self.throttle_rate: float = throttle_rate
+        self.failure_rate: float = failure_rate
+        self.retry_after: float = retry_after
+        self.task_duration: float = task_duration
+        self.page_interval: float = page_interval
+        self.page_rows: int = page_rows
+        self.token_lifetime: float = token_lifetime
+        self.report_rows: int = report_rows
+        self.chunked: bool = chunked
+        self.requests: int = 0
+        """Number of requests handled so far."""
+        self.models: dict[str, FakeModel] = {}
+        self.events: list[dict] = []
+        """Audit events - see FakeAnaplan.add_events()."""
+        self._random: Random = Random(seed)
+        self._tokens: dict[str, float] = {}
+        self._ids = count(1)
+        self._lock: Lock = Lock()
+        self._routes: list[tuple[str, re.Pattern, Callable]] = []
+        self._register_routes()
+        self._populate(list_items)
+
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread: Optional[Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the server - use it as API, auth, OAuth2 & audit URL."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> FakeAnaplan:
+        """Start serving in a background thread."""
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and release the port."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    # State setup
+    def add_model(self, model_id: str, name: str, workspace_id: str = None) -> None:
+        """Add an empty model."""
+        self.models[model_id] = FakeModel(
+            model_id, name, workspace_id or self.WORKSPACE_ID
+        )
+
+    def add_list(
+        self, model_id: str, list_id: str, name: str, items: int | list[str]
+    ) -> None:
+        """Add a list with given items (names) or number of generated items."""
+        if isinstance(items, int):
+            items = [f"{name} {i}" for i in range(items)]
+        self.models[model_id].lists[list_id] = FakeList(
+            name,
+            [
+                {
+                    "id": str(int(list_id) * 1000000 + i),
+                    "name": item,
+                    "code": f"C{i}",
+                    "listId": list_id,
+                    "listName": name,
+                    "parent": "",
+                    "properties": {},
+                    "subsets": {},
+                }
+                for i, item in enumerate(items)
+            ],
+        )
+
+    def add_view(
+        self,
+        model_id: str,
+        view_id: str,
+        name: str,
+        rows: list[str],
+        columns: list[str],
+        pages: list[str] = (),
+        module_id: str = None,
+    ) -> None:
+        """Add a view (with a module, if module ID not given) - dimensions are lists."""
+        model = self.models[model_id]
+        if module_id is None:
+            module_id = view_id
+            model.modules[module_id] = name
+        model.views[view_id] = FakeView(name, module_id, rows, columns, list(pages))
+
+    def add_file(
+        self, model_id: str, file_id: str, data: bytes, chunk_size: int = 1 << 20
+    ) -> None:
+        """Add a file, split into chunks of given size."""
+        self.models[model_id].files[file_id] = [
+            data[i : i + chunk_size] for i in range(0, len(data), chunk_size)
+        ] or [b""]
+
+    def add_revision(self, model_id: str, revision_id: str, name: str) -> dict:
+        """Add a revision tag to a model."""
+        revision = {
+            "id": revision_id,
+            "name": name,
+            "description": "",
+            "createdDate": int(time() * 1000),
+            "creationUserId": self.USER_ID,
+            "appliedDate": int(time() * 1000),
+            "appliedBy": self.USER_ID,
+        }
+        with self._lock:
+            self.models[model_id].revisions.append(revision)
+        return revision
+
+    def add_events(self, events: list[dict]) -> None:
+        """Add audit events - each of them needs at least "eventDate" (epoch in ms)."""
+        with self._lock:
+            self.events.extend(events)
+            self.events.sort(key=lambda event: event["eventDate"])
+
+    def generate_events(self, number: int, date_from: int, date_to: int) -> None:
+        """Generate given number of audit events, evenly spread between dates (ms)."""
+        step = (date_to - date_from) / max(number, 1)
+        self.add_events(
+            [
+                {
+                    "id": token_hex(16),
+                    "eventTypeId": ("byok.key.used", "user.login", "model.opened")[
+                        i % 3
+                    ],
+                    "userId": self.USER_ID,
+                    "tenantId": "8a81b09d5e8c6f27015ece3402487d00",
+                    "objectId": self.MODEL_ID,
+                    "objectTypeId": "model",
+                    "message": f"Event {i}",
+                    "success": True,
+                    "eventDate": int(date_from + i * step),
+                    "createdDate": int(date_from + i * step),
+                    "eventTimeZone": "UTC",
+                    "ipAddress": "127.0.0.1",
+                    "userAgent": "apapi",
+                }
+                for i in range(number)
+            ]
+        )
+
+    def _populate(self, list_items: int) -> None:
+        """Create default workspace, model, lists, module & actions."""
+        self.add_model(self.MODEL_ID, "APAPI Fake Model")
+        self.add_list(self.MODEL_ID, self.LIST_ID, "Products", list_items)
+        self.add_list(
+            self.MODEL_ID,
+            self.TIME_ID,
+            "Time",
+            [f"{month} 22" for month in "Jan Feb Mar Apr May Jun".split()],
+        )
+        self.add_list(self.MODEL_ID, self.VERSIONS_ID, "Versions", ["Actual", "Budget"])
+        self.add_view(
+            self.MODEL_ID,
+            self.VIEW_ID,
+            "Sales",
+            [self.LIST_ID],
+            [self.TIME_ID],
+            [self.VERSIONS_ID],
+        )
+        model = self.models[self.MODEL_ID]
+        for i, data_format in enumerate(("NUMBER", "TEXT", "BOOLEAN", "DATE")):
+            model.lineitems.append(
+                {
+                    "id": f"20300000000{i}",
+                    "name": f"Line item {i}",
+                    "moduleId": self.MODULE_ID,
+                    "moduleName": "Sales",
+                    "format": data_format,
+                    "cellCount": list_items * 12,
+                    "appliesTo": [
+                        {"id": self.LIST_ID, "name": "Products"},
+                        {"id": self.VERSIONS_ID, "name": "Versions"},
+                    ],
+                }
+            )
+        model.actions["imports"][self.IMPORT_ID] = {
+            "id": self.IMPORT_ID,
+            "name": "Products from Products.csv",
+            "importDataSourceId": self.FILE_ID,
+            "importType": "HIERARCHY_DATA",
+        }
+        model.actions["exports"][self.EXPORT_ID] = {
+            "id": self.EXPORT_ID,
+            "name": "Products.csv",
+            "exportFormat": "text/csv",
+        }
+        model.actions["actions"][self.ACTION_ID] = {
+            "id": self.ACTION_ID,
+            "name": "Delete Products",
+        }
+        model.actions["processes"][self.PROCESS_ID] = {
+            "id": self.PROCESS_ID,
+            "name": "Reload Products",
+        }
+        model.files[self.FILE_ID] = [b""]
+
+    # Requests handling
+    def handle(
+        self, method: str, url: str, headers: dict, body: bytes
+    ) -> tuple[int, dict, bytes]:
+        """Handle a request - returns status code, headers & body of the response."""
+        with self._lock:
+            self.requests += 1
+            roll = self._random.random()
+        if self.latency:
+            sleep(self.latency)
+        parts = urlsplit(url)
+        path = parts.path
+        for route_method, pattern, handler in self._routes:
+            if route_method != method or not (match := pattern.fullmatch(path)):
+                continue
+            if not path.startswith(("/token", "/oauth")):
+                if roll < self.throttle_rate:
+                    return self._json(429, {}, {"Retry-After": str(self.retry_after)})
+                if roll < self.throttle_rate + self.failure_rate:
+                    return self._json(500, {"status": {"code": 500}})
+                if not self._authorized(headers.get("Authorization", "")):
+                    return self._json(401, {"status": {"code": 401}})
+            query = {key: value[-1] for key, value in parse_qs(parts.query).items()}
+            try:
+                status, response_headers, data = handler(
+                    headers, query, body, *match.groups()
+                )
+            except KeyError as error:
+                return self._json(404, {"status": {"code": 404, "message": str(error)}})
+            if isinstance(data, (dict, list)):
+                data = json.dumps(data).encode()
+                response_headers.setdefault("Content-Type", "application/json")
+            if "gzip" in headers.get("Accept-Encoding", "") and len(data) > 1024:
+                data = gzip.compress(data, 1)
+                # copy, as handlers can return shared headers (i.e. octet stream)
+                response_headers = dict(
+                    response_headers, **{"Content-Encoding": "gzip"}
+                )
+            return status, response_headers, data
+        return self._json(404, {"status": {"code": 404, "message": "Not Found"}})
+
+    @staticmethod
+    def _json(status: int, data: dict, headers: dict = None) -> tuple[int, dict, bytes]:
+        headers = dict(headers or {}, **{"Content-Type": "application/json"})
+        return status, headers, json.dumps(data).encode()
+
+    def _authorized(self, authorization: str) -> bool:
+        token = authorization.rpartition(" ")[2]
+        return self._tokens.get(token, 0) > time()
+
+    def _new_id(self) -> str:
+        return str(next(self._ids))
+
+    def _route(self, method: str, pattern: str) -> Callable:
+        def register(handler: Callable) -> Callable:
+            regex = pattern.replace("{}", "([^/]+)")
+            self._routes.append((method, re.compile(regex), handler))
+            return handler
+
+        return register
+
+    def _register_routes(self) -> None:
+        """Define all the endpoints handled by the server."""
+        route = self._route
+        api = "/2/0"
+        model = api + "/models/{}"
+
+        # Authentication
+        def new_token(*_):
+            token = token_hex(16)
+            expires = time() + self.token_lifetime
+            self._tokens[token] = expires
+            return (
+                200,
+                {},
+                {
+                    "status": "SUCCESS",
+                    "tokenInfo": {
+                        "tokenValue": token,
+                        "expiresAt": int(expires * 1000),
+                        "tokenId": token_hex(8),
+                        "refreshTokenId": token_hex(8),
+                    },
+                },
+            )
+
+        route("POST", "/token/authenticate")(new_token)
+
+        @route("POST", "/token/refresh")
+        def refresh(headers, *_):
+            if not self._authorized(headers.get("Authorization", "")):
+                return 401, {}, {"status": "FAILURE_BAD_CREDENTIAL"}
+            self._tokens.pop(headers["Authorization"].rpartition(" ")[2])
+            return new_token()
+
+        @route("GET", "/token/validate")
+        def validate(headers, *_):
+            if not self._authorized(headers.get("Authorization", "")):
+                return 401, {}, {"status": "FAILURE_BAD_CREDENTIAL"}
+            return 200, {}, {"status": "SUCCESS"}
+
+        @route("POST", "/token/logout")
+        def logout(headers, *_):
+            self._tokens.pop(headers.get("Authorization", "").rpartition(" ")[2], 0)
+            return 204, {}, b""
+
+        @route("POST", "/oauth/token")
+        def oauth_token(*_):
+            token_info = new_token()[2]["tokenInfo"]
+            return (
+                200,
+                {},
+                {
+                    "access_token": token_info["tokenValue"],
+                    "expires_in": int(self.token_lifetime),
+                    "refresh_token": token_hex(16),
+                    "token_type": "Bearer",
+                },
+            )
+
+        # Users, workspaces & models
+        user = {
+            "id": self.USER_ID,
+            "active": True,
+            "email": "user@example.com",
+            "emailOptIn": False,
+            "firstName": "Fake",
+            "lastName": "User",
+        }
+        route("GET", api + "/users/me")(lambda *_: (200, {}, {"user": user}))
+        route("GET", api + "/users")(lambda *_: (200, {}, {"users": [user]}))
+        route("GET", api + "/users/{}")(lambda *_: (200, {}, {"user": user}))
+
+        def workspace_dict(workspace_id: str) -> dict:
+            return {
+                "id": workspace_id,
+                "name": f"Workspace {workspace_id[-4:]}",
+                "active": True,
+                "sizeAllowance": 1 << 30,
+                "currentSize": 1 << 20,
+            }
+
+        def model_dict(fake_model: FakeModel) -> dict:
+            return {
+                "id": fake_model.model_id,
+                "activeState": "UNLOCKED",
+                "name": fake_model.name,
+                "currentWorkspaceId": fake_model.workspace_id,
+                "currentWorkspaceName": f"Workspace {fake_model.workspace_id[-4:]}",
+                "modelUrl": f"{self.url}/models/{fake_model.model_id}",
+                "categoryValues": [],
+                "lastModified": str(fake_model.last_modified),
+                "lastModifiedByUserGuid": self.USER_ID,
+                "memoryUsage": 1 << 20,
+            }
+
+        @route("GET", api + "/workspaces")
+        def workspaces(*_):
+            ids = sorted({m.workspace_id for m in self.models.values()})
+            return 200, {}, {"workspaces": [workspace_dict(w) for w in ids]}
+
+        @route("GET", api + "/workspaces/{}")
+        def workspace(headers, query, body, workspace_id):
+            return 200, {}, {"workspace": workspace_dict(workspace_id)}
+
+        @route("GET", api + "/workspaces/{}/models")
+        def workspace_models(headers, query, body, workspace_id):
+            return (
+                200,
+                {},
+                {
+                    "models": [
+                        model_dict(m)
+                        for m in self.models.values()
+                        if m.workspace_id == workspace_id
+                    ]
+                },
+            )
+
+        @route("GET", api + "/models")
+        def models(*_):
+            return 200, {}, {"models": [model_dict(m) for m in self.models.values()]}
+
+        @route("GET", model)
+        def get_model(headers, query, body, model_id):
+            return 200, {}, {"model": model_dict(self.models[model_id])}
+
+        @route("GET", model + "/users")
+        def model_users(*_):
+            return 200, {}, {"users": [user]}
+
+        # Actions & tasks
+        action_types = "(imports|exports|actions|processes)"
+
+        @route("GET", model + f"/{action_types}")
+        def actions(headers, query, body, model_id, action_type):
+            definitions = self.models[model_id].actions[action_type]
+            return 200, {}, {action_type: list(definitions.values())}
+
+        @route("GET", model + f"/{action_types}/{{}}")
+        def action(headers, query, body, model_id, action_type, action_id):
+            definition = self.models[model_id].actions[action_type][action_id]
+            singular = (
+                action_type[:-2] if action_type == "processes" else action_type[:-1]
+            )
+            return 200, {}, {f"{singular}Metadata": definition}
+
+        @route("POST", model + f"/{action_types}/{{}}/tasks")
+        def run_action(headers, query, body, model_id, action_type, action_id):
+            fake_model = self.models[model_id]
+            fake_model.actions[action_type][action_id]  # check if it exists
+            on_complete = None
+            if action_type == "exports":
+
+                def on_complete():
+                    self.add_file(model_id, action_id, self._export_data(model_id))
+                    return {"objectId": action_id}
+
+            task = self._start_task(
+                fake_model, f"{action_type}/{action_id}", on_complete
+            )
+            return 200, {}, {"task": task.as_dict()}
+
+        @route("GET", model + f"/{action_types}/{{}}/tasks")
+        def action_tasks(headers, query, body, model_id, action_type, action_id):
+            tasks = self.models[model_id].tasks.get(f"{action_type}/{action_id}", {})
+            return 200, {}, {"tasks": [task.as_dict() for task in tasks.values()]}
+
+        @route("GET", model + f"/{action_types}/{{}}/tasks/{{}}")
+        def action_task(headers, query, body, model_id, action_type, action_id, task):
+            tasks = self.models[model_id].tasks[f"{action_type}/{action_id}"]
+            return 200, {}, {"task": tasks[task].as_dict()}
+
+        # Files
+        def chunks_meta(chunks: list[bytes]) -> dict:
+            return {
+                "meta": {
+                    "paging": {
+                        "currentPageSize": len(chunks),
+                        "totalSize": len(chunks),
+                        "offset": 0,
+                    }
+                },
+                "chunks": [
+                    {"id": str(i), "name": f"Chunk {i}"} for i in range(len(chunks))
+                ],
+            }
+
+        octet_stream = {"Content-Type": "application/octet-stream"}
+
+        @route("GET", model + "/files")
+        def files(headers, query, body, model_id):
+            return (
+                200,
+                {},
+                {
+                    "files": [
+                        {"id": file_id, "name": f"File {file_id}", "chunkCount": len(c)}
+                        for file_id, c in self.models[model_id].files.items()
+                    ]
+                },
+            )
+
+        @route("PUT", model + "/files/{}")
+        def put_file(headers, query, body, model_id, file_id):
+            self.models[model_id].files[file_id] = [body]
+            return 204, {}, b""
+
+        @route("POST", model + "/files/{}")
+        def set_chunk_count(headers, query, body, model_id, file_id):
+            self.models[model_id].files[file_id] = []
+            return 200, {}, {"file": {"id": file_id, **json.loads(body or b"{}")}}
+
+        @route("PUT", model + "/files/{}/chunks/{}")
+        def put_chunk(headers, query, body, model_id, file_id, chunk):
+            with self._lock:
+                chunks = self.models[model_id].files.setdefault(file_id, [])
+                chunks.extend([b""] * (int(chunk) + 1 - len(chunks)))
+                chunks[int(chunk)] = body
+            return 204, {}, b""
+
+        @route("POST", model + "/files/{}/complete")
+        def complete_file(headers, query, body, model_id, file_id):
+            chunks = self.models[model_id].files[file_id]
+            return 200, {}, {"file": {"id": file_id, "chunkCount": len(chunks)}}
+
+        @route("GET", model + "/files/{}")
+        def get_file(headers, query, body, model_id, file_id):
+            return 200, octet_stream, b"".join(self.models[model_id].files[file_id])
+
+        @route("GET", model + "/files/{}/chunks")
+        def get_chunks(headers, query, body, model_id, file_id):
+            return 200, {}, chunks_meta(self.models[model_id].files[file_id])
+
+        @route("GET", model + "/files/{}/chunks/{}")
+        def get_chunk(headers, query, body, model_id, file_id, chunk):
+            return 200, octet_stream, self.models[model_id].files[file_id][int(chunk)]
+
+        @route("DELETE", model + "/files/{}")
+        def delete_file(headers, query, body, model_id, file_id):
+            del self.models[model_id].files[file_id]
+            return 204, {}, b""
+
+        # Lists
+        @route("GET", model + "/lists")
+        def lists(headers, query, body, model_id):
+            return (
+                200,
+                {},
+                {
+                    "lists": [
+                        {"id": list_id, "name": fake_list.name}
+                        for list_id, fake_list in self.models[model_id].lists.items()
+                    ]
+                },
+            )
+
+        @route("GET", model + "/lists/{}")
+        def get_list(headers, query, body, model_id, list_id):
+            fake_list = self.models[model_id].lists[list_id]
+            return (
+                200,
+                {},
+                {
+                    "metadata": {
+                        "id": list_id,
+                        "name": fake_list.name,
+                        "itemCount": len(fake_list.items),
+                        "numberedList": False,
+                        "properties": [],
+                        "subsets": [],
+                    }
+                },
+            )
+
+        @route("GET", model + "/lists/{}/items")
+        def list_items(headers, query, body, model_id, list_id):
+            items = self.models[model_id].lists[list_id].items
+            if len(items) > CELLS_LIMIT:
+                return self._json(400, {"status": {"code": 400, "message": "Too big"}})
+            if "text/csv" in headers.get("Accept", ""):
+                return 200, {"Content-Type": "text/csv"}, self._list_csv(items)
+            return 200, {}, {"listItems": items}
+
+        @route("POST", model + "/lists/{}/items")
+        def change_items(headers, query, body, model_id, list_id):
+            items = json.loads(body)["items"]
+            fake_list = self.models[model_id].lists[list_id]
+            with self._lock:
+                if query.get("action") == "delete":
+                    codes = {item.get("code") for item in items}
+                    ids = {item.get("id") for item in items}
+                    before = len(fake_list.items)
+                    fake_list.items = [
+                        i
+                        for i in fake_list.items
+                        if i["code"] not in codes and i["id"] not in ids
+                    ]
+                    deleted = before - len(fake_list.items)
+                    return 200, {}, {"result": {"deleted": deleted, "failures": []}}
+                for item in items:
+                    fake_list.items.append(
+                        {
+                            "id": str(int(list_id) * 1000000 + len(fake_list.items)),
+                            "name": item.get("name", item.get("code")),
+                            "code": "",
+                            "parent": "",
+                            **item,
+                        }
+                    )
+            return 200, {}, {"added": len(items), "total": len(items), "failures": []}
+
+        @route("PUT", model + "/lists/{}/items")
+        def update_items(headers, query, body, model_id, list_id):
+            items = json.loads(body)["items"]
+            by_code = {i["code"]: i for i in self.models[model_id].lists[list_id].items}
+            with self._lock:
+                for item in items:
+                    by_code.get(item.get("code"), {}).update(item)
+            return 200, {}, {"updated": len(items), "total": len(items), "failures": []}
+
+        @route("POST", model + "/lists/{}/resetIndex")
+        def reset_index(*_):
+            return 200, {}, {"status": {"code": 200}}
+
+        # Large reads (lists & views)
+        read_types = "(lists|views)"
+        read_keys = {"lists": "listReadRequest", "views": "viewReadRequest"}
+
+        def read_dict(read: FakeReadRequest) -> dict:
+            available = read.available()
+            complete = available == len(read.pages)
+            return {
+                "requestId": read.request_id,
+                "requestState": "COMPLETE" if complete else "IN_PROGRESS",
+                "availablePages": available,
+                "successful": True,
+            }
+
+        @route("POST", model + f"/{read_types}/{{}}/readRequests")
+        def start_read(headers, query, body, model_id, read_type, object_id):
+            fake_model = self.models[model_id]
+            if read_type == "lists":
+                data = self._list_csv(fake_model.lists[object_id].items)
+            else:
+                data = self._view_csv(fake_model, object_id, None)
+            lines = data.splitlines(keepends=True)
+            pages = [
+                b"".join(lines[i : i + self.page_rows])
+                for i in range(0, len(lines), self.page_rows)
+            ] or [b""]
+            read = FakeReadRequest(self._new_id(), time(), pages, self.page_interval)
+            fake_model.read_requests[read.request_id] = read
+            return 200, {}, {read_keys[read_type]: read_dict(read)}
+
+        @route("GET", model + f"/{read_types}/{{}}/readRequests/{{}}")
+        def read_status(headers, query, body, model_id, read_type, object_id, req):
+            read = self.models[model_id].read_requests[req]
+            return 200, {}, {read_keys[read_type]: read_dict(read)}
+
+        @route("GET", model + f"/{read_types}/{{}}/readRequests/{{}}/pages/{{}}")
+        def read_page(headers, query, body, model_id, read_type, object_id, req, page):
+            read = self.models[model_id].read_requests[req]
+            if int(page) >= read.available():
+                return self._json(404, {"status": {"code": 404}})
+            return 200, {"Content-Type": "text/csv"}, read.pages[int(page)]
+
+        @route("DELETE", model + f"/{read_types}/{{}}/readRequests/{{}}")
+        def delete_read(headers, query, body, model_id, read_type, object_id, req):
+            read = self.models[model_id].read_requests.pop(req)
+            return 200, {}, {read_keys[read_type]: read_dict(read)}
+
+        # Modules, line items, views & dimensions
+        @route("GET", model + "/modules")
+        def modules(headers, query, body, model_id):
+            return (
+                200,
+                {},
+                {
+                    "modules": [
+                        {"id": module_id, "name": name}
+                        for module_id, name in self.models[model_id].modules.items()
+                    ]
+                },
+            )
+
+        def lineitems_dict(items: list[dict], query: dict) -> dict:
+            # without details, only IDs & names are returned
+            if query.get("includeAll", "").lower() != "true":
+                keys = ("id", "name", "moduleId", "moduleName")
+                items = [{key: item[key] for key in keys} for item in items]
+            return {"items": items}
+
+        @route("GET", model + "/lineItems")
+        def lineitems(headers, query, body, model_id):
+            return 200, {}, lineitems_dict(self.models[model_id].lineitems, query)
+
+        @route("GET", model + "/modules/{}/lineItems")
+        def module_lineitems(headers, query, body, model_id, module_id):
+            items = self.models[model_id].lineitems
+            items = [item for item in items if item["moduleId"] == module_id]
+            return 200, {}, lineitems_dict(items, query)
+
+        def views_dict(fake_model: FakeModel, module_id: str = None) -> dict:
+            return {
+                "views": [
+                    {"id": view_id, "name": view.name, "moduleId": view.module_id}
+                    for view_id, view in fake_model.views.items()
+                    if module_id in (None, view.module_id)
+                ]
+            }
+
+        @route("GET", model + "/views")
+        def views(headers, query, body, model_id):
+            return 200, {}, views_dict(self.models[model_id])
+
+        @route("GET", model + "/modules/{}/views")
+        def module_views(headers, query, body, model_id, module_id):
+            return 200, {}, views_dict(self.models[model_id], module_id)
+
+        @route("GET", model + "/views/{}")
+        def view_dimensions(headers, query, body, model_id, view_id):
+            fake_model = self.models[model_id]
+            view = fake_model.views[view_id]
+
+            def dims(ids: list[str]) -> list[dict]:
+                return [{"id": i, "name": fake_model.lists[i].name} for i in ids]
+
+            return (
+                200,
+                {},
+                {
+                    "viewName": view.name,
+                    "viewId": view_id,
+                    "rows": dims(view.rows),
+                    "columns": dims(view.columns),
+                    "pages": dims(view.pages),
+                },
+            )
+
+        def dimension_items(fake_model: FakeModel, dimension_id: str) -> dict:
+            return {
+                "items": [
+                    {"id": i["id"], "name": i["name"], "code": i["code"]}
+                    for i in fake_model.lists[dimension_id].items
+                ]
+            }
+
+        @route("GET", model + "/dimensions/{}/items")
+        def get_dimension_items(headers, query, body, model_id, dimension_id):
+            return 200, {}, dimension_items(self.models[model_id], dimension_id)
+
+        @route("GET", model + "/views/{}/dimensions/{}/items")
+        def view_dimension_items(headers, query, body, model_id, view_id, dim_id):
+            return 200, {}, dimension_items(self.models[model_id], dim_id)
+
+        @route("GET", model + "/views/{}/data")
+        def cell_data(headers, query, body, model_id, view_id):
+            fake_model = self.models[model_id]
+            view = fake_model.views[view_id]
+            selected = dict(
+                page.split(":") for page in query.get("pages", "").split(",") if page
+            )
+            cells = 1
+            for dim in view.rows + view.columns:
+                cells *= len(fake_model.lists[dim].items)
+            for dim in view.pages:
+                cells *= 1 if dim in selected else len(fake_model.lists[dim].items)
+            if cells > CELLS_LIMIT:
+                message = f"Number of cells ({cells}) exceeds {CELLS_LIMIT}"
+                return self._json(400, {"status": {"code": 400, "message": message}})
+            data = self._view_csv(fake_model, view_id, selected)
+            return 200, {"Content-Type": "text/csv"}, data
+
+        @route("POST", model + "/modules/{}/data")
+        def post_cells(headers, query, body, model_id, module_id):
+            cells = json.loads(body)
+            return 200, {}, {"numberOfCellsChanged": len(cells), "failures": []}
+
+        # ALM
+        @route("PUT", model + "/onlineStatus")
+        def online_status(headers, query, body, model_id):
+            self.models[model_id]  # check if it exists
+            return 200, {}, {"status": {"code": 200, "message": "Success"}}
+
+        @route("GET", model + "/alm/revisions")
+        def revisions(headers, query, body, model_id):
+            return 200, {}, {"revisions": self.models[model_id].revisions}
+
+        @route("POST", model + "/alm/revisions")
+        def add_revision(headers, query, body, model_id):
+            data = json.loads(body)
+            revision = self.add_revision(model_id, token_hex(16).upper(), data["name"])
+            revision["description"] = data.get("description", "")
+            return 200, {}, {"revision": revision}
+
+        @route("GET", model + "/alm/latestRevision")
+        def latest_revision(headers, query, body, model_id):
+            return 200, {}, {"revisions": self.models[model_id].revisions[-1:]}
+
+        @route("GET", model + "/alm/syncableRevisions")
+        def syncable_revisions(headers, query, body, model_id):
+            applied = {revision["id"] for revision in self.models[model_id].revisions}
+            source = self.models[query["sourceModelId"]].revisions
+            return (
+                200,
+                {},
+                {"revisions": [rev for rev in source if rev["id"] not in applied]},
+            )
+
+        @route("GET", model + "/alm/revisions/{}/appliedToModels")
+        def applied_to_models(headers, query, body, model_id, revision_id):
+            return (
+                200,
+                {},
+                {
+                    "appliedToModels": [
+                        {"modelId": other.model_id, "modelName": other.name}
+                        for other in self.models.values()
+                        if any(rev["id"] == revision_id for rev in other.revisions)
+                    ]
+                },
+            )
+
+        @route("POST", model + "/alm/syncTasks")
+        def sync(headers, query, body, model_id):
+            data = json.loads(body)
+            source = self.models[data["sourceModelId"]]
+            revisions = {rev["id"]: rev for rev in source.revisions}
+            revision = revisions[data["sourceRevisionId"]]
+            target = self.models[model_id]
+
+            def on_complete():
+                with self._lock:
+                    target.revisions.append(
+                        dict(revision, appliedDate=int(time() * 1000))
+                    )
+                return {}
+
+            task = self._start_task(target, "alm/syncTasks", on_complete)
+            return 200, {}, {"task": task.as_dict()}
+
+        @route("GET", model + "/alm/syncTasks")
+        def sync_tasks(headers, query, body, model_id):
+            tasks = self.models[model_id].tasks.get("alm/syncTasks", {})
+            return 200, {}, {"tasks": [task.as_dict() for task in tasks.values()]}
+
+        @route("GET", model + "/alm/syncTasks/{}")
+        def sync_task(headers, query, body, model_id, task_id):
+            tasks = self.models[model_id].tasks["alm/syncTasks"]
+            return 200, {}, {"task": tasks[task_id].as_dict()}
+
+        report_types = "(comparisonReport|summaryReport)"
+
+        @route("POST", model + f"/alm/{report_types}Tasks")
+        def start_report(headers, query, body, model_id, report_type):
+            target = self.models[model_id]
+            self.models[json.loads(body)["sourceModelId"]]  # check if it exists
+            task = self._start_task(target, f"alm/{report_type}Tasks")
+            return 200, {}, {"task": task.as_dict()}
+
+        @route("GET", model + f"/alm/{report_types}Tasks/{{}}")
+        def report_task(headers, query, body, model_id, report_type, task_id):
+            tasks = self.models[model_id].tasks[f"alm/{report_type}Tasks"]
+            return 200, {}, {"task": tasks[task_id].as_dict()}
+
+        @route("GET", model + "/alm/comparisonReports/{}/{}")
+        def comparison_report(headers, query, body, model_id, target_rev, source_rev):
+            lines = ["Type,Name,Change,Property,Source Value,Target Value\r\n"]
+            # names can contain Unicode line separators, which don't end a record
+            lines += [
+                f"Line Item,Sales.Item\u2028{i},Modified,Formula,"
+                f'"IF X THEN {i} ELSE ""-""",{i - 1}\r\n'
+                for i in range(self.report_rows)
+            ]
+            return 200, octet_stream, "".join(lines).encode()
+
+        @route("GET", model + "/alm/summaryReports/{}/{}")
+        def summary_report(headers, query, body, model_id, target_rev, source_rev):
+            totals = {"modified": self.report_rows, "created": 0, "deleted": 0}
+            return (
+                200,
+                {},
+                {
+                    "summaryReport": {
+                        "targetRevisionId": target_rev,
+                        "sourceRevisionId": source_rev,
+                        "totals": totals,
+                        "differences": {"lineItems": totals},
+                    }
+                },
+            )
+
+        # Audit
+        def events(headers, date_from, date_to, interval, limit):
+            if interval:
+                date_to = int(time() * 1000)
+                date_from = date_to - int(interval) * 3600000
+            with self._lock:
+                selected = [
+                    event
+                    for event in self.events
+                    if (not date_from or event["eventDate"] >= int(date_from))
+                    and (not date_to or event["eventDate"] <= int(date_to))
+                ][: int(limit or 20)]
+            if "text/plain" in headers.get("Accept", ""):
+                data = "".join(json.dumps(event) + "\n" for event in selected)
+                return 200, {"Content-Type": "text/plain"}, data.encode()
+            return (
+                200,
+                {},
+                {
+                    "meta": {
+                        "paging": {
+                            "currentPageSize": len(selected),
+                            "totalSize": len(selected),
+                            "offset": 0,
+                        }
+                    },
+                    "status": {"code": 200, "message": "Success"},
+                    "response": selected,
+                },
+            )
+
+        @route("GET", "/audit/api/1/events")
+        def get_events(headers, query, body):
+            return events(
+                headers,
+                query.get("dateFrom"),
+                query.get("dateTo"),
+                query.get("intervalInHours"),
+                query.get("limit"),
+            )
+
+        @route("POST", "/audit/api/1/events/search")
+        def search_events(headers, query, body):
+            data = json.loads(body or b"{}")
+            return events(
+                headers,
+                data.get("from"),
+                data.get("to"),
+                data.get("interval"),
+                query.get("limit"),
+            )
+
+    def _start_task(
+        self, fake_model: FakeModel, key: str, on_complete: Callable = None
+    ) -> FakeTask:
+        task = FakeTask(token_hex(16).upper(), time(), self.task_duration, on_complete)
+        with self._lock:
+            fake_model.tasks.setdefault(key, {})[task.task_id] = task
+        return task
+
+    @staticmethod
+    def _list_csv(items: list[dict]) -> bytes:
+        lines = ["Name,Code,Parent\n"]
+        lines += [f"{i['name']},{i['code']},{i['parent']}\n" for i in items]
+        return "".join(lines).encode()
+
+    def _export_data(self, model_id: str) -> bytes:
+        """Exports are simply dumping the first list of the model as CSV."""
+        return self._list_csv(next(iter(self.models[model_id].lists.values())).items)
+
+    @staticmethod
+    def _view_csv(
+        fake_model: FakeModel, view_id: str, pages: Optional[dict[str, str]]
+    ) -> bytes:
+        """Generate view's data - all pages (if not selected) as rows, with numbers."""
+        view = fake_model.views[view_id]
+
+        def items(dim: str) -> list[dict]:
+            return fake_model.lists[dim].items
+
+        page_dims = [dim for dim in view.pages if pages is None or dim not in pages]
+        columns = list(product(*(items(dim) for dim in view.columns)))
+        header = ",".join(
+            [""] * (len(page_dims) + len(view.rows))
+            + ["/".join(item["name"] for item in column) for column in columns]
+        )
+        lines = [header + "\n"]
+        row_number = 0
+        for page in product(*(items(dim) for dim in page_dims)):
+            for row in product(*(items(dim) for dim in view.rows)):
+                names = [item["name"] for item in page + row]
+                values = [
+                    str(row_number * len(columns) + c) for c in range(len(columns))
+                ]
+                lines.append(",".join(names + values) + "\n")
+                row_number += 1
+        return "".join(lines).encode()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """HTTP handler passing all the requests to FakeAnaplan instance of the server."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    wbufsize = 1 << 16
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            parts = []
+            while size := int(self.rfile.readline().split(b";")[0], 16):
+                parts.append(self.rfile.read(size))
+                self.rfile.readline()
+            self.rfile.readline()
+            return b"".join(parts)
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _handle(self) -> None:
+        body = self._read_body()
+        status, headers, data = self.server.fake.handle(
+            self.command, self.path, dict(self.headers), body
+        )
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        if not self.server.fake.chunked:
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(data)
+            return
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        if self.command != "HEAD":
+            for i in range(0, len(data), 1 << 16):
+                chunk = data[i : i + (1 << 16)]
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
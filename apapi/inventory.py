@@ -0,0 +1,129 @@
+"""
+apapi.inventory
+
+This module provides a crawler of tenant's inventory - workspaces, models and their
+lists, modules, line items, views, actions & files - fetched with bounded concurrency,
+and saved as a snapshot, so the next crawl refreshes only models modified since.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from time import time
+
+from .connection import Connection
+
+MODEL_CONTENT: dict[str, tuple[str, str, tuple]] = {
+    "lists": ("get_lists", "lists", ()),
+    "modules": ("get_modules", "modules", ()),
+    "lineitems": ("get_lineitems", "items", (True,)),
+    "views": ("get_views", "views", (True,)),
+    "imports": ("get_imports", "imports", ()),
+    "exports": ("get_exports", "exports", ()),
+    "actions": ("get_actions", "actions", ()),
+    "processes": ("get_processes", "processes", ()),
+    "files": ("get_files", "files", ()),
+}
+"""Content of a model in snapshot - connection's method, key of array it returns
+& its arguments after model ID (details are requested explicitly, regardless of
+connection's default)."""
+
+
+class InventoryCrawler:
+    """Crawls all workspaces & models of the tenant into a JSON snapshot file.
+
+    All requests (one per type of model's content) share a pool of max workers
+    threads. Models with the same "lastModified" as in the previous snapshot
+    (and crawled successfully) are taken from it, without any request. Content of
+    archived models is not available, and models which failed are crawled again
+    on the next run.
+    """
+
+    def __init__(
+        self, connection: Connection, snapshot_path: str, max_workers: int = 8
+    ):
+        self.connection: Connection = connection
+        self.snapshot_path: str = snapshot_path
+        """Path of JSON file with the snapshot (read before & written after crawl)."""
+        self.max_workers: int = max_workers
+
+    def load_snapshot(self) -> dict:
+        """Get the last snapshot - empty if there is none yet."""
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {"workspaces": {}, "models": {}}
+
+    def crawl(self, full: bool = False) -> dict:
+        """Crawl the tenant (only modified models, unless full) & save the snapshot.
+
+        Snapshot has workspaces & models by IDs - each model with its info (under
+        "model"), content (see MODEL_CONTENT) & time of crawl (epoch in ms).
+        """
+        previous = {} if full else self.load_snapshot()["models"]
+        workspaces = self.connection.get_workspaces(True).json().get("workspaces", [])
+        models = self.connection.get_models(True).json().get("models", [])
+        snapshot = {
+            "crawled": int(time() * 1000),
+            "workspaces": {workspace["id"]: workspace for workspace in workspaces},
+            "models": {},
+        }
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            pending = {}
+            for model in models:
+                entry = previous.get(model["id"])
+                if (
+                    entry is not None
+                    and "error" not in entry
+                    and entry["model"].get("lastModified") == model.get("lastModified")
+                ):
+                    snapshot["models"][model["id"]] = entry
+                elif model.get("activeState") == "ARCHIVED":
+                    snapshot["models"][model["id"]] = {
+                        "model": model,
+                        "crawled": snapshot["crawled"],
+                    }
+                else:
+                    pending[model["id"]] = (
+                        model,
+                        {
+                            content: executor.submit(
+                                copy_context().run,
+                                getattr(self.connection, method),
+                                model["id"],
+                                *args,
+                            )
+                            for content, (method, _, args) in MODEL_CONTENT.items()
+                        },
+                    )
+            for model_id, (model, futures) in pending.items():
+                snapshot["models"][model_id] = self._model_entry(
+                    model, futures, snapshot["crawled"]
+                )
+        logging.info(
+            f"Inventory crawled: {len(pending)} of {len(models)} models refreshed"
+        )
+        self._save_snapshot(snapshot)
+        return snapshot
+
+    @staticmethod
+    def _model_entry(model: dict, futures: dict, crawled: int) -> dict:
+        entry = {"model": model, "crawled": crawled}
+        try:
+            for content, future in futures.items():
+                key = MODEL_CONTENT[content][1]
+                entry[content] = future.result().json().get(key, [])
+        except Exception as error:
+            logging.error(f"Crawl of model {model['id']} failed: {error}")
+            return {"model": model, "crawled": crawled, "error": str(error)}
+        return entry
+
+    def _save_snapshot(self, snapshot: dict) -> None:
+        temp_path = f"{self.snapshot_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(snapshot, file)
+        os.replace(temp_path, self.snapshot_path)
@@ -0,0 +1,195 @@
+"""
+apapi.metrics
+
+This module provides in-process collection of requests metrics, aggregated by endpoint.
+"""
+from __future__ import annotations
+
+import re
+from bisect import bisect_left
+from collections import Counter
+from threading import Lock
+from typing import Final
+from urllib.parse import urlsplit
+
+LATENCY_BUCKETS: Final[tuple] = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+"""Upper bounds (in seconds) of latency histogram buckets."""
+
+_VERSION_PREFIX = re.compile(r"^/(2/0|audit/api/1)/")
+_COUNTED_SEGMENTS = ("chunks", "pages")
+
+
+def endpoint_template(url: str) -> str:
+    """Turn URL into endpoint template, i.e. models/{id}/files/{id}/chunks/{n}.
+
+    Any path segment containing digit is treated as an ID - or as a number,
+    if it directly follows "chunks" or "pages" segment.
+    """
+    segments = _VERSION_PREFIX.sub("", urlsplit(url).path).strip("/").split("/")
+    for i, segment in enumerate(segments):
+        if any(char.isdigit() for char in segment):
+            counted = i and segments[i - 1] in _COUNTED_SEGMENTS
+            segments[i] = "{n}" if counted else "{id}"
+    return "/".join(segments)
+
+
+class EndpointStats:
+    """Aggregated metrics of requests sent to one endpoint with one method."""
+
+    __slots__ = (
+        "count",
+        "errors",
+        "retries",
+        "bytes_out",
+        "bytes_in",
+        "latency_sum",
+        "latency_max",
+        "latency_buckets",
+        "wait_sum",
+        "status_codes",
+    )
+
+    def __init__(self):
+        self.count: int = 0
+        self.errors: int = 0
+        self.retries: int = 0
+        self.bytes_out: int = 0
+        self.bytes_in: int = 0
+        self.latency_sum: float = 0.0
+        self.latency_max: float = 0.0
+        # last bucket holds requests slower than the biggest bound (+Inf)
+        self.latency_buckets: list[int] = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.wait_sum: float = 0.0
+        """Seconds spent waiting for the rate limiter (not included in latency)."""
+        self.status_codes: Counter = Counter()
+
+    def as_dict(self) -> dict:
+        """Get all the metrics as a dictionary."""
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "retries": self.retries,
+            "bytes_out": self.bytes_out,
+            "bytes_in": self.bytes_in,
+            "latency_sum": self.latency_sum,
+            "latency_max": self.latency_max,
+            "latency_avg": self.latency_sum / self.count if self.count else 0.0,
+            "latency_buckets": dict(
+                zip(LATENCY_BUCKETS + (float("inf"),), self.latency_buckets)
+            ),
+            "wait_sum": self.wait_sum,
+            "status_codes": dict(self.status_codes),
+        }
+
+
+class MetricsCollector:
+    """Thread-safe collector of requests metrics, keyed by method & endpoint template.
+
+    To use it, assign it to connection's metrics attribute - the same collector can be
+    shared by many connections. Status code 0 means that no response was received.
+    """
+
+    def __init__(self):
+        self._lock: Lock = Lock()
+        self._stats: dict[tuple[str, str], EndpointStats] = {}
+
+    def record(
+        self,
+        method: str,
+        url: str,
+        status_code: int,
+        latency: float,
+        bytes_out: int = 0,
+        bytes_in: int = 0,
+        retries: int = 0,
+        wait_time: float = 0.0,
+    ) -> None:
+        """Add single request to the metrics.
+
+        Latency is time spent by sending request (and its retries) to the server,
+        while wait time is time spent waiting for the rate limiter.
+        """
+        key = (method, endpoint_template(url))
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = EndpointStats()
+            stats.count += 1
+            stats.errors += not 0 < status_code < 400
+            stats.retries += retries
+            stats.bytes_out += bytes_out
+            stats.bytes_in += bytes_in
+            stats.latency_sum += latency
+            stats.latency_max = max(stats.latency_max, latency)
+            stats.latency_buckets[bisect_left(LATENCY_BUCKETS, latency)] += 1
+            stats.wait_sum += wait_time
+            stats.status_codes[status_code] += 1
+
+    def snapshot(self) -> dict[str, dict]:
+        """Get current metrics, with keys like "GET models/{id}/files/{id}"."""
+        with self._lock:
+            return {
+                f"{m} {e}": stats.as_dict() for (m, e), stats in self._stats.items()
+            }
+
+    def reset(self) -> None:
+        """Remove all metrics collected so far."""
+        with self._lock:
+            self._stats.clear()
+
+    def to_prometheus(self, prefix: str = "apapi") -> str:
+        """Export metrics in Prometheus text exposition format."""
+        lines = [
+            f"# HELP {prefix}_request_duration_seconds Latency of Anaplan API requests.",
+            f"# TYPE {prefix}_request_duration_seconds histogram",
+        ]
+        counters = {
+            "requests_total": ("Number of requests.", []),
+            "request_errors_total": ("Number of failed requests.", []),
+            "request_retries_total": ("Number of retried attempts.", []),
+            "request_sent_bytes_total": ("Bytes sent in request bodies.", []),
+            "response_received_bytes_total": ("Bytes received in responses.", []),
+            "request_wait_seconds_total": ("Seconds waited for rate limiter.", []),
+        }
+        with self._lock:
+            for (method, endpoint), stats in sorted(self._stats.items()):
+                labels = f'method="{method}",endpoint="{endpoint}"'
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, stats.latency_buckets):
+                    cumulative += count
+                    lines.append(
+                        f"{prefix}_request_duration_seconds_bucket"
+                        f'{{{labels},le="{bound}"}} {cumulative}'
+                    )
+                lines += [
+                    f"{prefix}_request_duration_seconds_bucket"
+                    f'{{{labels},le="+Inf"}} {stats.count}',
+                    f"{prefix}_request_duration_seconds_sum{{{labels}}} "
+                    f"{stats.latency_sum}",
+                    f"{prefix}_request_duration_seconds_count{{{labels}}} "
+                    f"{stats.count}",
+                ]
+                for status_code, count in sorted(stats.status_codes.items()):
+                    counters["requests_total"][1].append(
+                        f'{{{labels},status="{status_code}"}} {count}'
+                    )
+                counters["request_errors_total"][1].append(
+                    f"{{{labels}}} {stats.errors}"
+                )
+                counters["request_retries_total"][1].append(
+                    f"{{{labels}}} {stats.retries}"
+                )
+                counters["request_sent_bytes_total"][1].append(
+                    f"{{{labels}}} {stats.bytes_out}"
+                )
+                counters["response_received_bytes_total"][1].append(
+                    f"{{{labels}}} {stats.bytes_in}"
+                )
+                counters["request_wait_seconds_total"][1].append(
+                    f"{{{labels}}} {stats.wait_sum}"
+                )
+        for name, (description, samples) in counters.items():
+            lines.append(f"# HELP {prefix}_{name} {description}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            lines += [f"{prefix}_{name}{sample}" for sample in samples]
+        return "\n".join(lines) + "\n"
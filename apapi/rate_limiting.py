@@ -0,0 +1,179 @@
+"""
+apapi.rate_limiting
+
+This module provides client-side rate limiting, shared by all connections that use
+the same authentication object (and so the same session).
+"""
+from __future__ import annotations
+
+import logging
+from email.utils import parsedate_to_datetime
+from threading import Lock
+from time import monotonic, sleep, time
+from typing import TYPE_CHECKING, Callable, Optional
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    from requests import Response
+
+TOO_MANY_REQUESTS = 429
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Convert value of Retry-After header (seconds or HTTP-date) to seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket, which adapts its rate to the throttling it sees.
+
+    Rate (requests per second) can be given up front - if not, requests are unlimited
+    until the first throttling, when rate is set to a fraction of observed throughput.
+    Each throttling multiplies rate by decrease factor (at most once per second, as
+    requests sent in parallel usually get throttled together), and each success adds
+    to it, so that rate grows by "increase" requests per second, every second.
+    Retry-After pauses the whole bucket, so all threads wait - not only the throttled.
+    """
+
+    def __init__(
+        self,
+        rate: float = None,
+        burst: int = 10,
+        min_rate: float = 0.5,
+        max_rate: float = None,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+    ):
+        self.rate: Optional[float] = rate
+        """Current rate in requests per second (None means unlimited)."""
+        self.burst: int = burst
+        """Number of requests which can be sent at once, if bucket was idle."""
+        self.min_rate: float = min_rate
+        self.max_rate: Optional[float] = max_rate
+        self.increase: float = increase
+        self.decrease: float = decrease
+        self._lock: Lock = Lock()
+        # theoretical arrival time of the next request (as in GCRA)
+        self._next_at: float = 0.0
+        self._paused_until: float = 0.0
+        self._last_decrease: float = 0.0
+        # throughput observation, used when throttled for the first time
+        self._window_start: float = monotonic()
+        self._window_count: int = 0
+        self._observed_rate: float = 0.0
+
+    def acquire(self) -> float:
+        """Wait until request can be sent - returns number of seconds waited."""
+        with self._lock:
+            now = monotonic()
+            self._observe(now)
+            start = max(now, self._paused_until)
+            if self.rate is None:
+                wait_until = start
+            else:
+                interval = 1 / self.rate
+                next_at = max(self._next_at, start)
+                wait_until = max(start, next_at - (self.burst - 1) * interval)
+                self._next_at = next_at + interval
+        waited = wait_until - now
+        if waited > 0:
+            sleep(waited)
+        return max(waited, 0.0)
+
+    def on_success(self) -> None:
+        """Increase rate after a successful (not throttled) request."""
+        with self._lock:
+            if self.rate is not None:
+                self.rate += self.increase / self.rate
+                if self.max_rate is not None:
+                    self.rate = min(self.rate, self.max_rate)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        """Decrease rate (and pause if asked to) after a throttled request."""
+        with self._lock:
+            now = monotonic()
+            if retry_after is not None:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            if now - self._last_decrease < 1:
+                return
+            self._last_decrease = now
+            if self.rate is None:
+                elapsed = max(now - self._window_start, 1e-3)
+                current = max(self._observed_rate, self._window_count / elapsed)
+                self.rate = current * self.decrease
+            else:
+                self.rate *= self.decrease
+            self.rate = max(self.rate, self.min_rate)
+            logging.info(f"Request rate decreased to {self.rate:.2f}/s")
+
+    def _observe(self, now: float) -> None:
+        """Count requests within last full second to estimate throughput."""
+        if now - self._window_start >= 1:
+            self._observed_rate = self._window_count / (now - self._window_start)
+            self._window_start = now
+            self._window_count = 0
+        self._window_count += 1
+
+
+class RateLimiter:
+    """Set of token buckets, one per host - so auth, audit & API have own budgets.
+
+    Rates are initial requests per second for hosts (keys can be either full URLs
+    like apapi.utils.API_URL, or just host names) - others start unlimited.
+    Throttled requests (429) are retried up to max retries times.
+    """
+
+    def __init__(
+        self, rates: dict[str, float] = None, burst: int = 10, max_retries: int = 5
+    ):
+        self._rates: dict[str, float] = {
+            urlsplit(key).netloc or key: rate for key, rate in (rates or {}).items()
+        }
+        self._burst: int = burst
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock: Lock = Lock()
+        self.max_retries: int = max_retries
+        """How many times throttled request should be retried."""
+
+    def bucket(self, url: str) -> TokenBucket:
+        """Get token bucket of the host of given URL."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self._rates.get(host), self._burst)
+            return self._buckets[host]
+
+    def call(
+        self, url: str, send: Callable[[], Response], replayable: bool = True
+    ) -> Response:
+        """Send request (using given function) within rate limit of URL's host.
+
+        Throttled response is closed (releasing its pooled connection) before retry.
+        Requests which can't be sent again (i.e. with body read from a generator
+        or a file) are not retried - their throttled response is returned instead.
+        """
+        bucket = self.bucket(url)
+        for attempt in range(self.max_retries + 1):
+            bucket.acquire()
+            response = send()
+            if response.status_code != TOO_MANY_REQUESTS:
+                # server errors don't prove that the rate is fine
+                if response.status_code < 500:
+                    bucket.on_success()
+                return response
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            logging.warning(f"Request throttled (Retry-After: {retry_after})\t{url}")
+            bucket.on_throttle(retry_after)
+            if not replayable or attempt == self.max_retries:
+                break
+            response.close()
+        return response
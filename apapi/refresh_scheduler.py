@@ -0,0 +1,128 @@
+"""
+apapi.refresh_scheduler
+
+This module provides a scheduler of token refreshes - single background thread
+serving all authentication objects, instead of a timer thread for each of them.
+"""
+from __future__ import annotations
+
+import heapq
+import logging
+from itertools import count
+from random import uniform
+from threading import Condition, Lock, Thread
+from time import time
+from typing import Callable, Optional
+from weakref import WeakMethod
+
+
+class ScheduledRefresh:
+    """Handle of a scheduled refresh, which can be used to cancel it."""
+
+    __slots__ = ("due", "cancelled", "_callback")
+
+    def __init__(self, due: float, callback: Callable[[], None]):
+        self.due: float = due
+        """Time (epoch seconds) when the refresh should run."""
+        self.cancelled: bool = False
+        # weak reference to bound method, so not closed auth objects can be collected
+        self._callback = (
+            WeakMethod(callback) if hasattr(callback, "__self__") else lambda: callback
+        )
+
+    def callback(self) -> Optional[Callable[[], None]]:
+        """Get the callback - None if its object doesn't exist anymore."""
+        return self._callback()
+
+
+class RefreshScheduler:
+    """Runs token refreshes ahead of tokens' expiration, in one daemon thread.
+
+    Each refresh runs lead seconds (plus random jitter, so that many refreshes
+    don't hit the auth service at once) before expiration - but not earlier than
+    in a half of the remaining lifetime. Failed refreshes are retried every retry
+    interval seconds, until they succeed or get cancelled.
+    By default, all authentication objects share one scheduler (see default()).
+    """
+
+    _default: Optional[RefreshScheduler] = None
+    _default_lock: Lock = Lock()
+
+    def __init__(
+        self, lead: float = 60, jitter: float = 30, retry_interval: float = 30
+    ):
+        self.lead: float = lead
+        self.jitter: float = jitter
+        self.retry_interval: float = retry_interval
+        self._condition: Condition = Condition()
+        self._heap: list[tuple[float, int, ScheduledRefresh]] = []
+        self._counter = count()
+        self._thread: Optional[Thread] = None
+        self._stopped: bool = False
+
+    @classmethod
+    def default(cls) -> RefreshScheduler:
+        """Get scheduler shared by all authentication objects (created on first use)."""
+        with cls._default_lock:
+            if cls._default is None or cls._default._stopped:
+                cls._default = cls()
+            return cls._default
+
+    def schedule(
+        self, callback: Callable[[], None], expires_at: float
+    ) -> ScheduledRefresh:
+        """Schedule callback to run ahead of expiration time (epoch seconds)."""
+        remaining = max(expires_at - time(), 0.0)
+        lead = min(self.lead + uniform(0, self.jitter), remaining / 2)
+        entry = ScheduledRefresh(expires_at - lead, callback)
+        self._push(entry)
+        return entry
+
+    def cancel(self, entry: Optional[ScheduledRefresh]) -> None:
+        """Cancel scheduled refresh (if it hasn't run yet)."""
+        if entry is not None:
+            entry.cancelled = True
+
+    def shutdown(self, timeout: float = None) -> None:
+        """Stop the scheduler thread - pending refreshes won't run anymore."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _push(self, entry: ScheduledRefresh) -> None:
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("Refresh scheduler was shut down")
+            heapq.heappush(self._heap, (entry.due, next(self._counter), entry))
+            if self._thread is None:
+                self._thread = Thread(
+                    target=self._run, name="apapi-token-refresh", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while True:
+                    if self._stopped:
+                        return
+                    while self._heap and self._heap[0][2].cancelled:
+                        heapq.heappop(self._heap)
+                    delay = self._heap[0][0] - time() if self._heap else None
+                    if delay is not None and delay <= 0:
+                        entry = heapq.heappop(self._heap)[2]
+                        break
+                    self._condition.wait(delay)
+            callback = entry.callback()
+            if callback is None:
+                continue
+            try:
+                callback()
+            except Exception as error:
+                logging.error(f"Token refresh failed (retrying later): {error}")
+                if not entry.cancelled and not self._stopped:
+                    entry.due = time() + self.retry_interval
+                    self._push(entry)
@@ -0,0 +1,204 @@
+"""
+apapi.results
+
+This module provides optional typed results, which can be created from raw responses
+returned by connections' methods, i.e. Task.from_response(conn.get_import_task(...)).
+Results are compact (__slots__) and parse the response body lazily - only once,
+on first access to any of their attributes - after which the body is dropped.
+"""
+from __future__ import annotations
+
+import json
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Optional, Union
+
+if TYPE_CHECKING:
+    from requests import Response
+
+
+class Result(ABC):
+    """Base of typed results - subclasses define their slots and _load() method."""
+
+    __slots__ = ("_raw",)
+
+    _keys: tuple[str, ...] = ()
+    """Keys under which result may be wrapped in response (i.e. "task")."""
+
+    def __init__(self, raw: Union[bytes, str, dict]):
+        self._raw: Optional[Union[bytes, str, dict]] = raw
+
+    @classmethod
+    def from_response(cls, response: Response) -> Result:
+        """Create result from the (JSON) response - its content is parsed lazily."""
+        return cls(response.content)
+
+    @classmethod
+    def list_from_response(cls, response: Response, key: str) -> list[Result]:
+        """Create results from array under the key, i.e. "modules" of get_modules()."""
+        return [cls(item) for item in response.json().get(key, [])]
+
+    def __getattr__(self, name: str):
+        # called only for slots that are not set yet, so (at most once) parse the body
+        raw = object.__getattribute__(self, "_raw")
+        if raw is None or name.startswith("__"):
+            raise AttributeError(name)
+        data = raw if isinstance(raw, dict) else json.loads(raw)
+        for key in self._keys:
+            if key in data:
+                data = data[key]
+                break
+        self._load(data)
+        # parsing twice (if threads race for it) is harmless, as it gives the same
+        self._raw = None
+        return object.__getattribute__(self, name)
+
+    @abstractmethod
+    def _load(self, data: dict) -> None:
+        """Abstract method - implementation should set all the slots from data."""
+        pass
+
+    def __repr__(self) -> str:
+        fields = ", ".join(
+            f"{name}={getattr(self, name)!r}"
+            for cls in type(self).__mro__
+            if issubclass(cls, Result) and cls is not Result
+            for name in cls.__slots__
+        )
+        return f"{type(self).__name__}({fields})"
+
+
+class TaskResult(Result):
+    """Result of a task - or one of nested results (of process' actions)."""
+
+    __slots__ = ("object_id", "successful", "failure_dump_available", "details")
+
+    def _load(self, data: dict) -> None:
+        self.object_id: Optional[str] = data.get("objectId")
+        self.successful: bool = data.get("successful", False)
+        self.failure_dump_available: bool = data.get("failureDumpAvailable", False)
+        self.details: list[dict] = data.get("details", [])
+
+
+class Task(Result):
+    """Task of an action, i.e. from BulkConnection.get_import_task()."""
+
+    __slots__ = (
+        "task_id",
+        "state",
+        "creation_time",
+        "progress",
+        "current_step",
+        "result",
+        "nested_results",
+    )
+    _keys = ("task",)
+
+    def _load(self, data: dict) -> None:
+        self.task_id: str = data.get("taskId")
+        self.state: str = data.get("taskState")
+        self.creation_time: Optional[int] = data.get("creationTime")
+        self.progress: Optional[float] = data.get("progress")
+        self.current_step: Optional[str] = data.get("currentStep")
+        result = data.get("result")
+        self.result: Optional[TaskResult] = TaskResult(result) if result else None
+        self.nested_results: tuple[TaskResult, ...] = tuple(
+            TaskResult(nested) for nested in (result or {}).get("nestedResults", [])
+        )
+
+    @property
+    def done(self) -> bool:
+        """Whether task has finished (either complete or cancelled)."""
+        return self.state in ("COMPLETE", "CANCELLED")
+
+    @property
+    def successful(self) -> bool:
+        """Whether task has finished successfully."""
+        return self.result is not None and self.result.successful
+
+
+class ReadRequest(Result):
+    """Large read request of a list or a view, i.e. from start_large_list_read()."""
+
+    __slots__ = ("request_id", "state", "available_pages", "successful", "url")
+    _keys = ("listReadRequest", "viewReadRequest")
+
+    def _load(self, data: dict) -> None:
+        self.request_id: str = data.get("requestId")
+        self.state: str = data.get("requestState")
+        self.available_pages: int = data.get("availablePages", 0)
+        self.successful: bool = data.get("successful", False)
+        self.url: Optional[str] = data.get("url")
+
+    @property
+    def done(self) -> bool:
+        """Whether all pages are available."""
+        return self.state == "COMPLETE"
+
+
+class Chunks(Result):
+    """Chunks metadata of a file or a dump (from GET of its "chunks" endpoint)."""
+
+    __slots__ = ("count", "ids")
+
+    def _load(self, data: dict) -> None:
+        self.count: int = (
+            data.get("meta", {}).get("paging", {}).get("currentPageSize", 0)
+        )
+        self.ids: tuple[str, ...] = tuple(
+            chunk["id"] for chunk in data.get("chunks", [])
+        )
+
+
+class ListInfo(Result):
+    """List (its metadata from get_list(), or its entry from get_lists())."""
+
+    __slots__ = (
+        "id",
+        "name",
+        "item_count",
+        "numbered",
+        "parent",
+        "properties",
+        "subsets",
+    )
+    _keys = ("metadata",)
+
+    def _load(self, data: dict) -> None:
+        self.id: str = data.get("id")
+        self.name: str = data.get("name")
+        self.item_count: Optional[int] = data.get("itemCount")
+        self.numbered: Optional[bool] = data.get("numberedList")
+        self.parent: Optional[dict] = data.get("parent")
+        self.properties: list[dict] = data.get("properties", [])
+        self.subsets: list[dict] = data.get("subsets", [])
+
+
+class Module(Result):
+    """Module entry from TransactionalConnection.get_modules()."""
+
+    __slots__ = ("id", "name")
+
+    def _load(self, data: dict) -> None:
+        self.id: str = data.get("id")
+        self.name: str = data.get("name")
+
+
+class View(Result):
+    """View - its entry from get_views(), or dimensions from get_view_dimensions().
+
+    Dimensions (rows, columns & pages) are tuples of IDs - None for view entries.
+    """
+
+    __slots__ = ("id", "name", "module_id", "rows", "columns", "pages")
+
+    def _load(self, data: dict) -> None:
+        self.id: str = data.get("id", data.get("viewId"))
+        self.name: str = data.get("name", data.get("viewName"))
+        self.module_id: Optional[str] = data.get("moduleId")
+        self.rows: Optional[tuple[str, ...]] = self._ids(data, "rows")
+        self.columns: Optional[tuple[str, ...]] = self._ids(data, "columns")
+        self.pages: Optional[tuple[str, ...]] = self._ids(data, "pages")
+
+    @staticmethod
+    def _ids(data: dict, key: str) -> Optional[tuple[str, ...]]:
+        return tuple(d["id"] for d in data[key]) if key in data else None
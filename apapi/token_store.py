@@ -0,0 +1,112 @@
+"""
+apapi.token_store
+
+This module provides a token store, which allows processes on one host to share
+Anaplan authentication tokens - instead of each of them authenticating on its own.
+"""
+from __future__ import annotations
+
+import json
+import os
+from contextlib import contextmanager
+from hashlib import sha256
+from threading import Lock
+from time import sleep, time
+from typing import Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileTokenStore:
+    """Tokens kept in a JSON file, with access serialized by a lock file next to it.
+
+    Authentication objects using the store look for a valid token before
+    authenticating, and update it after refresh - all while holding the lock,
+    so only one process authenticates (or rotates refresh token) at a time.
+    Rotated OAuth2 refresh tokens are kept with the tokens, so the latest one is
+    used by all processes.
+    As tokens are shared, authentication objects using the store don't log out
+    when closed. File is readable only by its owner, as it holds tokens in plain text.
+    """
+
+    def __init__(self, path: str, margin: float = 60):
+        self.path: str = path
+        """Path of the JSON file with tokens."""
+        self.margin: float = margin
+        """Tokens expiring within this number of seconds are treated as expired."""
+        self._lock: Lock = Lock()
+
+    @staticmethod
+    def key(*parts: str) -> str:
+        """Get key of a token from parts identifying credentials (which are hashed)."""
+        return sha256("\0".join(parts).encode()).hexdigest()
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        """Hold exclusive lock of the store (for threads & processes) within context."""
+        with self._lock, open(f"{self.path}.lock", "a+b") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        sleep(0.05)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def load(self, key: str) -> Optional[tuple[str, float]]:
+        """Get token & its expiration time (epoch seconds), if it's still valid."""
+        entry = self._read().get(key)
+        if entry is None or entry["expires_at"] - self.margin <= time():
+            return None
+        return entry["token"], entry["expires_at"]
+
+    def load_refresh_token(self, key: str) -> Optional[str]:
+        """Get the latest (rotated) OAuth2 refresh token stored with the token."""
+        return self._read().get(key, {}).get("refresh_token")
+
+    def save(
+        self, key: str, token: str, expires_at: float, refresh_token: str = None
+    ) -> None:
+        """Store token & its expiration time (epoch seconds), dropping expired ones.
+
+        Rotated refresh token (if given) replaces the stored one - entries holding
+        refresh tokens are kept even after their tokens expire.
+        """
+        now = time()
+        tokens = {
+            k: v
+            for k, v in self._read().items()
+            if v["expires_at"] > now or "refresh_token" in v
+        }
+        entry = {"token": token, "expires_at": expires_at}
+        refresh_token = refresh_token or tokens.get(key, {}).get("refresh_token")
+        if refresh_token is not None:
+            entry["refresh_token"] = refresh_token
+        tokens[key] = entry
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        descriptor = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(descriptor, "w", encoding="utf-8") as file:
+            json.dump(tokens, file)
+        os.replace(temp_path, self.path)
+
+    def _read(self) -> dict[str, dict]:
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {}
@@ -0,0 +1,222 @@
+"""
+apapi.tracing
+
+This module provides lightweight tracing of logical operations - each operation is
+a span, with child spans for all requests sent as its part. No collector is needed,
+spans are exported in memory or to JSON-lines file.
+"""
+from __future__ import annotations
+
+import json
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from secrets import token_hex
+from threading import Lock
+from time import monotonic, time
+from typing import Iterator, Optional
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("apapi_span", default=None)
+
+AGGREGATED_ATTRIBUTES = (
+    "requests",
+    "retries",
+    "bytes_out",
+    "bytes_in",
+    "throttle_time",
+    "wait_time",
+    "transfer_time",
+)
+"""Numeric attributes of spans which are summed up in parent spans."""
+
+_ID_OWNERS = {
+    "actions": "action_id",
+    "dimensions": "dimension_id",
+    "exports": "export_id",
+    "files": "file_id",
+    "imports": "import_id",
+    "lineItems": "lineitem_id",
+    "lists": "list_id",
+    "models": "model_id",
+    "modules": "module_id",
+    "processes": "process_id",
+    "readRequests": "request_id",
+    "syncTasks": "task_id",
+    "tasks": "task_id",
+    "views": "view_id",
+    "workspaces": "workspace_id",
+}
+_HAS_DIGIT = re.compile(r"\d")
+
+
+def url_ids(url: str) -> dict[str, str]:
+    """Extract IDs of Anaplan objects from URL, i.e. {"model_id": ..., "file_id": ...}"""
+    segments = url.split("?", 1)[0].split("/")
+    return {
+        _ID_OWNERS[owner]: segment
+        for owner, segment in zip(segments, segments[1:])
+        if owner in _ID_OWNERS and _HAS_DIGIT.search(segment)
+    }
+
+
+class Span:
+    """Single traced operation. Attributes can be added using Span.set()."""
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent",
+        "start_time",
+        "end_time",
+        "attributes",
+        "error",
+        "_start",
+        "_tracer",
+    )
+
+    def __init__(
+        self, tracer: Tracer, name: str, parent: Optional[Span], attributes: dict
+    ):
+        self.name: str = name
+        self.trace_id: str = parent.trace_id if parent else token_hex(16)
+        self.span_id: str = token_hex(8)
+        self.parent: Optional[Span] = parent
+        self.start_time: float = time()
+        self.end_time: Optional[float] = None
+        self.attributes: dict = attributes
+        self.error: Optional[str] = None
+        self._start: float = monotonic()
+        self._tracer: Tracer = tracer
+
+    @property
+    def duration(self) -> Optional[float]:
+        """Duration of the operation in seconds (None if it is still running)."""
+        return None if self.end_time is None else self.end_time - self.start_time
+
+    def set(self, **attributes) -> None:
+        """Add or replace attributes of the span."""
+        self.attributes.update(attributes)
+
+    def end(self, error: BaseException = None) -> None:
+        """Finish the operation - add its totals to parent and export the span."""
+        if self.end_time is not None:
+            return
+        self.end_time = self.start_time + monotonic() - self._start
+        if error is not None:
+            self.error = repr(error)
+        if self.parent is not None:
+            with self._tracer._lock:
+                for key in AGGREGATED_ATTRIBUTES:
+                    if key in self.attributes:
+                        parent_attributes = self.parent.attributes
+                        parent_attributes[key] = (
+                            parent_attributes.get(key, 0) + self.attributes[key]
+                        )
+        for exporter in self._tracer.exporters:
+            exporter.export(self)
+
+    def as_dict(self) -> dict:
+        """Get span as a dictionary (JSON-serializable, if attributes are)."""
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration": self.duration,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Tracer:
+    """Creates spans and passes finished ones to exporters.
+
+    To trace connection's operations, assign a tracer to its tracer attribute.
+    Current span is kept in a context variable - so threads started within a span
+    should run in a copy of the context (contextvars.copy_context()) to be its children.
+    Operation time not spent on requests (wait & transfer time) is i.e. polling sleep.
+    """
+
+    def __init__(self, *exporters):
+        self.exporters: list = list(exporters)
+        """Objects with export(span) method, called for each finished span."""
+        self._lock: Lock = Lock()
+
+    @staticmethod
+    def current_span() -> Optional[Span]:
+        """Get span that is active in the current context."""
+        return _current_span.get()
+
+    def start_span(self, name: str, parent: Span = None, **attributes) -> Span:
+        """Start span (child of current one if parent not given) without activating it.
+
+        Such span has to be finished using Span.end().
+        """
+        return Span(self, name, parent or _current_span.get(), attributes)
+
+    @contextmanager
+    def activate(self, span: Span) -> Iterator[Span]:
+        """Make span current one (parent of new spans) within the context manager."""
+        token = _current_span.set(span)
+        try:
+            yield span
+        finally:
+            _current_span.reset(token)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        """Trace an operation within the context manager, as a child of current span."""
+        span = self.start_span(name, **attributes)
+        try:
+            with self.activate(span):
+                yield span
+        except BaseException as error:
+            span.end(error)
+            raise
+        span.end()
+
+
+class InMemoryExporter:
+    """Keeps finished spans in a list."""
+
+    def __init__(self):
+        self.spans: list[Span] = []
+        self._lock: Lock = Lock()
+
+    def export(self, span: Span) -> None:
+        """Store finished span."""
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self) -> None:
+        """Remove all stored spans."""
+        with self._lock:
+            self.spans.clear()
+
+
+class JSONLinesExporter:
+    """Appends finished spans to a file, each as a JSON object in a separate line."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock: Lock = Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def export(self, span: Span) -> None:
+        """Write finished span to the file."""
+        line = json.dumps(span.as_dict(), default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self) -> None:
+        """Close the file."""
+        self._file.close()
@@ -5,13 +5,23 @@ Child of Basic Connection class, responsible for Transactional API capabilities.
 """
 from __future__ import annotations
 
+import csv
+import io
 import json
-from typing import Iterable
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from functools import partial
+from itertools import islice
+from math import prod
+from time import sleep
+from typing import Callable, Iterable, Iterator
 
 from requests import Response
 
 from .basic_connection import BasicConnection
-from .utils import ENCODING_GZIP, PAGING_LIMIT, ExportType, MIMEType
+from .results import ListInfo, ReadRequest, View
+from .utils import CELLS_LIMIT, PAGING_LIMIT, ExportType, MIMEType, polling_intervals
 
 
 class TransactionalConnection(BasicConnection):
@@ -216,13 +226,10 @@ class TransactionalConnection(BasicConnection):
         If there are i.e. 10 available pages, it means that pages from 0 to 9 are ready.
         You can clean after read using TransactionalConnection.delete_large_list_read().
         """
-        headers = {"Accept": MIMEType.TEXT_CSV.value}
-        if compress or (compress is None and self.compress):
-            headers["Accept-Encoding"] = ENCODING_GZIP
         return self.request(
             "GET",
             f"{self._api_main_url}/models/{model_id}/lists/{list_id}/readRequests/{request_id}/pages/{page}",
-            headers=headers,
+            headers=self._download_headers(MIMEType.TEXT_CSV, compress),
         )
 
     def delete_large_list_read(
@@ -238,6 +245,72 @@ class TransactionalConnection(BasicConnection):
             f"{self._api_main_url}/models/{model_id}/lists/{list_id}/readRequests/{request_id}",
         )
 
+    def read_list(self, model_id: str, list_id: str) -> bytes:
+        """Get all list's items as CSV, choosing the cheapest way based on item count.
+
+        Lists within the limit are read in one request (falling back to large list read
+        if that fails), bigger ones using large list read.
+        """
+        with self._span("read_list", model_id=model_id, list_id=list_id):
+            return b"".join(self._iter_list(model_id, list_id))
+
+    def iter_list(self, model_id: str, list_id: str) -> Iterator[bytes]:
+        """Same as read_list(), but pages of large read are yielded as they come."""
+        return self._span_iter(
+            "iter_list",
+            self._iter_list(model_id, list_id),
+            model_id=model_id,
+            list_id=list_id,
+        )
+
+    def _iter_list(self, model_id: str, list_id: str) -> Iterator[bytes]:
+        item_count = ListInfo.from_response(self.get_list(model_id, list_id)).item_count
+        if item_count is not None and item_count <= CELLS_LIMIT:
+            try:
+                data = self.get_list_items(
+                    model_id, list_id, accept=MIMEType.TEXT_CSV
+                ).content
+            except Exception as error:
+                logging.warning(f"List read failed, using large read: {error}")
+            else:
+                yield data
+                return
+        yield from self._iter_large_read(
+            self.start_large_list_read(model_id, list_id),
+            partial(self.get_large_list_read_status, model_id, list_id),
+            partial(self.get_large_list_read_data, model_id, list_id),
+            partial(self.delete_large_list_read, model_id, list_id),
+        )
+
+    def _iter_large_read(
+        self,
+        start: Response,
+        get_status: Callable[[str], Response],
+        get_data: Callable[[str, str], Response],
+        delete: Callable[[str], Response],
+    ) -> Iterator[bytes]:
+        """Yield all pages of started large read (as soon as they are available)."""
+        read = ReadRequest.from_response(start)
+        request_id = read.request_id
+        page = 0
+        try:
+            for interval in polling_intervals():
+                if read.state not in ("NOT_STARTED", "IN_PROGRESS", "COMPLETE"):
+                    raise Exception("Large read failed", request_id, read.state)
+                while page < read.available_pages:
+                    yield get_data(request_id, str(page)).content
+                    page += 1
+                if read.done:
+                    return
+                sleep(interval)
+                read = ReadRequest.from_response(get_status(request_id))
+        finally:
+            # failed clean-up shouldn't hide the result (or error) of the read
+            try:
+                delete(request_id)
+            except Exception as error:
+                logging.warning(f"Large read {request_id} not deleted: {error}")
+
     def add_list_items(self, model_id: str, list_id: str, data: list[dict]) -> Response:
         """Add specified items to a list.
 
@@ -415,6 +488,110 @@ class TransactionalConnection(BasicConnection):
             headers=headers,
         )
 
+    def read_view(
+        self, model_id: str, view_id: str, mode: ExportType = ExportType.GRID
+    ) -> bytes:
+        """Get all cells of a view as CSV, choosing the cheapest way based on its size.
+
+        Views without page dimensions are read in one request (in grid mode only,
+        as its layout is the same as of large read's grid), falling back to large
+        cell read if that fails - i.e. because of the cells limit. Other views are
+        read using large cell read, with given mode.
+        """
+        with self._span("read_view", model_id=model_id, view_id=view_id):
+            return b"".join(self._iter_view(model_id, view_id, mode))
+
+    def iter_view(
+        self, model_id: str, view_id: str, mode: ExportType = ExportType.GRID
+    ) -> Iterator[bytes]:
+        """Same as read_view(), but pages of large read are yielded as they come."""
+        return self._span_iter(
+            "iter_view",
+            self._iter_view(model_id, view_id, mode),
+            model_id=model_id,
+            view_id=view_id,
+        )
+
+    def _iter_view(
+        self, model_id: str, view_id: str, mode: ExportType
+    ) -> Iterator[bytes]:
+        view = View.from_response(self.get_view_dimensions(model_id, view_id))
+        # single read gets only the current page, so it can't be used with pages
+        if mode == ExportType.GRID and not view.pages:
+            try:
+                data = self.get_cell_data(model_id, view_id, MIMEType.TEXT_CSV).content
+            except Exception as error:
+                logging.warning(f"Cell read failed, using large read: {error}")
+            else:
+                yield data
+                return
+        yield from self._iter_large_read(
+            self.start_large_cell_read(model_id, view_id, mode),
+            partial(self.get_large_cell_read_status, model_id, view_id),
+            partial(self.get_large_cell_read_data, model_id, view_id),
+            partial(self.delete_large_cell_read, model_id, view_id),
+        )
+
+    def read_view_sharded(
+        self, model_id: str, view_id: str, max_workers: int = 4, max_shards: int = 100
+    ) -> bytes:
+        """Get cells of all pages of a view as CSV, one request per page - in parallel.
+
+        Views with one page dimension (of at most max shards items) are sharded by it
+        - each of its items is read by separate get_cell_data() request. As it doesn't
+        include page items in returned data, names of page items are added to rows
+        of each page as first columns (with empty header) - as in large read. Pages
+        are concatenated in the order of items, with header rows (one per column
+        dimension) kept only for the first page. Other views (or views with pages
+        exceeding the cells limit) are read as by read_view() in grid mode, so the
+        number of requests stays bounded.
+        """
+        with self._span("read_view_sharded", model_id=model_id, view_id=view_id):
+            view = View.from_response(self.get_view_dimensions(model_id, view_id))
+            if len(view.pages) != 1:
+                logging.info(f"View has {len(view.pages)} page dimensions, not sharded")
+                return b"".join(self._iter_view(model_id, view_id, ExportType.GRID))
+            shards = self._view_items(model_id, view_id, view.pages[0])
+            cells = prod(
+                len(self._view_items(model_id, view_id, dimension_id))
+                for dimension_id in view.rows + view.columns
+            )
+            if len(shards) > max_shards or cells > CELLS_LIMIT:
+                logging.info(
+                    f"View has {len(shards)} pages of {cells} cells, not sharded"
+                )
+                return b"".join(self._iter_view(model_id, view_id, ExportType.GRID))
+
+            def get_shard(page: dict) -> bytes:
+                pages = [f"{view.pages[0]}:{page['id']}"]
+                return self.get_cell_data(
+                    model_id, view_id, MIMEType.TEXT_CSV, pages
+                ).content
+
+            # each thread runs in a copy of the context, to keep spans within this one
+            with ThreadPoolExecutor(max_workers) as executor:
+                futures = [
+                    executor.submit(copy_context().run, get_shard, page)
+                    for page in shards
+                ]
+                data = [future.result() for future in futures]
+            header_rows = max(len(view.columns), 1)
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator="\n")
+            for number, (page, shard) in enumerate(zip(shards, data)):
+                # csv reader keeps quoted line breaks within their rows
+                rows = csv.reader(io.StringIO(shard.decode("utf-8-sig"), newline=""))
+                header = list(islice(rows, header_rows))
+                if number == 0:
+                    writer.writerows([""] + row for row in header)
+                writer.writerows([page["name"]] + row for row in rows if row)
+            return buffer.getvalue().encode()
+
+    def _view_items(self, model_id: str, view_id: str, dimension_id: str) -> list[dict]:
+        """Get items (with IDs & names) of a view's dimension."""
+        response = self.get_view_dimension_items(model_id, view_id, dimension_id)
+        return response.json()["items"]
+
     def start_large_cell_read(
         self, model_id: str, view_id: str, mode: ExportType
     ) -> Response:
@@ -455,13 +632,10 @@ class TransactionalConnection(BasicConnection):
         If there are i.e. 10 available pages, it means that pages from 0 to 9 are ready.
         You can clean after read using TransactionalConnection.delete_large_cell_read().
         """
-        headers = {"Accept": MIMEType.TEXT_CSV.value}
-        if compress or (compress is None and self.compress):
-            headers["Accept-Encoding"] = ENCODING_GZIP
         return self.request(
             "GET",
             f"{self._api_main_url}/models/{model_id}/views/{view_id}/readRequests/{request_id}/pages/{page}",
-            headers=headers,
+            headers=self._download_headers(MIMEType.TEXT_CSV, compress),
         )
 
     def delete_large_cell_read(
@@ -0,0 +1,136 @@
+"""
+apapi.transform
+
+This module provides streaming transformation of CSV files before upload - columns
+can be selected, reordered, renamed & added (with constant values), and encoding
+or delimiter converted, chunk by chunk - so that files of any size are never fully
+loaded in memory, and transformed chunks go straight to BulkConnection.upload_file().
+"""
+from __future__ import annotations
+
+import codecs
+import csv
+import io
+import json
+import os
+from itertools import islice
+from operator import itemgetter
+from typing import Callable, Iterable, Iterator, Union
+
+from .utils import FILE_CHUNK_SIZE, iter_lines
+
+_BATCH_ROWS = 100
+"""Number of rows transformed at once (between checks of output chunk size)."""
+
+
+class CSVTransform:
+    """Transforms CSV data given as chunks of bytes into chunks of transformed CSV.
+
+    Output chunks always end at the end of a row, and are about chunk size long
+    (checked every few rows). Columns are given as a list of source column names
+    (to select & reorder them), or as a dict of source names to new names (to also
+    rename them) - all columns are kept by default. Constant columns (names to
+    values) are added after them. Rows shorter than header are padded with empty
+    values, and empty lines are skipped.
+    """
+
+    def __init__(
+        self,
+        columns: Union[list[str], dict[str, str]] = None,
+        constants: dict[str, str] = None,
+        encoding: str = "utf-8-sig",
+        output_encoding: str = "utf-8",
+        delimiter: str = ",",
+        output_delimiter: str = None,
+        chunk_size: int = FILE_CHUNK_SIZE,
+    ):
+        self.columns: Union[list[str], dict[str, str], None] = columns
+        self.constants: dict[str, str] = constants or {}
+        self.encoding: str = encoding
+        """Encoding of source data ("utf-8-sig" drops BOM, if there is one)."""
+        self.output_encoding: str = output_encoding
+        self.delimiter: str = delimiter
+        self.output_delimiter: str = output_delimiter or delimiter
+        self.chunk_size: int = chunk_size
+        """Approximate size (in characters) of output chunks."""
+
+    @classmethod
+    def from_file(
+        cls, path: Union[str, os.PathLike], chunk_size: int = FILE_CHUNK_SIZE
+    ) -> CSVTransform:
+        """Load transformation from JSON mapping file (i.e. given to CLI by -im).
+
+        Mapping has optional keys: "columns", "constants", "encoding",
+        "outputEncoding", "delimiter" & "outputDelimiter" - as arguments of class.
+        """
+        with open(path, encoding="utf-8") as file:
+            mapping = json.load(file)
+        return cls(
+            mapping.get("columns"),
+            mapping.get("constants"),
+            mapping.get("encoding", "utf-8-sig"),
+            mapping.get("outputEncoding", "utf-8"),
+            mapping.get("delimiter", ","),
+            mapping.get("outputDelimiter"),
+            chunk_size,
+        )
+
+    def apply(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Lazily transform chunks of CSV data (with header in the first row)."""
+        rows = csv.reader(
+            iter_lines(codecs.iterdecode(chunks, self.encoding)),
+            delimiter=self.delimiter,
+        )
+        header = next(rows, None)
+        if header is None:
+            return
+        indices, names = self._select(header)
+        project = _projection(indices, tuple(self.constants.values()))
+        width, buffer = len(header), io.StringIO()
+        # incremental, so i.e. BOM of UTF-16 is written only at the start
+        encode = codecs.getincrementalencoder(self.output_encoding)().encode
+        writer = csv.writer(
+            buffer, delimiter=self.output_delimiter, lineterminator="\n"
+        )
+        writer.writerow(names + list(self.constants))
+        while batch := list(islice(rows, _BATCH_ROWS)):
+            for row in batch:
+                if 0 < len(row) < width:
+                    row += [""] * (width - len(row))
+            writer.writerows(map(project, filter(None, batch)))
+            if buffer.tell() >= self.chunk_size:
+                yield encode(buffer.getvalue())
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield encode(buffer.getvalue())
+
+    def _select(self, header: list[str]) -> tuple[list[int], list[str]]:
+        """Get indices of selected source columns, and their output names."""
+        if self.columns is None:
+            return list(range(len(header))), header
+        if not self.columns:
+            raise ValueError("At least one column has to be selected")
+        positions = {name: index for index, name in enumerate(header)}
+        missing = [name for name in self.columns if name not in positions]
+        if missing:
+            raise ValueError(f"Columns not found in the file: {missing}")
+        names = (
+            list(self.columns.values())
+            if isinstance(self.columns, dict)
+            else list(self.columns)
+        )
+        return [positions[name] for name in self.columns], names
+
+
+def _projection(
+    indices: list[int], constants: tuple[str, ...]
+) -> Callable[[list[str]], tuple[str, ...]]:
+    """Get function selecting columns of a row (and adding constants after them)."""
+    # itemgetter selects in C, but for one index it returns the value itself
+    select = (
+        itemgetter(*indices) if len(indices) > 1 else lambda row: (row[indices[0]],)
+    )
+    if not constants:
+        return select
+    return lambda row: select(row) + constants
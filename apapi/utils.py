@@ -8,14 +8,13 @@ from __future__ import annotations
 
 import json
 from enum import Enum
-from typing import Final
-
-from requests import Session
-from requests.adapters import HTTPAdapter
-from requests.packages.urllib3.util.retry import Retry
+from typing import TYPE_CHECKING, Final, Iterable, Iterator
 
 from .__version__ import __title__, __version__
 
+if TYPE_CHECKING:
+    from requests import Session
+
 
 class ExportType(Enum):
     """Needed for large cell view read to choose which format should be used."""
@@ -78,19 +77,86 @@ DEFAULT_HEADERS: Final[dict] = {
 DEFAULT_DATA: Final[dict] = {"localeName": "en_US"}
 """Default post data for bulk actions."""
 ENCODING_GZIP: Final[str] = "gzip,deflate"
-"""Optional encoding label, used when data uploaded is compressed."""
+"""Accepted encodings, used when downloaded data should be compressed in transfer."""
 PAGING_LIMIT: Final[int] = 2147483647
 """Max value for paging limit (2^31-1), needed for some endpoints where default is 20"""
+DEFAULT_POOL_SIZE: Final[int] = 10
+"""Default number of cached host pools & of connections kept alive per host."""
+CELLS_LIMIT: Final[int] = 1000000
+"""Max number of cells (or list items) that can be retrieved with a single request."""
+FILE_CHUNK_SIZE: Final[int] = 10 << 20
+"""Size of chunks for files uploaded in chunks (API accepts chunks from 1 to 50 MBs)."""
+LIST_ITEMS_LIMIT: Final[int] = 100000
+"""Max number of list items that can be added, updated or deleted with one request."""
+
+
+def polling_intervals(
+    initial: float = 0.1, maximum: float = 5.0, factor: float = 1.5
+) -> Iterator[float]:
+    """Endlessly yield growing intervals (in seconds) to wait between status checks.
+
+    Short operations are noticed quickly, while long ones aren't polled too often.
+    """
+    interval = initial
+    while True:
+        yield interval
+        interval = min(interval * factor, maximum)
+
+
+def iter_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Split text chunks into lines (with line endings, as expected by csv module).
+
+    Only line feed ends a line - carriage return (of CRLF) is left for csv module,
+    and other Unicode line boundaries (which may appear inside values) are kept.
+    """
+    rest = ""
+    for chunk in chunks:
+        lines = (rest + chunk).split("\n")
+        # last line might be continued in the next chunk
+        rest = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    if rest:
+        yield rest
+
+
+def get_generic_session(
+    retry_count: int = 3,
+    pool_connections: int = DEFAULT_POOL_SIZE,
+    pool_maxsize: int = DEFAULT_POOL_SIZE,
+    pool_block: bool = False,
+    backoff_factor: float = 0,
+) -> Session:
+    """Returns default session: headers & adapter (with given retry count) mounted.
+
+    Pool connections is the number of hosts for which connection pools are cached,
+    and pool max size is the number of connections kept alive for each host - it should
+    be at least the number of threads sharing the session, otherwise extra connections
+    are discarded after use (and next requests need a new TLS handshake).
+    With pool block set, threads wait for a free connection instead of opening new one.
+    Retries are delayed by backoff factor (in seconds), doubled after each retry.
+    """
+    # imported here, so that requests is loaded only when session is really needed
+    from requests import Session
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    class _Retry(Retry):
+        # urllib3 retries these when they have Retry-After (even if not in forcelist),
+        # but 429 is handled by apapi.rate_limiting.RateLimiter (and 413 won't pass)
+        RETRY_AFTER_STATUS_CODES = frozenset({503})
 
-
-def get_generic_session(retry_count: int = 3) -> Session:
-    """Returns default session: headers & adapter (with given retry count) mounted."""
     adapter = HTTPAdapter(
-        max_retries=Retry(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=_Retry(
             total=retry_count,
             allowed_methods=None,  # this means retry on ANY method (including POST)
-            status_forcelist=(407, 410, 429, 500, 502, 503, 504),
-        )
+            # 429 is not here, as it is handled by apapi.rate_limiting.RateLimiter
+            status_forcelist=(407, 410, 500, 502, 503, 504),
+            backoff_factor=backoff_factor,
+        ),
+        pool_block=pool_block,
     )
     session = Session()
     session.mount("http://", adapter)
@@ -102,10 +168,11 @@ def get_generic_session(retry_count: int = 3) -> Session:
 def start_oauth2_flow(
     client_id: str,
     oauth2_url: str = OAUTH2_URL,
-    session: Session = get_generic_session(),
+    session: Session = None,
 ) -> dict:
     """Start OAuth2 token generation flow by obtaining device code & user code."""
 
+    session = session or get_generic_session()
     response = session.post(
         f"{oauth2_url}/oauth/device/code",
         data=json.dumps(
@@ -119,10 +186,11 @@ def obtain_oauth2_token(
     client_id: str,
     device_code: str,
     oauth2_url: str = OAUTH2_URL,
-    session: Session = get_generic_session(),
+    session: Session = None,
 ) -> dict:
     """Obtain OAuth2 refresh token or check the status of its generation."""
 
+    session = session or get_generic_session()
     response = session.post(
         f"{oauth2_url}/oauth/token",
         data=json.dumps(
@@ -0,0 +1,311 @@
+"""
+APAPI benchmark suite - runs against local fake of Anaplan APIs (apapi.fake_server).
+
+Each case runs in a separate process (so peak RSS is measured per case), twice:
+once for timing, and once under tracemalloc (for peak of Python allocations).
+Results are compared with baseline stored locally (it depends on the machine, so
+it is not committed - store one before changes), and regressions are reported:
+
+    $ python benchmarks/benchmark.py                  # run & compare with baseline
+    $ python benchmarks/benchmark.py -save            # run & store as new baseline
+    $ python benchmarks/benchmark.py -case upload     # run only matching cases
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+from time import perf_counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from apapi import BasicAuth, Connection  # noqa: E402
+from apapi.fake_server import FakeAnaplan  # noqa: E402
+from apapi.utils import ExportType  # noqa: E402
+
+BASELINE_PATH = os.path.join(HERE, "baseline.json")
+MB = 1 << 20
+M = FakeAnaplan.MODEL_ID
+BIG_LIST_ID = "101000000099"
+BIG_LIST_ITEMS = 200000
+WRITE_LIST_ID = "101000000098"
+BIG_VIEW_ID = "102000000099"
+FILE_SIZES = (1, 16, 64)
+CHUNK_COUNTS = (1, 4, 16)
+HIGHER_IS_BETTER = ("mb_s", "requests_s", "items_s")
+"""Metrics for which lower value is a regression - for others, higher value is."""
+
+
+def file_id(size: int, chunks: int) -> str:
+    return f"1139{size:04d}{chunks:04d}"
+
+
+def populate(fake: FakeAnaplan) -> None:
+    """Add data used by benchmark cases to the fake server."""
+    for size in FILE_SIZES:
+        data = os.urandom(size * MB)
+        for chunks in CHUNK_COUNTS:
+            fake.add_file(M, file_id(size, chunks), data, -(-len(data) // chunks))
+    fake.add_list(M, BIG_LIST_ID, "Big", BIG_LIST_ITEMS)
+    fake.add_list(M, WRITE_LIST_ID, "Written", 0)
+    fake.add_view(M, BIG_VIEW_ID, "Big", [BIG_LIST_ID], [fake.TIME_ID])
+
+
+# Cases - each gets connection and returns function to measure, which returns amounts
+def case_upload(conn: Connection, size: int, chunks: int):
+    data = os.urandom(size * MB)
+    chunk_size = -(-len(data) // chunks)
+    parts = [data[i : i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+    def run():
+        conn.upload_file(M, "113000000002", parts)
+        return {"mb": size, "requests": chunks + 2}
+
+    return run
+
+
+def case_download(conn: Connection, size: int, chunks: int):
+    def run():
+        data = b"".join(conn.download_file(M, file_id(size, chunks)))
+        assert len(data) == size * MB
+        return {"mb": size, "requests": chunks + 1}
+
+    return run
+
+
+def case_large_list_read(conn: Connection):
+    def run():
+        read = conn.start_large_list_read(M, BIG_LIST_ID).json()["listReadRequest"]
+        size = 0
+        for page in range(read["availablePages"]):
+            size += len(
+                conn.get_large_list_read_data(
+                    M, BIG_LIST_ID, read["requestId"], str(page)
+                ).content
+            )
+        conn.delete_large_list_read(M, BIG_LIST_ID, read["requestId"])
+        return {"mb": size / MB, "requests": read["availablePages"] + 2}
+
+    return run
+
+
+def case_large_cell_read(conn: Connection):
+    view_id = BIG_VIEW_ID
+
+    def run():
+        read = conn.start_large_cell_read(M, view_id, ExportType.GRID).json()
+        read = read["viewReadRequest"]
+        size = 0
+        for page in range(read["availablePages"]):
+            size += len(
+                conn.get_large_cell_read_data(
+                    M, view_id, read["requestId"], str(page)
+                ).content
+            )
+        conn.delete_large_cell_read(M, view_id, read["requestId"])
+        return {"mb": size / MB, "requests": read["availablePages"] + 2}
+
+    return run
+
+
+def case_post_cell_data(conn: Connection, cells: int = 100000):
+    data = [
+        {
+            "lineItemId": "203000000000",
+            "dimensions": [
+                {"dimensionId": FakeAnaplan.LIST_ID, "itemId": str(101000000 + i)},
+                {"dimensionName": "Time", "itemName": "Jan 22"},
+            ],
+            "value": i * 1.5,
+        }
+        for i in range(cells)
+    ]
+
+    def run():
+        conn.post_cell_data(M, FakeAnaplan.MODULE_ID, data)
+        return {"items": cells, "requests": 1}
+
+    return run
+
+
+def case_add_list_items(conn: Connection, items: int = 100000):
+    list_id = WRITE_LIST_ID
+    data = [
+        {"code": f"C{i}", "name": f"Item {i}", "properties": {"p": str(i)}}
+        for i in range(items)
+    ]
+
+    def run():
+        conn.add_list_items(M, list_id, data)
+        conn.delete_list_items(M, list_id, [{"code": item["code"]} for item in data])
+        return {"items": 2 * items, "requests": 2}
+
+    return run
+
+
+def case_auth_refresh(conn: Connection, refreshes: int = 200):
+    def run():
+        for _ in range(refreshes):
+            conn.authentication.refresh_token()
+        return {"requests": refreshes}
+
+    return run
+
+
+def cases() -> dict:
+    """All benchmark cases by name - values are (factory, arguments)."""
+    result = {}
+    for size in FILE_SIZES:
+        for chunks in CHUNK_COUNTS:
+            result[f"upload_{size}mb_{chunks}chunks"] = (case_upload, (size, chunks))
+            result[f"download_{size}mb_{chunks}chunks"] = (
+                case_download,
+                (size, chunks),
+            )
+    result["large_list_read"] = (case_large_list_read, ())
+    result["large_cell_read"] = (case_large_cell_read, ())
+    result["post_cell_data"] = (case_post_cell_data, ())
+    result["add_list_items"] = (case_add_list_items, ())
+    result["auth_refresh"] = (case_auth_refresh, ())
+    return result
+
+
+def run_case(name: str, url: str, repeat: int) -> dict:
+    """Run a case (in the current process) and return its metrics."""
+    factory, arguments = cases()[name]
+    with BasicAuth("user@example.com:password", url) as auth:
+        conn = Connection(auth, url, url)
+        conn.timeout = 60
+        run = factory(conn, *arguments)
+        run()  # warm-up, so connection is already established
+        start = perf_counter()
+        for _ in range(repeat):
+            amounts = run()
+        seconds = (perf_counter() - start) / repeat
+        tracemalloc.start()
+        run()
+        tracemalloc_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    metrics = {"seconds": seconds}
+    for unit, amount in amounts.items():
+        metrics[f"{unit}_s"] = amount / seconds
+    metrics["peak_rss_mb"] = _peak_rss_mb()
+    metrics["tracemalloc_peak_mb"] = tracemalloc_peak / MB
+    return metrics
+
+
+def _peak_rss_mb() -> float:
+    # on Linux ru_maxrss survives exec (so it'd include the parent), VmHWM doesn't
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource  # not available on Windows
+    except ImportError:
+        return 0.0
+    # ru_maxrss is in kB on Linux, but in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (MB if sys.platform == "darwin" else 1024)
+
+
+def import_time(repeat: int) -> dict:
+    """Measure how long "import apapi" takes (minus interpreter startup)."""
+
+    def measure(code: str) -> float:
+        timings = []
+        for _ in range(repeat):
+            start = perf_counter()
+            subprocess.run([sys.executable, "-c", code], check=True, cwd=HERE + "/..")
+            timings.append(perf_counter() - start)
+        return min(timings)
+
+    return {"seconds": max(measure("import apapi") - measure("pass"), 0.0)}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Get descriptions of metrics which are worse than baseline by over tolerance."""
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            base = baseline.get(name, {}).get(metric)
+            if not base:
+                continue
+            if metric in HIGHER_IS_BETTER:
+                change = (base - value) / base
+            else:
+                change = (value - base) / base
+            if change > tolerance:
+                regressions.append(
+                    f"{name}.{metric}: {value:.4g} vs baseline {base:.4g} "
+                    f"({change:+.0%} worse)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-case", help="Run only cases containing given text")
+    parser.add_argument("-repeat", type=int, default=3, help="Runs of each case")
+    parser.add_argument(
+        "-tolerance", type=float, default=0.25, help="Allowed relative regression"
+    )
+    parser.add_argument("-save", action="store_true", help="Store as new baseline")
+    parser.add_argument("-output", help="Save results as JSON to given path")
+    parser.add_argument("-child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:  # running single case in a separate process
+        print(json.dumps(run_case(args.child[0], args.child[1], args.repeat)))
+        return
+
+    results = {}
+    if not args.case or args.case == "import_apapi":
+        results["import_apapi"] = import_time(max(args.repeat, 5))
+        print(f"import_apapi\t{results['import_apapi']}")
+    with FakeAnaplan() as fake:
+        populate(fake)
+        for name in cases():
+            if args.case and args.case not in name:
+                continue
+            child = subprocess.run(
+                [sys.executable, __file__, "-child", name, fake.url]
+                + ["-repeat", str(args.repeat)],
+                capture_output=True,
+                text=True,
+            )
+            if child.returncode:
+                sys.exit(f"{name} failed:\n{child.stderr}")
+            results[name] = json.loads(child.stdout.splitlines()[-1])
+            summary = ", ".join(f"{k}={v:.4g}" for k, v in results[name].items())
+            print(f"{name}\t{summary}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.save:
+        with open(BASELINE_PATH, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Baseline saved to {BASELINE_PATH}")
+        return
+    if not os.path.exists(BASELINE_PATH):
+        print("No baseline to compare with - use -save to store one")
+        return
+    with open(BASELINE_PATH) as file:
+        regressions = compare(results, json.load(file), args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION\t{regression}")
+    if regressions:
+        sys.exit(1)
+    print("No regressions found")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@ This script shows how to get some general information about a model
 """
 import json
 
-from apapi import Connection, OAuth2NonRotatable
+from apapi import Connection, InventoryCrawler, LineItemStats, OAuth2NonRotatable
 
 
 def main():
@@ -40,30 +40,28 @@ def main():
         data["modulesCount"] = len(conn.get_modules(t["model_id"]).json()["modules"])
         lineitems = conn.get_lineitems(t["model_id"]).json()["items"]
         data["lineitemsCount"] = len(lineitems)
-        # and even more, breaking down by data format
-        formats = {}
-        for li in lineitems:
-            data_type = li["format"]
-            if "NONE" == data_type:
-                continue
-            if data_type not in formats:
-                formats[data_type] = {"cellCount": 0}
-            formats[data_type]["cellCount"] += li["cellCount"]
-        data["cellCount"] = sum(dt["cellCount"] for dt in formats.values())
-        lookup = {"NONE": 0, "BOOLEAN": 1, "TEXT": 8, "NUMBER": 8}
-        for dt in formats:
-            formats[dt]["cellSize"] = formats[dt]["cellCount"] * lookup.get(dt, 4)
-        data["cellSize"] = sum(dt["cellSize"] for dt in formats.values())
-        for val in formats.values():
-            val["cellCount%"] = (100 * val["cellCount"]) // data["cellCount"]
-            val["cellSize%"] = (100 * val["cellSize"]) // data["cellSize"]
-        data["formats"] = formats
+        # and even more, breaking down by data format (needs apapi[analytics])
+        stats = LineItemStats.from_lineitems(t["model_id"], lineitems)
+        data["formats"] = stats.by_format()
+        data["cellCount"] = sum(f["cellCount"] for f in data["formats"].values())
+        data["cellSize"] = sum(f["size"] for f in data["formats"].values())
+        data["biggestModules"] = stats.by_module()[:5]
+        data["biggestLineitems"] = stats.top(5)
         # we can now print it
         print(json.dumps(data, indent=4))
         # or save to file
         with open("model_analysis.json", "w") as file:
             json.dump(data, file, indent=4)
 
+        # for the whole tenant, crawler gathers lists, modules, line items, views,
+        # actions & files of all models in parallel - saving them as a snapshot,
+        # so that the next run refreshes only models modified in the meantime
+        snapshot = InventoryCrawler(conn, "inventory.json", max_workers=8).crawl()
+        print(f"Models in the tenant: {len(snapshot['models'])}")
+        # and sizes can be analysed for all of them at once
+        tenant_stats = LineItemStats.from_snapshot(snapshot)
+        print(json.dumps(tenant_stats.by_model()[:10], indent=4))
+
 
 if __name__ == "__main__":
     main()
@@ -4,7 +4,7 @@ This script shows how to automate audit logs retrieval from Anaplan
 import json
 from datetime import date, datetime, timedelta, timezone
 
-from apapi import AuditConnection, OAuth2NonRotatable, utils
+from apapi import AuditConnection, AuditHarvester, OAuth2NonRotatable, utils
 
 
 def timestamp_from_date(source_date: date):
@@ -33,6 +33,15 @@ def main():
         with open("Anaplan_audit.log", "ab") as file:
             file.write(events)
 
+        # for busy tenants, one request for a whole week might time out - instead,
+        # harvester fetches hourly windows in parallel, and remembers where it stopped
+        # (so next run - i.e. next Monday - continues from the last harvested event)
+        harvester = AuditHarvester(conn, "Anaplan_audit.jsonl.gz")
+        harvester.harvest(
+            date_from=timestamp_from_date(previous_week_start),
+            date_to=timestamp_from_date(this_week_start) - 1,
+        )
+
 
 if __name__ == "__main__":
     main()
@@ -42,6 +42,8 @@ setup(
     install_requires=requires,
     extras_require={
         "dev": dev_requires,
+        "analytics": ["numpy>=1.20"],
+        "yaml": ["PyYAML>=5.1"],
     },
     classifiers=[
         "Development Status :: 3 - Alpha",
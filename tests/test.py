@@ -4,6 +4,8 @@ import test_alm_connection
 import test_audit_connection
 import test_authentication
 import test_bulk_connection
+import test_concurrency
+import test_fake_server
 import test_transactional_connection
 
 logging.basicConfig(
@@ -12,10 +14,14 @@ logging.basicConfig(
     level=logging.INFO,
 )
 
+# offline tests - run against local fake of Anaplan APIs
+test_fake_server.test()
+
 config_json_path = "tests/test.json"
 
 test_alm_connection.test(config_json_path)
 test_audit_connection.test(config_json_path)
 test_authentication.test(config_json_path)
 test_bulk_connection.test(config_json_path)
+test_concurrency.test(config_json_path)
 test_transactional_connection.test(config_json_path)
@@ -33,10 +33,14 @@ def test(config_json_path):
     t_conn.get_import(t["model_id"], t["import_id"])
     data = t_conn.get_file(t["model_id"], t["export_id"]).content
     assert b"".join(t_conn.download_file(t["model_id"], t["export_id"])) == data
+    buffer = bytearray(len(data))
+    assert t_conn.download_into(t["model_id"], t["export_id"], buffer) == len(data)
+    assert buffer == data
 
     # WARNING: "7" (instead of "2") is wrong on purpose, to fail the task and get a dump
+    view = memoryview(data)  # slices of memoryview are not copies
     t_conn.upload_file(
-        t["model_id"], t["file_id"], [data[: len(data) // 20], data[len(data) // 2 :]]
+        t["model_id"], t["file_id"], [view[: len(data) // 20], view[len(data) // 2 :]]
     )
 
     i_task = t_conn.run_import(t["model_id"], t["import_id"]).json()["task"]["taskId"]
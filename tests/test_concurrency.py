@@ -0,0 +1,37 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from apapi import BasicAuth, TransactionalConnection
+
+THREADS = 32
+
+
+def test(config_json_path):
+    with open(config_json_path) as f:
+        t = json.loads(f.read())
+    # pool sized for all threads - no connection should be discarded
+    t_auth = BasicAuth(f"{t['email']}:{t['password']}", pool_maxsize=THREADS)
+    t_conn = TransactionalConnection(t_auth)
+
+    # one connection shared by many threads
+    with ThreadPoolExecutor(THREADS) as executor:
+        users = list(executor.map(lambda _: t_conn.get_me(), range(4 * THREADS)))
+    assert all(user.json()["user"]["email"] == t["email"] for user in users)
+    # token refresh in the middle of requests should not break anything
+    with ThreadPoolExecutor(THREADS) as executor:
+        futures = [executor.submit(t_conn.get_me) for _ in range(2 * THREADS)]
+        t_auth.refresh_token()
+        futures += [executor.submit(t_conn.get_me) for _ in range(2 * THREADS)]
+    assert all(future.result().ok for future in futures)
+    assert t_auth.validate_token()
+    t_auth.close()
+
+    # blocking pool smaller than number of threads - threads wait for connection
+    t_auth = BasicAuth(
+        f"{t['email']}:{t['password']}", pool_maxsize=THREADS // 4, pool_block=True
+    )
+    t_conn = TransactionalConnection(t_auth)
+    with ThreadPoolExecutor(THREADS) as executor:
+        models = list(executor.map(lambda _: t_conn.get_models(), range(THREADS)))
+    assert all(model.ok for model in models)
+    t_auth.close()
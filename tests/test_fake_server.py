@@ -0,0 +1,620 @@
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stderr, redirect_stdout
+from contextvars import copy_context
+from io import BytesIO, StringIO
+from mmap import mmap
+from tempfile import TemporaryDirectory
+from time import sleep, time
+
+import apapi
+from apapi import (
+    AuditHarvester,
+    AuditStore,
+    BasicAuth,
+    Connection,
+    CSVTransform,
+    FileTokenStore,
+    InventoryCrawler,
+    MetricsCollector,
+    OAuth2NonRotatable,
+    OAuth2Rotatable,
+    RateLimiter,
+    RefreshScheduler,
+    utils,
+)
+from apapi.__main__ import _parser, _run_job, _stdio
+from apapi.__main__ import main as cli
+from apapi.audit_harvester import read_events
+from apapi.fake_server import FakeAnaplan
+from apapi.inventory import MODEL_CONTENT
+from apapi.metrics import LATENCY_BUCKETS, endpoint_template
+from apapi.results import ListInfo, Module, ReadRequest, Task, View
+from apapi.tracing import InMemoryExporter, JSONLinesExporter, Tracer, url_ids
+
+M = FakeAnaplan.MODEL_ID
+
+
+def doing(response) -> bool:
+    return response.json()["task"]["taskState"] != "COMPLETE"
+
+
+def test():
+    with FakeAnaplan(task_duration=0.2, page_interval=0.05, page_rows=100) as fake:
+        # Authentication
+        with OAuth2NonRotatable("client", "token", fake.url, fake.url) as t_auth:
+            assert t_auth.validate_token()
+        t_auth = BasicAuth("user@example.com:password", fake.url)
+        t_auth.refresh_token()
+        assert t_auth.validate_token()
+        with TemporaryDirectory() as temp_dir:
+            store = FileTokenStore(os.path.join(temp_dir, "tokens.json"))
+            tokens = len(fake._tokens)
+            with BasicAuth("a@example.com:pass", fake.url, token_store=store) as auth1:
+                with BasicAuth(
+                    "a@example.com:pass", fake.url, token_store=store
+                ) as auth2:
+                    assert len(fake._tokens) == tokens + 1
+                    auth1.refresh_token()
+                    auth2.refresh_token()  # takes token refreshed by auth1
+                    assert auth2.validate_token() and len(fake._tokens) == tokens + 1
+            # rotated refresh token is kept in the store (given one is used once)
+            with OAuth2Rotatable(
+                "client",
+                iter(["first"]).__next__,
+                [].append,
+                fake.url,
+                fake.url,
+                token_store=store,
+            ) as auth3:
+                rotated = store.load_refresh_token(auth3._store_key)
+                assert rotated is not None and rotated != "first"
+                auth3.authenticate()
+                assert store.load_refresh_token(auth3._store_key) == rotated
+        # Tokens are refreshed by scheduler before they expire
+        fake.token_lifetime = 1
+        scheduler = RefreshScheduler(jitter=0)
+        with BasicAuth(
+            "b@example.com:pass", fake.url, refresh_scheduler=scheduler
+        ) as auth:
+            token = auth.session.auth.token
+            sleep(1.2)
+            assert auth.session.auth.token != token and auth.validate_token()
+        scheduler.shutdown()
+        fake.token_lifetime = 1800
+        t_conn = Connection(t_auth, fake.url, fake.url)
+        # rejected (i.e. expired) token is refreshed, and the request is retried
+        token = t_auth.token
+        fake._tokens.pop(token)
+        assert t_conn.get_me().ok and t_auth.token != token
+
+        # Bulk: export -> download -> upload -> import
+        e_task = t_conn.run_export(M, fake.EXPORT_ID).json()["task"]["taskId"]
+        while doing(t_conn.get_export_task(M, fake.EXPORT_ID, e_task)):
+            pass
+        data = t_conn.get_file(M, fake.EXPORT_ID).content
+        assert data.startswith(b"Name,Code,Parent\n")
+        assert b"".join(t_conn.download_file(M, fake.EXPORT_ID)) == data
+        t_conn.upload_file(M, fake.FILE_ID, [data[:100], data[100:]])
+        assert t_conn.get_file(M, fake.FILE_ID).content == data
+        assert t_conn.read_file(M, fake.EXPORT_ID) == data
+        t_conn.write_file(M, fake.FILE_ID, data, chunk_size=100)
+        assert t_conn.read_file(M, fake.FILE_ID) == data
+        t_conn.write_file(M, fake.FILE_ID, data, chunk_size=100, max_workers=3)
+        assert b"".join(t_conn.download_file(M, fake.FILE_ID, max_workers=3)) == data
+        # transformed on the fly: columns selected, renamed & reordered, constant added
+        big = data + data.split(b"\n", 1)[1] * 50
+        rows = [line.split(",") for line in big.decode().splitlines()]
+        transform = CSVTransform({"Code": "code", "Name": "name"}, {"V": "Actual"})
+        transform.chunk_size = 100
+        t_conn.write_file(M, fake.FILE_ID, big, 100, 3, transform)
+        chunks = fake.models[M].files[fake.FILE_ID]
+        assert len(chunks) > 1 and all(chunk.endswith(b"\n") for chunk in chunks)
+        assert b"".join(chunks).decode().splitlines() == ["code,name,V"] + [
+            f"{row[1]},{row[0]},Actual" for row in rows[1:]
+        ]
+        # compressed in transfer by default (less bytes read), decompressed on arrival
+        t_conn.metrics, read = MetricsCollector(), []
+        for compress in (False, None):
+            t_conn.metrics.reset()
+            assert t_conn.get_file(M, fake.FILE_ID, compress).content == b"".join(
+                chunks
+            )
+            read += [stats["bytes_in"] for stats in t_conn.metrics.snapshot().values()]
+        assert read[1] < read[0] / 2
+        # IDs & chunk numbers are templated, so endpoints (labels) are bounded
+        t_conn.metrics.reset()
+        assert b"".join(t_conn.download_file(M, fake.FILE_ID)) == b"".join(chunks)
+        snapshot = t_conn.metrics.snapshot()
+        assert sorted(snapshot) == [
+            "GET models/{id}/files/{id}/chunks",
+            "GET models/{id}/files/{id}/chunks/{n}",
+        ]
+        assert snapshot["GET models/{id}/files/{id}/chunks/{n}"]["count"] == len(chunks)
+        assert endpoint_template(f"{fake.url}/audit/api/1/events?limit=5") == "events"
+        # exported for Prometheus: cumulative buckets, sum & count, and counters
+        metrics, url = MetricsCollector(), f"{fake.url}/2/0/models/{M}/files/1/chunks"
+        metrics.record("GET", f"{url}/0", 200, 0.2, 0, 100)
+        metrics.record("GET", f"{url}/1", 500, 3.0, 5, 10, 1, 0.5)
+        labels = 'method="GET",endpoint="models/{id}/files/{id}/chunks/{n}"'
+        buckets = zip(LATENCY_BUCKETS, (0, 0, 1, 1, 1, 1, 2, 2, 2, 2))
+        assert metrics.to_prometheus().splitlines() == [
+            "# HELP apapi_request_duration_seconds Latency of Anaplan API requests.",
+            "# TYPE apapi_request_duration_seconds histogram",
+            *(
+                f'apapi_request_duration_seconds_bucket{{{labels},le="{le}"}} {count}'
+                for le, count in buckets
+            ),
+            f'apapi_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2',
+            f"apapi_request_duration_seconds_sum{{{labels}}} 3.2",
+            f"apapi_request_duration_seconds_count{{{labels}}} 2",
+            "# HELP apapi_requests_total Number of requests.",
+            "# TYPE apapi_requests_total counter",
+            f'apapi_requests_total{{{labels},status="200"}} 1',
+            f'apapi_requests_total{{{labels},status="500"}} 1',
+            "# HELP apapi_request_errors_total Number of failed requests.",
+            "# TYPE apapi_request_errors_total counter",
+            f"apapi_request_errors_total{{{labels}}} 1",
+            "# HELP apapi_request_retries_total Number of retried attempts.",
+            "# TYPE apapi_request_retries_total counter",
+            f"apapi_request_retries_total{{{labels}}} 1",
+            "# HELP apapi_request_sent_bytes_total Bytes sent in request bodies.",
+            "# TYPE apapi_request_sent_bytes_total counter",
+            f"apapi_request_sent_bytes_total{{{labels}}} 5",
+            "# HELP apapi_response_received_bytes_total Bytes received in responses.",
+            "# TYPE apapi_response_received_bytes_total counter",
+            f"apapi_response_received_bytes_total{{{labels}}} 110",
+            "# HELP apapi_request_wait_seconds_total Seconds waited for rate limiter.",
+            "# TYPE apapi_request_wait_seconds_total counter",
+            f"apapi_request_wait_seconds_total{{{labels}}} 0.5",
+        ]
+        t_conn.metrics = None
+        # Tracing: requests are child spans of operations, with totals rolled up
+        memory = InMemoryExporter()
+        with TemporaryDirectory() as temp_dir:
+            spans_path = os.path.join(temp_dir, "spans.jsonl")
+            with JSONLinesExporter(spans_path) as exporter:
+                tracer = t_conn.tracer = Tracer(memory, exporter)
+                requests = fake.requests
+                with tracer.span("job", kind="test") as root:
+                    assert tracer.current_span() is root
+                    downloaded = b"".join(t_conn.download_file(M, fake.FILE_ID, 3))
+                    # threads running in a copy of the context are children too
+                    with ThreadPoolExecutor(2) as executor:
+                        executor.submit(copy_context().run, t_conn.get_me).result()
+                assert tracer.current_span() is None
+                t_conn.tracer = None
+            with open(spans_path, encoding="utf-8") as file:
+                lines = file.read().splitlines()
+        spans = {span.name: span for span in memory.spans}
+        # spans ending in parallel threads might be exported in different order
+        assert sorted(lines) == sorted(
+            json.dumps(span.as_dict(), default=str) for span in memory.spans
+        )
+        assert list(json.loads(lines[-1])) == [
+            "name",
+            "trace_id",
+            "span_id",
+            "parent_id",
+            "start_time",
+            "end_time",
+            "duration",
+            "attributes",
+            "error",
+        ]
+        assert memory.spans[-1] is root and root.parent is None
+        assert len(root.trace_id) == 32 and len(root.span_id) == 16
+        assert all(span.trace_id == root.trace_id for span in memory.spans)
+        assert len({span.span_id for span in memory.spans}) == len(memory.spans)
+        download = spans["download_file"]
+        chunk_spans = [
+            span
+            for span in memory.spans
+            if span.name == "GET models/{id}/files/{id}/chunks/{n}"
+        ]
+        assert download.parent is root and spans["GET users/me"].parent is root
+        assert len(chunk_spans) == len(chunks)
+        assert all(span.parent is download for span in chunk_spans)
+        assert chunk_spans[0].attributes["model_id"] == M
+        assert chunk_spans[0].attributes["file_id"] == fake.FILE_ID
+        requests = fake.requests - requests
+        assert root.attributes["requests"] == requests == len(chunk_spans) + 2
+        assert root.attributes["kind"] == "test" and root.duration > 0
+        assert download.attributes["bytes_in"] == sum(
+            span.attributes["bytes_in"] for span in chunk_spans
+        )
+        request_spans = [span for span in memory.spans if span.name.startswith("GET")]
+        assert root.attributes["bytes_in"] == sum(
+            span.attributes["bytes_in"] for span in request_spans
+        )
+        assert downloaded == b"".join(chunks)
+        assert url_ids(f"{fake.url}/2/0/workspaces/W1/models/{M}/files/x?a=1/2") == {
+            "workspace_id": "W1",
+            "model_id": M,
+        }
+        assert url_ids(
+            f"{fake.url}/2/0/models/{M}/views/{fake.VIEW_ID}/readRequests/7"
+        ) == {
+            "model_id": M,
+            "view_id": fake.VIEW_ID,
+            "request_id": "7",
+        }
+        # bytes-like data is uploaded as views, and downloaded into a buffer in place
+        t_conn.write_file(M, fake.FILE_ID, memoryview(bytearray(big)), 100, 3)
+        with mmap(-1, len(big)) as buffer:
+            assert t_conn.download_into(M, fake.FILE_ID, buffer, 3) == len(big)
+            assert buffer[:] == big
+            # views are released once sent - so mmap can be closed (response kept)
+            response = t_conn.put_file(M, fake.FILE_ID, buffer)
+        assert t_conn.get_file(M, fake.FILE_ID).content == big
+        try:
+            t_conn.download_into(M, fake.FILE_ID, bytearray(len(big) - 1))
+            assert False
+        except Exception as error:
+            assert error.args[0] == "Buffer is too small"
+        array = bytearray(data)
+        response = t_conn.write_file(M, fake.FILE_ID, array)
+        array += b"resized"
+        assert response.request.body is None
+        t_conn.put_file(M, fake.FILE_ID, data[:10])
+        assert t_conn.get_file(M, fake.FILE_ID).content == data[:10]
+        i_task = t_conn.run_import(M, fake.IMPORT_ID).json()["task"]["taskId"]
+        assert t_conn.get_import_tasks(M, fake.IMPORT_ID).json()["tasks"]
+        while not (
+            task := Task.from_response(
+                t_conn.get_import_task(M, fake.IMPORT_ID, i_task)
+            )
+        ).done:
+            pass
+        assert task.task_id == i_task and task.successful and not task.nested_results
+
+        # Transactional: lists
+        metadata = t_conn.get_list(M, fake.LIST_ID).json()["metadata"]
+        items = t_conn.get_list_items(M, fake.LIST_ID).json()["listItems"]
+        assert metadata["itemCount"] == len(items) == 1000
+        assert (
+            ListInfo.from_response(t_conn.get_list(M, fake.LIST_ID)).item_count == 1000
+        )
+        read = t_conn.start_large_list_read(M, fake.LIST_ID).json()["listReadRequest"]
+        while read["requestState"] != "COMPLETE":
+            read = t_conn.get_large_list_read_status(
+                M, fake.LIST_ID, read["requestId"]
+            ).json()["listReadRequest"]
+        pages = [
+            t_conn.get_large_list_read_data(
+                M, fake.LIST_ID, read["requestId"], str(page)
+            ).content
+            for page in range(read["availablePages"])
+        ]
+        assert (
+            b"".join(pages)
+            == t_conn.get_list_items(
+                M, fake.LIST_ID, accept=utils.MIMEType.TEXT_CSV
+            ).content
+        )
+        assert t_conn.read_list(M, fake.LIST_ID) == b"".join(pages)
+        t_conn.add_list_items(M, fake.LIST_ID, [{"code": "t1", "name": "t1"}])
+        t_conn.delete_list_items(M, fake.LIST_ID, [{"code": "t1"}])
+
+        # Transactional: views
+        view = t_conn.get_view_dimensions(M, fake.VIEW_ID).json()
+        page_dim = view["pages"][0]["id"]
+        page_items = t_conn.get_view_dimension_items(M, fake.VIEW_ID, page_dim)
+        page = f"{page_dim}:{page_items.json()['items'][0]['id']}"
+        cells = t_conn.get_cell_data(M, fake.VIEW_ID, utils.MIMEType.TEXT_CSV, [page])
+        assert len(cells.content.splitlines()) == 1001
+        read = t_conn.start_large_cell_read(M, fake.VIEW_ID, utils.ExportType.GRID)
+        assert read.json()["viewReadRequest"]["availablePages"] == 1
+        assert ReadRequest.from_response(read).available_pages == 1
+        assert len(t_conn.read_view(M, fake.VIEW_ID).splitlines()) > 1001
+        # views without pages are read in one request, in the same layout
+        fake.add_view(M, "102000000777", "Small", [fake.LIST_ID], [fake.TIME_ID], [])
+        requests = fake.requests
+        small = t_conn.read_view(M, "102000000777")
+        assert fake.requests - requests == 2
+        large = t_conn.read_view(M, "102000000777", utils.ExportType.TABULAR_MULTI)
+        assert small == large and len(small.splitlines()) == 1001
+        # pages are labelled by names of their items - as in large read
+        sharded = t_conn.read_view_sharded(M, fake.VIEW_ID).splitlines()
+        large = t_conn.read_view(M, fake.VIEW_ID).splitlines()
+        assert [row.split(b",")[:2] for row in sharded] == [
+            row.split(b",")[:2] for row in large
+        ]
+        assert sharded[1:1001] == [
+            b"Actual," + r for r in cells.content.splitlines()[1:]
+        ]
+        # more pages than shards allowed: read at once by large read instead
+        bounded = t_conn.read_view_sharded(M, fake.VIEW_ID, max_shards=1)
+        assert bounded.splitlines() == large
+        assert View.from_response(t_conn.get_view_dimensions(M, fake.VIEW_ID)).pages
+        modules = Module.list_from_response(t_conn.get_modules(M), "modules")
+        assert modules[0].id == fake.MODULE_ID
+
+        # ALM: revision synced from dev to many models at once
+        fake.add_model("D" * 32, "Dev")
+        fake.add_revision("D" * 32, "R1", "Base")
+        fake.add_revision("D" * 32, "R2", "New")
+        targets = [f"P{i:031d}" for i in range(6)]
+        for target in targets:
+            fake.add_model(target, target)
+            fake.add_revision(target, "R1", "Base")
+        fake.add_model("E" * 32, "Empty")
+        # failed polls of syncs are treated as transient
+        failed_polls = []
+
+        def flaky_get_sync(*args):
+            if len(failed_polls) < 2:
+                failed_polls.append(args)
+                raise Exception("Request failed")
+            return get_sync(*args)
+
+        get_sync, t_conn.get_sync = t_conn.get_sync, flaky_get_sync
+        outcomes = t_conn.sync_many("D" * 32, "R2", targets + ["E" * 32], 2)
+        del t_conn.get_sync
+        assert len(failed_polls) == 2
+        assert all(outcomes[target].successful for target in targets)
+        assert outcomes["E" * 32].state == "FAILED"
+        applied = t_conn.get_revision_models("D" * 32, "R2").json()["appliedToModels"]
+        assert len(applied) == 7
+        assert t_conn.sync_many("D" * 32, "R2", targets[:1])[targets[0]].state == (
+            "NOT_SYNCABLE"
+        )
+        changes = list(t_conn.iter_revisions_comparison("D" * 32, "R2", M, "R1"))
+        assert (
+            len(changes) == 1000
+            and changes[7]["Source Value"] == 'IF X THEN 7 ELSE "-"'
+            and changes[7]["Name"] == "Sales.Item\u20287"
+        )
+        summary = t_conn.get_revisions_summary("D" * 32, "R2", M, "R1")
+        assert summary["summaryReport"]["totals"]["modified"] == 1000
+        with TemporaryDirectory() as directory:
+            pairs = [("D" * 32, "R2", target, "R1") for target in targets]
+            paths = t_conn.download_revisions_comparisons(pairs, directory)
+            with open(paths[-1], "rb") as report:
+                assert report.read().count(b"\r\n") == 1001
+
+        # Inventory: second crawl refreshes only the modified model
+        with TemporaryDirectory() as temp_dir:
+            crawler = InventoryCrawler(t_conn, os.path.join(temp_dir, "inventory.json"))
+            snapshot = crawler.crawl()
+            assert len(snapshot["models"]) == len(fake.models)
+            assert snapshot["models"][M]["lists"][0]["id"] == fake.LIST_ID
+            fake.models[M].last_modified += 1
+            requests = fake.requests
+            refreshed = crawler.crawl()
+            assert fake.requests - requests == 2 + len(MODEL_CONTENT)
+            # details are requested regardless of connection's default
+            t_conn.details = False
+            assert "format" in crawler.crawl(True)["models"][M]["lineitems"][0]
+            t_conn.details = True
+            assert refreshed["models"][M]["crawled"] > snapshot["models"][M]["crawled"]
+            assert refreshed["models"]["D" * 32] == snapshot["models"]["D" * 32]
+            # Analytics: sizes of line items from the snapshot (if numpy is installed)
+            try:
+                from apapi.analytics import LineItemStats
+            except ImportError:
+                LineItemStats = None
+            if LineItemStats is not None:
+                stats = LineItemStats.from_snapshot(refreshed)
+                assert stats.by_format()["NUMBER"]["size"] == 12000 * 8
+                assert stats.by_model()[0]["cellCount"] == 4 * 12000
+                assert stats.by_module()[0]["moduleId"] == fake.MODULE_ID
+                assert [dim["listName"] for dim in stats.by_list()] == [
+                    "Products",
+                    "Versions",
+                ]
+                assert [item["format"] for item in stats.top(2)] == ["NUMBER", "TEXT"]
+
+        # CLI: upload in parallel chunks -> import, export -> download, list items
+        with TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "data.csv")
+            with open(path, "wb") as file:
+                file.write(data)
+            cli_args = ["-u", "c@example.com:pass", "-s", fake.url, "-auth", fake.url]
+            cli_args += ["-q", "-m", "APAPI Fake Model", "-mw", "3"]
+            assert not cli(
+                cli_args
+                + ["-f", fake.FILE_ID, "-p", path, "-chunksize"]
+                + ["0.0001", "-i", "Products from Products.csv", "-x"]
+            )
+            assert len(fake.models[M].files[fake.FILE_ID]) > 1
+            mapping = os.path.join(temp_dir, "mapping.json")
+            with open(mapping, "w") as file:
+                json.dump({"columns": ["Code"], "outputEncoding": "utf-16"}, file)
+            assert not cli(cli_args + ["-f", fake.FILE_ID, "-p", path, "-im", mapping])
+            uploaded = t_conn.read_file(M, fake.FILE_ID).decode("utf-16")
+            assert uploaded.splitlines() == ["Code"] + [
+                line.split(",")[1] for line in data.decode().splitlines()[1:]
+            ]
+            assert not cli(cli_args + ["-e", fake.EXPORT_ID, "-x", "-get", path])
+            with open(path, "rb") as file:
+                assert file.read() == data
+            # terminal data is tab-separated: converted on upload & download
+            tabbed, stdout = data.replace(b",", b"\t"), BytesIO()
+
+            def cli_stdio(*args):
+                _stdio.set((BytesIO(tabbed), stdout))
+                return cli(cli_args + ["-f", fake.FILE_ID, *args])
+
+            assert not copy_context().run(cli_stdio, "-putc")
+            assert t_conn.read_file(M, fake.FILE_ID) == data
+            assert not copy_context().run(cli_stdio, "-getc")
+            assert stdout.getvalue() == tabbed
+            with open(path, "w") as file:
+                file.write("name,code\nNew,NEW\nProducts 0,C0\n")
+            with redirect_stdout(StringIO()) as output:
+                assert not cli(cli_args + ["-l", "Products", "-upsertItems:csv", path])
+            assert json.loads(output.getvalue())["added"] == 1
+            assert cli(cli_args + ["-i", "Missing import", "-x"]) == 1
+            # job: export & failing action in parallel, then import & skipped step
+            job, report = (os.path.join(temp_dir, n) for n in ("job.json", "r.json"))
+            steps = [
+                {"name": "export", "args": f"-e {fake.EXPORT_ID} -x -get {path}"},
+                {"name": "bad", "args": ["-a", "Missing", "-x"], "after": []},
+                {
+                    "name": "import",
+                    "args": f"-f {fake.FILE_ID} -p {path} -i {fake.IMPORT_ID} -x",
+                    "after": "export",
+                },
+                {"name": "skipped", "args": "-L", "after": ["bad", "import"]},
+            ]
+            with open(job, "w") as file:
+                json.dump({"parallelism": 2, "steps": steps}, file)
+            assert cli(cli_args + ["-job", job, "-report", report]) == 1
+            with open(report) as file:
+                report = json.load(file)
+            assert [step["status"] for step in report["steps"].values()] == [
+                "SUCCESSFUL",
+                "FAILED",
+                "SUCCESSFUL",
+                "SKIPPED",
+            ]
+            assert len(report["requests"]) > 5
+            # each job's report counts only its requests (even if jobs run at once
+            # on one connection, as in daemon), connection's collector stays
+            collector = t_conn.metrics = MetricsCollector()
+
+            def run_job(number: int) -> int:
+                steps = [{"args": "-F"}, {"args": "-L"}][: number + 1] * 2
+                job, report = (os.path.join(temp_dir, f"{number}.{e}") for e in "jr")
+                with open(job, "w") as file:
+                    json.dump({"steps": steps}, file)
+                args = vars(_parser().parse_args(cli_args + ["-job", job]))
+                assert not _run_job(t_conn, _parser(), {**args, "report": report})
+                with open(report) as file:
+                    requests = json.load(file)["requests"].values()
+                return sum(stats["count"] for stats in requests)
+
+            with redirect_stdout(StringIO()), ThreadPoolExecutor(2) as executor:
+                # model is resolved from its name by each step
+                assert list(executor.map(run_job, range(2))) == [4, 8]
+            assert t_conn.metrics is collector and not collector.snapshot()
+            # daemon: invocations passed through its socket share its session
+            if os.name == "posix":
+                socket_path = os.path.join(temp_dir, "apapi.sock")
+                daemon = subprocess.Popen(
+                    [sys.executable, "-m", "apapi", *cli_args, "-socket", socket_path]
+                    + ["-daemon"],
+                    cwd=os.path.dirname(
+                        os.path.dirname(os.path.abspath(apapi.__file__))
+                    ),
+                )
+                while not os.path.exists(socket_path):
+                    sleep(0.01)
+                client_args = ["-socket", socket_path, "-m", M, "-f", fake.FILE_ID]
+                tokens = len(fake._tokens)
+                assert not cli(client_args + ["-p", path, "-chunksize", "0.0001"])
+                assert not cli(client_args + ["-get", path + ".copy"])
+                with open(path, "rb") as file, open(path + ".copy", "rb") as copy:
+                    assert file.read() == copy.read()
+                assert cli(client_args + ["-i", "Missing import", "-x"]) == 1
+                assert len(fake._tokens) == tokens
+                # stdin without descriptor (i.e. replaced by test runner) is not read
+                stdin, sys.stdin = sys.stdin, StringIO()
+                try:
+                    assert not cli(client_args + ["-get", path + ".copy"])
+                finally:
+                    sys.stdin = stdin
+                # daemon's options can't be given to its client
+                with redirect_stderr(StringIO()):
+                    try:
+                        cli(client_args + ["-ct", "1", "-get", path + ".copy"])
+                        assert False, "daemon's option accepted by client"
+                    except SystemExit as error:
+                        assert error.code == 2
+                # neither running daemon's socket, nor other file is removed
+                daemon_args = cli_args + ["-daemon", "-socket"]
+                assert cli(daemon_args + [socket_path]) == 1
+                assert cli(daemon_args + [path]) == 1 and os.path.exists(path)
+                daemon.terminate()
+                assert daemon.wait() == 0 and not os.path.exists(socket_path)
+
+        # Audit
+        now = int(time() * 1000)
+        fake.generate_events(100, now - 3600000, now)
+        events = t_conn.get_events(date_from=now - 1800000, date_to=now).json()
+        assert (
+            events["response"]
+            == json.loads(
+                t_conn.search_events(date_from=now - 1800000, date_to=now).content
+            )["response"]
+        )
+        assert len(events["response"]) == 50
+        assert (
+            list(t_conn.iter_events(date_from=now - 1800000, date_to=now))
+            == events["response"]
+        )
+        assert (
+            list(
+                t_conn.iter_search_events(
+                    accept=utils.MIMEType.TEXT_PLAIN,
+                    date_from=now - 1800000,
+                    date_to=now,
+                )
+            )
+            == events["response"]
+        )
+        with TemporaryDirectory() as temp_dir:
+            sink = os.path.join(temp_dir, "audit.jsonl.gz")
+            harvester = AuditHarvester(t_conn, sink, window=600000)
+            assert harvester.harvest(now - 3600000, now - 1800000) == 51
+            fake.generate_events(10, now - 1800000, now)
+            assert harvester.harvest(date_to=now) == 59
+            # watermark moves to the end, also through windows without events
+            assert harvester.harvest(date_to=now + 1800000) == 0
+            watermark = now + 1800000 + 1 - harvester.safety_lag
+            assert harvester.load_state()["watermark"] == watermark
+            harvested = read_events(sink)
+            assert len({event["id"] for event in harvested}) == len(harvested) == 110
+            with AuditStore(os.path.join(temp_dir, "audit.db")) as store:
+                assert store.add_file(sink) == 110 and store.add(harvested) == 0
+                logins = [e for e in harvested if e["eventTypeId"] == "user.login"]
+                assert store.count(event_type="user.*") == len(logins)
+                latest = store.query(object_id=M, limit=1, newest_first=True)[0]
+                assert (
+                    latest["eventDate"]
+                    == store.latest_date()
+                    == harvested[-1]["eventDate"]
+                )
+
+        # bytes of streamed (i.e. chunked) responses are counted when they are closed
+        t_conn.metrics, fake.chunked = MetricsCollector(), True
+        assert list(t_conn.iter_search_events(date_from=now - 1800000, date_to=now))
+        [stats] = t_conn.metrics.snapshot().values()
+        assert stats["count"] == 1 and stats["bytes_in"] > 1000
+        t_conn.metrics, fake.chunked = None, False
+
+        # waiting for rate limiter is recorded separately from latency
+        limiter, t_auth.rate_limiter = t_auth.rate_limiter, RateLimiter(
+            {fake.url: 5}, 1
+        )
+        t_conn.metrics = MetricsCollector()
+        for _ in range(4):
+            t_conn.get_me()
+        [stats] = t_conn.metrics.snapshot().values()
+        assert stats["wait_sum"] > 0.5 > stats["latency_sum"]
+        t_auth.rate_limiter, t_conn.metrics = limiter, None
+
+        # Injected throttling & failures are handled by retries
+        fake.throttle_rate, fake.failure_rate, fake.retry_after = 0.2, 0.1, 0
+        for _ in range(50):
+            t_conn.get_me()
+        # bodies which can't be sent again are not retried, others are retried
+        fake.throttle_rate, fake.failure_rate = 1, 0
+        url = f"{fake.url}/2/0/models/{M}/files/{fake.FILE_ID}"
+        for body, attempts in ((iter([b"a"]), 1), (b"a", 6)):
+            requests = fake.requests
+            try:
+                t_conn.request("PUT", url, data=body)
+                assert False
+            except Exception as error:
+                assert error.args[0] == "Request failed"
+            assert fake.requests - requests == attempts
+        # Retry-After is respected by urllib3 for 503, while 429 is left to limiter
+        retry = t_auth.session.get_adapter(fake.url).max_retries
+        assert retry.respect_retry_after_header and retry.is_retry("GET", 503, True)
+        assert not retry.is_retry("GET", 429, True)
+        t_auth.close()